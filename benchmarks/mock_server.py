@@ -0,0 +1,230 @@
+"""In-process mock of the Robinhood endpoints used by the benchmarks
+
+:class:`MockRobinhood` runs a threaded HTTP server on localhost and installs a
+transport (see :func:`robin_stocks.robinhood.helper.set_transport`) that
+rewrites ``https://<host>/<path>`` to ``http://127.0.0.1:<port>/<host>/<path>``.
+Everything above the transport, including retries, decoding and pagination,
+runs exactly as it does against the real service. Pagination ``next`` links
+point back at the real host names, so they are rewritten too.
+
+Latency and error injection are configurable and seeded::
+
+    with MockRobinhood(latency=0.02, jitter=0.01, error_rate=0.01):
+        stocks.get_quotes('token', ['AAPL'])
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from robin_stocks.robinhood import helper
+
+from . import payloads
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        path = '/' + path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+
+        status, payload = mock.handle(method, host, path, query, body, self.headers.get('Content-Type', ''))
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops concurrent connects, which then wait a second for the SYN retry
+    request_queue_size = 128
+
+
+class MockRobinhood:
+    """Threaded local mock of quotes, historicals, instruments, accounts, orders and option chains.
+
+    :param latency: Fixed server-side delay per request in seconds
+    :type latency: float
+    :param jitter: Extra uniformly distributed delay per request in seconds
+    :type jitter: float
+    :param error_rate: Probability of answering 503 instead of the payload
+    :type error_rate: float
+    :param page_size: Results per page for paginated list endpoints
+    :type page_size: int
+    :param total_orders: Number of orders served by the paginated order history
+    :type total_orders: int
+    :param historical_points: Data points per symbol in historicals responses
+    :type historical_points: int
+    :param option_instruments: Option instruments returned for a chain
+    :type option_instruments: int
+    :param seed: Seed for latency and error injection
+    :type seed: int
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, page_size=100, total_orders=1000,
+                 historical_points=250, option_instruments=200, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.total_orders = total_orders
+        self.historical_points = historical_points
+        self.option_instruments = option_instruments
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._order_history = None
+        self._server = None
+        self._thread = None
+        self.requests = 0
+        self._routes = [
+            ('GET', re.compile(r'^/quotes/historicals/$'), self._historicals),
+            ('GET', re.compile(r'^/quotes/$'), self._quotes),
+            ('GET', re.compile(r'^/marketdata/quotes/$'), self._quotes),
+            ('GET', re.compile(r'^/instruments/$'), self._instruments),
+            ('GET', re.compile(r'^/accounts/$'), self._accounts),
+            ('GET', re.compile(r'^/orders/$'), self._orders),
+            ('POST', re.compile(r'^/orders/$'), self._submit_order),
+            ('GET', re.compile(r'^/options/chains/$'), self._chains),
+            ('GET', re.compile(r'^/options/instruments/$'), self._option_instruments),
+        ]
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Starts the server and installs the rewriting transport"""
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-robinhood', daemon=True)
+        self._thread.start()
+        helper.set_transport(self.transport)
+        return self
+
+    def stop(self):
+        """Removes the transport and shuts the server down"""
+        helper.set_transport(None)
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def transport(self, method, url, headers=None, data=None, json=None, params=None, timeout=16):
+        """Transport sending requests for Robinhood hosts to the local server"""
+        parts = urlsplit(url)
+        local = f'{self.base_url}/{parts.hostname}{parts.path}'
+        if parts.query:
+            local += '?' + parts.query
+        return helper.http_transport(method, local, headers=headers, data=data, json=json,
+                                     params=params, timeout=timeout)
+
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+
+    def handle(self, method, host, path, query, body, content_type):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, {'detail': 'Service unavailable (injected)'}
+
+        for route_method, pattern, handler in self._routes:
+            if route_method == method and pattern.match(path):
+                return 200, handler(host, path, query, body, content_type)
+        return 404, {'detail': 'Not found.'}
+
+    def _page(self, host, path, query, items):
+        cursor = int(query.get('cursor', 0))
+        page = items[cursor:cursor + self.page_size]
+        next_url = None
+        if cursor + self.page_size < len(items):
+            next_query = dict(query, cursor=cursor + self.page_size)
+            next_url = f'https://{host}{path}?{urlencode(next_query)}'
+        return {'previous': None, 'next': next_url, 'results': page}
+
+    def _symbols(self, query):
+        return [symbol for symbol in query.get('symbols', 'AAPL').split(',') if symbol]
+
+    def _quotes(self, host, path, query, body, content_type):
+        with self._lock:
+            seq = self.requests
+        return {'results': [payloads.quote(symbol, seq) for symbol in self._symbols(query)]}
+
+    def _historicals(self, host, path, query, body, content_type):
+        interval, span = query.get('interval', 'day'), query.get('span', 'year')
+        return {'results': [payloads.historicals(symbol, interval, span, self.historical_points)
+                            for symbol in self._symbols(query)]}
+
+    def _instruments(self, host, path, query, body, content_type):
+        return {'previous': None, 'next': None, 'results': [payloads.instrument(query.get('symbol', 'AAPL'))]}
+
+    def _accounts(self, host, path, query, body, content_type):
+        return {'previous': None, 'next': None, 'results': [payloads.account()]}
+
+    def _orders(self, host, path, query, body, content_type):
+        with self._lock:
+            if self._order_history is None:
+                self._order_history = [payloads.stock_order(index) for index in range(self.total_orders)]
+        return self._page(host, path, query, self._order_history)
+
+    def _submit_order(self, host, path, query, body, content_type):
+        if 'json' in content_type:
+            payload = json.loads(body or b'{}')
+        else:
+            payload = {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+        with self._lock:
+            self._submitted += 1
+            index = self.total_orders + self._submitted
+        return payloads.submitted_order(payload, index)
+
+    def _chains(self, host, path, query, body, content_type):
+        symbol = query.get('symbol') or 'AAPL'
+        return {'previous': None, 'next': None, 'results': [payloads.chain(symbol)]}
+
+    def _option_instruments(self, host, path, query, body, content_type):
+        chain_id = query.get('chain_id', 'chain')
+        items = [payloads.option_instrument(chain_id, 'AAPL', index) for index in range(self.option_instruments)]
+        return {'previous': None, 'next': None, 'results': items}
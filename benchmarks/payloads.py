@@ -0,0 +1,203 @@
+"""Payload factories shaped like recorded Robinhood API responses
+
+Field names, nesting and string formatting follow real responses so decoding
+and filtering costs are representative. Values are synthetic.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+API = 'https://api.robinhood.com'
+
+
+def _id(*parts):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, '/'.join(str(part) for part in parts)))
+
+
+def _price(value):
+    return f'{value:.6f}'
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def instrument(symbol):
+    instrument_id = _id('instrument', symbol)
+    return {
+        'id': instrument_id,
+        'url': f'{API}/instruments/{instrument_id}/',
+        'quote': f'{API}/quotes/{symbol}/',
+        'fundamentals': f'{API}/fundamentals/{symbol}/',
+        'splits': f'{API}/instruments/{instrument_id}/splits/',
+        'state': 'active',
+        'market': f'{API}/markets/XNAS/',
+        'simple_name': symbol.title(),
+        'name': f'{symbol.title()} Inc. Common Stock',
+        'tradeable': True,
+        'tradability': 'tradable',
+        'symbol': symbol,
+        'bloomberg_unique': 'EQ0000000000000000',
+        'margin_initial_ratio': '0.5000',
+        'maintenance_ratio': '0.2500',
+        'country': 'US',
+        'day_trade_ratio': '0.2500',
+        'list_date': '1990-01-01',
+        'min_tick_size': None,
+        'type': 'stock',
+        'tradable_chain_id': _id('chain', symbol),
+        'rhs_tradability': 'tradable',
+        'fractional_tradability': 'tradable',
+        'default_collar_fraction': '0.05',
+    }
+
+
+def quote(symbol, seq=0):
+    base = 100.0 + (sum(map(ord, symbol)) % 400) + (seq % 100) * 0.01
+    return {
+        'ask_price': _price(base + 0.02),
+        'ask_size': 300,
+        'bid_price': _price(base - 0.02),
+        'bid_size': 200,
+        'last_trade_price': _price(base),
+        'last_extended_hours_trade_price': _price(base + 0.05),
+        'previous_close': _price(base - 1.2),
+        'adjusted_previous_close': _price(base - 1.2),
+        'previous_close_date': '2024-01-02',
+        'symbol': symbol,
+        'trading_halted': False,
+        'has_traded': True,
+        'last_trade_price_source': 'consolidated',
+        'updated_at': _now(),
+        'instrument': f"{API}/instruments/{_id('instrument', symbol)}/",
+        'instrument_id': _id('instrument', symbol),
+        'state': 'active',
+    }
+
+
+def historicals(symbol, interval, span, points):
+    start = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+    step = {'5minute': timedelta(minutes=5), '10minute': timedelta(minutes=10),
+            'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}.get(interval, timedelta(days=1))
+    rows = []
+    for index in range(points):
+        price = 100.0 + (index % 50) * 0.1
+        rows.append({
+            'begins_at': (start + index * step).isoformat().replace('+00:00', 'Z'),
+            'open_price': _price(price),
+            'close_price': _price(price + 0.05),
+            'high_price': _price(price + 0.2),
+            'low_price': _price(price - 0.2),
+            'volume': 10000 + index,
+            'session': 'reg',
+            'interpolated': False,
+            'symbol': symbol,
+        })
+    return {
+        'quote': f'{API}/quotes/{symbol}/',
+        'symbol': symbol,
+        'interval': interval,
+        'span': span,
+        'bounds': 'regular',
+        'previous_close_price': _price(99.0),
+        'open_price': _price(100.0),
+        'open_time': rows[0]['begins_at'] if rows else None,
+        'instrument': instrument(symbol)['url'],
+        'historicals': rows,
+        'InstrumentID': _id('instrument', symbol),
+    }
+
+
+def account():
+    return {
+        'url': f'{API}/accounts/5QR00000/',
+        'account_number': '5QR00000',
+        'type': 'margin',
+        'buying_power': '25000.0000',
+        'cash': '25000.0000',
+        'cash_available_for_withdrawal': '25000.0000',
+        'portfolio': f'{API}/accounts/5QR00000/portfolio/',
+        'positions': f'{API}/accounts/5QR00000/positions/',
+        'deactivated': False,
+        'updated_at': _now(),
+    }
+
+
+def stock_order(index, symbol='AAPL', state='filled'):
+    order_id = _id('order', index)
+    return {
+        'id': order_id,
+        'ref_id': _id('ref', index),
+        'url': f'{API}/orders/{order_id}/',
+        'account': account()['url'],
+        'instrument': instrument(symbol)['url'],
+        'instrument_id': _id('instrument', symbol),
+        'cancel': None,
+        'executions': [{'price': _price(100.0), 'quantity': '1.00000000', 'settlement_date': '2024-01-04',
+                        'timestamp': _now(), 'id': _id('execution', index)}],
+        'fees': '0.00',
+        'state': state,
+        'side': 'buy' if index % 2 else 'sell',
+        'time_in_force': 'gfd',
+        'trigger': 'immediate',
+        'type': 'limit',
+        'price': _price(100.0),
+        'stop_price': None,
+        'quantity': '1.00000',
+        'cumulative_quantity': '1.00000' if state == 'filled' else '0.00000',
+        'average_price': _price(100.0) if state == 'filled' else None,
+        'created_at': _now(),
+        'updated_at': _now(),
+        'last_transaction_at': _now(),
+        'extended_hours': False,
+    }
+
+
+def submitted_order(payload, index):
+    order = stock_order(index, payload.get('symbol', 'AAPL'), state='queued')
+    order.update({key: payload[key] for key in ('side', 'type', 'time_in_force', 'trigger', 'ref_id')
+                  if key in payload})
+    if payload.get('price') is not None:
+        order['price'] = str(payload['price'])
+    if payload.get('quantity') is not None:
+        order['quantity'] = str(payload['quantity'])
+    return order
+
+
+def chain(symbol, expirations=12):
+    start = datetime(2024, 1, 5)
+    return {
+        'id': _id('chain', symbol),
+        'symbol': symbol,
+        'can_open_position': True,
+        'cash_component': None,
+        'expiration_dates': [(start + timedelta(weeks=week)).strftime('%Y-%m-%d') for week in range(expirations)],
+        'trade_value_multiplier': '100.0000',
+        'underlying_instruments': [{'id': _id('underlying', symbol), 'instrument': instrument(symbol)['url'],
+                                    'quantity': 100}],
+        'min_ticks': {'above_tick': '0.05', 'below_tick': '0.01', 'cutoff_price': '3.00'},
+        'late_close_state': 'disabled',
+    }
+
+
+def option_instrument(chain_id, symbol, index):
+    strike = 50 + (index // 2) * 2.5
+    option_type = 'call' if index % 2 == 0 else 'put'
+    option_id = _id('option', chain_id, index)
+    return {
+        'chain_id': chain_id,
+        'chain_symbol': symbol,
+        'created_at': '2023-12-01T00:00:00Z',
+        'expiration_date': '2024-01-05',
+        'id': option_id,
+        'issue_date': '2023-12-01',
+        'min_ticks': {'above_tick': '0.05', 'below_tick': '0.01', 'cutoff_price': '3.00'},
+        'rhs_tradability': 'position_closing_only',
+        'state': 'active',
+        'strike_price': f'{strike:.4f}',
+        'tradability': 'tradable',
+        'type': option_type,
+        'updated_at': _now(),
+        'url': f'{API}/options/instruments/{option_id}/',
+        'sellout_datetime': '2024-01-05T20:00:00+00:00',
+    }
@@ -0,0 +1,164 @@
+"""Runs the request-layer benchmarks against the local mock server
+
+Usage (from the repository root)::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios quotes,order --iterations 500 --concurrency 8
+    python -m benchmarks.run --latency 0.02 --jitter 0.01 --error-rate 0.01
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json --tolerance 0.15
+
+``--compare`` exits with status 1 when a scenario's throughput dropped or its
+p50/p99 latency grew by more than the tolerance, so the suite can gate CI.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from robin_stocks.robinhood import helper, options, orders, stocks
+from robin_stocks.robinhood.urls import orders_url
+
+from .mock_server import MockRobinhood
+
+TOKEN = 'benchmark-token'
+SYMBOLS = ['AAPL', 'MSFT', 'AMZN', 'GOOG', 'META', 'NVDA', 'TSLA', 'AMD', 'NFLX', 'INTC',
+           'ORCL', 'CRM', 'ADBE', 'PYPL', 'UBER', 'SHOP', 'SQ', 'COIN', 'PLTR', 'SNOW']
+
+SCENARIOS = {
+    'quotes': lambda: stocks.get_quotes(TOKEN, SYMBOLS),
+    'historicals': lambda: stocks.get_stock_historicals(TOKEN, SYMBOLS[:5], interval='5minute', span='week'),
+    'pagination': lambda: helper.request_get(TOKEN, orders_url(), 'pagination'),
+    'chains': lambda: options.find_tradable_options(TOKEN, 'AAPL'),
+    'order': lambda: orders.order(TOKEN, 'AAPL', 1, 'buy', price=100.0, time_in_force='gfd'),
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(name, iterations, concurrency, warmup):
+    """Calls a scenario ``iterations`` times on ``concurrency`` threads and summarises the latencies"""
+    call = SCENARIOS[name]
+    for _ in range(warmup):
+        call()
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            result = call()
+            failed = result is None
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(iterations)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'errors': errors,
+        'throughput': iterations / wall if wall else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p99': percentile(latencies, 0.99),
+        'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regressions of ``results`` against ``baseline`` beyond ``tolerance``"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if previous['throughput'] and current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['throughput']:.1f}/s < {previous['throughput']:.1f}/s")
+        for key in ('p50', 'p99'):
+            if previous[key] and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {current[key] * 1000:.2f}ms > {previous[key] * 1000:.2f}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated scenario names')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='server-side delay per request in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random delay per request in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a 503 per request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    # Failed requests are expected when errors are injected
+    logging.getLogger('robin_stocks').setLevel(logging.CRITICAL)
+
+    results = {}
+    with MockRobinhood(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed) as mock:
+        for name in names:
+            results[name] = run_scenario(name, args.iterations, args.concurrency, args.warmup)
+        total_requests = mock.requests
+
+    print(f"{'scenario':<12} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['throughput']:>10.1f} {result['p50'] * 1000:>10.2f} "
+              f"{result['p99'] * 1000:>10.2f} {result['max'] * 1000:>10.2f} {result['errors']:>7}")
+    print(f"{total_requests} requests served by the mock")
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('save', 'compare')},
+        'scenarios': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
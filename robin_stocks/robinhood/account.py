@@ -1,7 +1,9 @@
 """STATELESS account functions - NO GLOBAL STATE"""
 
+import logging
 from typing import Dict, List, Any, Optional
-from .helper import _make_request, request_get
+from .helper import _make_request, request_get, run_concurrently
+from .tracing import traced
 from .urls import (
     phoenix_url, positions_url, account_profile_url, dividends_url,
     banktransfers_url, documents_url, linked_url, margin_url,
@@ -13,9 +15,14 @@ from .urls import (
     portfolios_historicals_url, cash_management_cards_transactions_url,
     accounts_day_trades_url, cash_management_stock_loan_payments_url,
     cash_management_interest_payments_url, all_watchlists_url,
-    notifications_base_url, margin_interest_url
+    notifications_base_url, margin_interest_url, instruments_url, quotes_url
 )
 
+logger = logging.getLogger(__name__)
+
+# Instrument ids per instruments / quotes request when resolving holdings
+HOLDINGS_BATCH_SIZE = 50
+
 # ========================
 # ENHANCED HELPER FUNCTIONS - Using indexzero pattern  
 # ========================
@@ -54,6 +61,7 @@ def get_positions(access_token: str, nonzero_only: bool = True) -> List[Dict]:
     return []
 
 
+@traced
 def get_account_profile(access_token: str) -> Optional[Dict]:
     """Get account profile - STATELESS VERSION - ENHANCED with indexzero pattern"""
     # Use indexzero pattern for cleaner first result access
@@ -62,10 +70,15 @@ def get_account_profile(access_token: str) -> Optional[Dict]:
                                               headers={'Authorization': f'Bearer {access_token}'})
 
 
-def get_portfolio_profile(access_token: str) -> Optional[Dict]:
-    """Get portfolio profile - STATELESS VERSION"""
+def get_portfolio_profile(access_token: str, account_number: Optional[str] = None) -> Optional[Dict]:
+    """Get portfolio profile - STATELESS VERSION
+    
+    :param access_token: Valid access token
+    :param account_number: The account number if already known, which saves a request
+    :returns: Portfolio profile dictionary
+    """
     # First get account number, then get portfolio for that account
-    account_num = _get_account_number(access_token)
+    account_num = account_number or _get_account_number(access_token)
     if account_num:
         from .urls import portfolio_profile_url
         headers = {'Authorization': f'Bearer {access_token}'}
@@ -115,31 +128,133 @@ def get_bank_transfers(access_token: str) -> List[Dict]:
 
 # STATELESS REPLACEMENTS for all functions - NO MORE BLOCKING!
 
+def _instrument_id(position: Dict[str, Any]) -> Optional[str]:
+    """Instrument id of a position, taken from the instrument URL when the field is missing"""
+    if position.get('instrument_id'):
+        return position['instrument_id']
+    parts = [part for part in (position.get('instrument') or '').split('/') if part]
+    return parts[-1] if parts else None
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _percent(value: float, base: float) -> float:
+    return value * 100 / base if base else 0.0
+
+
+@traced
 def build_holdings(access_token: str, with_dividends: bool = False) -> Dict[str, Dict[str, Any]]:
-    """Build holdings dictionary - STATELESS VERSION"""
-    positions = get_positions(access_token, nonzero_only=True)
-    holdings = {}
+    """Build holdings dictionary - STATELESS VERSION
     
+    Positions (and dividends) load first; instruments and quotes for every holding are then
+    fetched together, in batches of HOLDINGS_BATCH_SIZE ids per request. The number of
+    requests grows with the number of batches, never with the number of holdings.
+    
+    :param access_token: Valid access token
+    :param with_dividends: Add the total dividends paid or reinvested for each holding
+    :returns: Symbols mapped to price, quantity, average_buy_price, equity, percent_change,
+        intraday_percent_change, equity_change, type, name, id, percentage (weight in the
+        holdings' total equity), instrument and, with dividends, dividend. Numbers are
+        formatted strings with two decimals, like the original library.
+    """
+    first_round = {'positions': lambda: request_get(access_token, positions_url(), 'pagination',
+                                                    payload={'nonzero': 'true'})}
+    if with_dividends:
+        first_round['dividends'] = lambda: request_get(access_token, dividends_url(), 'pagination')
+    loaded = run_concurrently(first_round)
+    
+    positions = [position for position in loaded['positions'] or []
+                 if position and float(position.get('quantity') or 0) > 0 and _instrument_id(position)]
+    if not positions:
+        return {}
+    
+    ids = list(dict.fromkeys(_instrument_id(position) for position in positions))
+    calls = {}
+    for index, chunk in enumerate(_chunks(ids, HOLDINGS_BATCH_SIZE)):
+        joined = ','.join(chunk)
+        calls[('instruments', index)] = lambda ids=joined: request_get(access_token, instruments_url(), 'results',
+                                                                       payload={'ids': ids})
+        calls[('quotes', index)] = lambda ids=joined: request_get(access_token, quotes_url(), 'results',
+                                                                  payload={'ids': ids})
+    batches = run_concurrently(calls, max_workers=8)
+    
+    instruments, quotes = {}, {}
+    for (kind, _), results in batches.items():
+        target = instruments if kind == 'instruments' else quotes
+        for item in results or []:
+            if not item:
+                continue
+            item_id = item.get('id') if kind == 'instruments' else item.get('instrument_id') or _instrument_id(item)
+            target[item_id] = item
+    
+    dividends: Dict[str, float] = {}
+    for dividend in loaded.get('dividends') or []:
+        if dividend and dividend.get('state') in ('paid', 'reinvested'):
+            dividend_id = _instrument_id(dividend)
+            dividends[dividend_id] = dividends.get(dividend_id, 0.0) + float(dividend.get('amount') or 0)
+    
+    rows = []
     for position in positions:
-        if float(position.get('quantity', 0)) > 0:
-            instrument_url = position.get('instrument', '')
-            # Extract symbol from position or fetch it
-            symbol = 'UNKNOWN'  # Would need to resolve from instrument URL
-            holdings[symbol] = {
-                'quantity': position.get('quantity'),
-                'price': position.get('average_buy_price'),
-                'total_equity': position.get('market_value'),
-                'instrument': instrument_url
-            }
+        instrument_id = _instrument_id(position)
+        instrument = instruments.get(instrument_id, {})
+        quote = quotes.get(instrument_id, {})
+        symbol = quote.get('symbol') or instrument.get('symbol') or position.get('symbol') or instrument_id
+        price = float(quote.get('last_extended_hours_trade_price') or quote.get('last_trade_price') or 0)
+        quantity = float(position['quantity'])
+        average_buy_price = float(position.get('average_buy_price') or 0)
+        intraday_average_buy_price = float(position.get('intraday_average_buy_price') or 0)
+        if not quote:
+            logger.warning("No quote for holding %s, its price is reported as 0", symbol)
+        rows.append((symbol, instrument_id, instrument, position, price, quantity,
+                     average_buy_price, intraday_average_buy_price))
+    
+    total_equity = sum(price * quantity for _, _, _, _, price, quantity, _, _ in rows)
+    holdings = {}
+    for symbol, instrument_id, instrument, position, price, quantity, average_buy_price, intraday_average_buy_price in rows:
+        equity = price * quantity
+        holdings[symbol] = {
+            'price': '{0:.2f}'.format(price),
+            'quantity': position['quantity'],
+            'average_buy_price': '{0:.2f}'.format(average_buy_price),
+            'equity': '{0:.2f}'.format(equity),
+            'percent_change': '{0:.2f}'.format(_percent(price - average_buy_price, average_buy_price)),
+            'intraday_percent_change': '{0:.2f}'.format(
+                _percent(price - intraday_average_buy_price, intraday_average_buy_price)),
+            'equity_change': '{0:.2f}'.format(equity - quantity * average_buy_price),
+            'type': instrument.get('type'),
+            'name': instrument.get('simple_name') or instrument.get('name'),
+            'id': instrument_id,
+            'percentage': '{0:.2f}'.format(_percent(equity, total_equity)),
+            'instrument': position.get('instrument'),
+        }
+        if with_dividends:
+            holdings[symbol]['dividend'] = '{0:.2f}'.format(dividends.get(instrument_id, 0.0))
     
     return holdings
 
+@traced
 def build_user_profile(access_token: str) -> Dict[str, Any]:
-    """Build complete user profile - STATELESS VERSION"""
+    """Build complete user profile - STATELESS VERSION
+    
+    Positions load concurrently with the account profile, and the portfolio reuses the
+    account number from that profile, so the whole profile takes two round trips.
+    """
+    def account_and_portfolio():
+        account = get_account_profile(access_token)
+        account_number = account.get('account_number') if account else None
+        return account, get_portfolio_profile(access_token, account_number)
+    
+    results = run_concurrently({
+        'account': account_and_portfolio,
+        'positions': lambda: get_positions(access_token),
+    })
+    account, portfolio = results['account']
     return {
-        'account': get_account_profile(access_token),
-        'portfolio': get_portfolio_profile(access_token),
-        'positions': get_positions(access_token)
+        'account': account,
+        'portfolio': portfolio,
+        'positions': results['positions']
     }
 
 def delete_symbols_from_watchlist(access_token: str, symbols: List[str], watchlist_name: str = 'Default') -> bool:
@@ -158,19 +273,17 @@ def deposit_funds_to_robinhood_account(access_token: str, amount: float, bank_ac
     }
     return _make_request('POST', banktransfers_url(), headers=headers, json=payload)
 
+@traced
 def download_all_documents(access_token: str, doc_type: str = 'all') -> List[bytes]:
     """Download all documents - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
     documents = get_documents(access_token)
-    downloads = []
-    
-    for doc in documents:
-        if doc.get('download'):
-            doc_data = _make_request('GET', doc['download'], headers=headers)
-            if doc_data:
-                downloads.append(doc_data)
     
-    return downloads
+    # Downloads are independent, fetch a few at a time and keep the document order
+    calls = {index: (lambda url=doc['download']: _make_request('GET', url, headers=headers))
+             for index, doc in enumerate(documents) if doc.get('download')}
+    results = run_concurrently(calls, max_workers=8)
+    return [results[index] for index in calls if results[index]]
 
 def download_document(access_token: str, document_id: str) -> Optional[bytes]:
     """Download specific document - STATELESS VERSION"""
@@ -201,10 +314,14 @@ def get_card_transactions(access_token: str) -> List[Dict[str, Any]]:
         return response['results']
     return []
 
-def get_day_trades(access_token: str) -> List[Dict[str, Any]]:
-    """Get day trades - STATELESS VERSION"""
+def get_day_trades(access_token: str, account_number: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get day trades - STATELESS VERSION
+    
+    :param access_token: Valid access token
+    :param account_number: The account number if already known, which saves a request
+    """
     # Get account number using enhanced helper
-    account_number = _get_account_number(access_token)
+    account_number = account_number or _get_account_number(access_token)
     if not account_number:
         return []
     
@@ -237,7 +354,7 @@ def get_historical_portfolio(access_token: str, interval: str = '5minute', span:
         # Get current portfolio snapshot instead of historical data
         account_number = _get_account_number(access_token)
         if not account_number:
-            print("ROBINHOOD: No account number found for portfolio")
+            logger.warning("No account number found for portfolio")
             return []
         
         # Use the working portfolios endpoint for current data
@@ -249,7 +366,7 @@ def get_historical_portfolio(access_token: str, interval: str = '5minute', span:
             return [response]
         return []
     except Exception as e:
-        print(f"ROBINHOOD: Portfolio error: {e}")
+        logger.warning("Portfolio request failed: %s", e)
         return []
 
 def get_latest_notification(access_token: str) -> Optional[Dict[str, Any]]:
@@ -3,10 +3,16 @@ STATELESS ROBINHOOD API - EXACT COPY OF WORKING ORIGINAL LOGIC
 """
 
 from typing import Dict, List, Any, Optional, Union, Callable
+import logging
 import secrets
 import time
 from .helper import request_get, _make_request
-from .urls import login_url
+from .tracing import traced
+from .urls import login_url, challenge_url, pathfinder_user_machine_url, pathfinder_inquiry_url, prompt_status_url
+
+logger = logging.getLogger(__name__)
+
+CLIENT_ID = 'c82SH0WZOsabOXGP2sxqcj34FxkvfnWRZBKlBjFS'
 
 
 def _generate_device_token() -> str:
@@ -30,13 +36,13 @@ def _get_sheriff_id(data):
 
 def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback: Optional[Callable[[str, str], str]] = None):
     """EXACT COPY OF WORKING ORIGINAL VALIDATION WITH CALLBACK SUPPORT"""
-    print("Starting verification process...")
-    pathfinder_url = "https://api.robinhood.com/pathfinder/user_machine/"
+    logger.info("Starting verification process")
+    pathfinder_url = pathfinder_user_machine_url()
     machine_payload = {'device_id': device_token, 'flow': 'suv', 'input': {'workflow_id': workflow_id}}
     machine_data = _make_request('POST', pathfinder_url, json=machine_payload)
 
     machine_id = _get_sheriff_id(machine_data)
-    inquiries_url = f"https://api.robinhood.com/pathfinder/inquiries/{machine_id}/user_view/"
+    inquiries_url = pathfinder_inquiry_url(machine_id)
 
     start_time = time.time()
     
@@ -45,7 +51,7 @@ def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback
         inquiries_response = _make_request('GET', inquiries_url)
 
         if not inquiries_response:  # Handle case where response is None
-            print("Error: No response from Robinhood API. Retrying...")
+            logger.warning("No response from Robinhood API, retrying")
             continue
 
         if "context" in inquiries_response and "sheriff_challenge" in inquiries_response["context"]:
@@ -54,16 +60,16 @@ def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback
             challenge_status = challenge["status"]
             challenge_id = challenge["id"]
             if challenge_type == "prompt":
-                print("Check robinhood app for device approvals method...")
+                logger.info("Check the Robinhood app to approve this device")
                 
                 # Use callback for app prompt if available
                 if challenge_callback:
                     try:
                         challenge_callback("prompt", "Check your Robinhood mobile app and approve this login request")
                     except Exception as e:
-                        print(f"Challenge callback failed: {e}")
+                        logger.warning("Challenge callback failed: %s", e)
                 
-                prompt_url = f"https://api.robinhood.com/push/{challenge_id}/get_prompts_status/"
+                prompt_url = prompt_status_url(challenge_id)
                 while True:
                     time.sleep(5)
                     prompt_challenge_status = _make_request('GET', prompt_url)
@@ -72,7 +78,7 @@ def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback
                 break
 
             if challenge_status == "validated":
-                print("Verification successful!")
+                logger.info("Verification successful")
                 break  # Stop polling once verification is complete
 
             if challenge_type in ["sms", "email"] and challenge_status == "issued":
@@ -82,38 +88,35 @@ def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback
                 else:
                     user_code = input(f"Enter the {challenge_type} verification code sent to your device: ")
                     
-                challenge_url = f"https://api.robinhood.com/challenge/{challenge_id}/respond/"
                 challenge_payload = {"response": user_code}
-                challenge_response = _make_request('POST', challenge_url, data=challenge_payload)
+                challenge_response = _make_request('POST', challenge_url(challenge_id), data=challenge_payload)
 
                 if challenge_response.get("status") == "validated":
                     break
 
     # **Now poll the workflow status to confirm final approval**
-    inquiries_url = f"https://api.robinhood.com/pathfinder/inquiries/{machine_id}/user_view/"
-    
     retry_attempts = 5  # Allow up to 5 retries in case of 500 errors
     while time.time() - start_time < 120:  # 2-minute timeout 
         try:
             inquiries_payload = {"sequence": 0, "user_input": {"status": "continue"}}
             inquiries_response = _make_request('POST', inquiries_url, json=inquiries_payload)
             if "type_context" in inquiries_response and inquiries_response["type_context"]["result"] == "workflow_status_approved":
-                print("Verification successful!")
+                logger.info("Verification successful")
                 return
             else:
                 time.sleep(5)  # **Increase delay between requests to prevent rate limits**
         except Exception as e:
             time.sleep(5)
-            print(f"API request failed: {e}")
+            logger.warning("Workflow status request failed: %s", e)
             retry_attempts -= 1
             if retry_attempts == 0:
                 raise TimeoutError("Max retries reached. Assuming login approved and proceeding.")
-            print("Retrying workflow status check...")
+            logger.info("Retrying workflow status check")
             continue
 
         if not inquiries_response:  # Handle None response
             time.sleep(5)
-            print("Error: No response from Robinhood API. Retrying...")
+            logger.warning("No response from Robinhood API, retrying")
             retry_attempts -= 1
             if retry_attempts == 0:
                 raise TimeoutError("Max retries reached. Assuming login approved and proceeding.")
@@ -122,10 +125,10 @@ def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback
         workflow_status = inquiries_response.get("verification_workflow", {}).get("workflow_status")
 
         if workflow_status == "workflow_status_approved":
-            print("Workflow status approved! Proceeding with login...")
+            logger.info("Workflow status approved, proceeding with login")
             return
         elif workflow_status == "workflow_status_internal_pending":
-            print("Still waiting for Robinhood to finalize login approval...")
+            logger.info("Waiting for Robinhood to finalize login approval")
         else:
             retry_attempts -= 1
             if retry_attempts == 0:
@@ -134,16 +137,10 @@ def _validate_sheriff_id(device_token: str, workflow_id: str, challenge_callback
     raise TimeoutError("Timeout reached. Assuming login is approved and proceeding.")
 
 
-def login_and_get_token(username: str, password: str, mfa_code: Optional[str] = None, 
-                        challenge_code: Optional[str] = None,
-                        challenge_callback: Optional[Callable[[str, str], str]] = None) -> Optional[str]:
-    """EXACT COPY OF WORKING ORIGINAL LOGIN LOGIC"""
-    print("Starting login process...")
-    device_token = _generate_device_token()
-    
-    # EXACT PAYLOAD FROM WORKING ORIGINAL
+def _login_payload(username: str, password: str, mfa_code: Optional[str], device_token: str) -> Dict[str, Any]:
+    """EXACT PAYLOAD FROM WORKING ORIGINAL"""
     login_payload = {
-        'client_id': 'c82SH0WZOsabOXGP2sxqcj34FxkvfnWRZBKlBjFS',
+        'client_id': CLIENT_ID,
         'expires_in': 86400,
         'grant_type': 'password',
         'password': password,
@@ -157,64 +154,136 @@ def login_and_get_token(username: str, password: str, mfa_code: Optional[str] =
 
     if mfa_code:
         login_payload['mfa_code'] = mfa_code
+    return login_payload
 
-    url = login_url()
-    
-    # EXACT LOGIC FROM WORKING ORIGINAL - Handle 403 as valid response like original
+
+def _post_login(url: str, login_payload: Dict[str, Any], reattempt: bool = False) -> Optional[Dict[str, Any]]:
+    """Posts the login payload - Handle 403 as valid response like original
+
+    A 403 carries the verification workflow on the first attempt, so its body is returned
+    when it has one (or always, on the reattempt after verification).
+    """
+    attempt = "Login reattempt" if reattempt else "Login"
     try:
-        data = _make_request('POST', url, json=login_payload)
+        return _make_request('POST', url, json=login_payload)
     except Exception as e:
-        # Check if this is a 403 with verification workflow (like original handles)
-        if hasattr(e, '__cause__') and hasattr(e.__cause__, 'response'):
-            error_response = e.__cause__.response
-            if error_response.status_code == 403:
-                try:
-                    data = error_response.json()
-                    if 'verification_workflow' not in data:
-                        print(f"403 error without verification workflow: {data}")
-                        return None
-                except:
-                    print("403 error - could not parse response")
-                    return None
-            else:
-                print(f"Login request failed: {e}")
-                return None
-        else:
-            print(f"Login request failed: {e}")
+        error_response = getattr(e.__cause__, 'response', None)
+        if error_response is None or error_response.status_code != 403:
+            logger.warning("%s failed: %s", attempt, e)
+            return None
+        try:
+            data = error_response.json()
+        except ValueError:
+            logger.warning("%s returned 403 with an unparseable body", attempt)
+            return None
+        if not reattempt and 'verification_workflow' not in data:
+            logger.warning("Login returned 403 without a verification workflow: %s", data)
             return None
+        return data
+
+
+def _login(username: str, password: str, mfa_code: Optional[str] = None,
+           challenge_callback: Optional[Callable[[str, str], str]] = None,
+           device_token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """EXACT COPY OF WORKING ORIGINAL LOGIN LOGIC, returning the whole token response"""
+    logger.info("Starting login process")
+    device_token = device_token or _generate_device_token()
+    login_payload = _login_payload(username, password, mfa_code, device_token)
+    url = login_url()
 
+    data = _post_login(url, login_payload)
     if data:
         try:
             if 'verification_workflow' in data:
-                print("Verification required, handling challenge...")
+                logger.info("Verification required, handling challenge")
                 workflow_id = data['verification_workflow']['id']
                 _validate_sheriff_id(device_token, workflow_id, challenge_callback)
 
                 # Reattempt login after verification - EXACT FROM ORIGINAL
-                try:
-                    data = _make_request('POST', url, json=login_payload)
-                except Exception as e:
-                    # Handle 403 as valid response during reattempt too
-                    if hasattr(e, '__cause__') and hasattr(e.__cause__, 'response'):
-                        error_response = e.__cause__.response
-                        if error_response.status_code == 403:
-                            try:
-                                data = error_response.json()
-                            except:
-                                print("Reattempt: 403 error - could not parse response")
-                                data = None
-                        else:
-                            print(f"Reattempt failed: {e}")
-                            data = None
-                    else:
-                        print(f"Reattempt failed: {e}")
-                        data = None
-
-            if 'access_token' in data:
-                print("LOGIN SUCCESS!")
-                return data['access_token']  # Return just the token for stateless operation
+                data = _post_login(url, login_payload, reattempt=True)
+
+            if data and 'access_token' in data:
+                logger.info("Login successful")
+                return _with_expiry(dict(data, device_token=device_token))
 
         except Exception as e:
-            print(f"Error during login verification: {e}")
+            logger.warning("Error during login verification: %s", e)
+
+    return None
+
+
+def _with_expiry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds ``expires_at`` (epoch seconds) computed from ``expires_in``"""
+    if data.get('expires_in') is not None:
+        data['expires_at'] = time.time() + float(data['expires_in'])
+    return data
+
+
+@traced
+def login_and_get_token(username: str, password: str, mfa_code: Optional[str] = None, 
+                        challenge_code: Optional[str] = None,
+                        challenge_callback: Optional[Callable[[str, str], str]] = None) -> Optional[str]:
+    """EXACT COPY OF WORKING ORIGINAL LOGIN LOGIC"""
+    data = _login(username, password, mfa_code, challenge_callback)
+    return data['access_token'] if data else None  # Return just the token for stateless operation
+
+
+@traced
+def login_and_get_token_data(username: str, password: str, mfa_code: Optional[str] = None,
+                             challenge_callback: Optional[Callable[[str, str], str]] = None,
+                             device_token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Logs in like :func:`login_and_get_token` but returns everything needed to keep the session alive
+
+    :param username: The Robinhood username
+    :type username: str
+    :param password: The Robinhood password
+    :type password: str
+    :param mfa_code: The MFA code if the account uses an authenticator app
+    :type mfa_code: Optional[str]
+    :param challenge_callback: Called as ``callback(challenge_type, message)`` during device verification
+    :type challenge_callback: Optional[Callable[[str, str], str]]
+    :param device_token: A device token from an earlier login. Reusing it avoids new device verification
+    :type device_token: Optional[str]
+    :returns: The token response (access_token, refresh_token, expires_in, token_type, scope) plus
+        ``device_token`` and ``expires_at`` in epoch seconds, or None if the login failed
+    """
+    return _login(username, password, mfa_code, challenge_callback, device_token)
+
+
+@traced
+def refresh_token_data(refresh_token: str, device_token: Optional[str] = None, scope: str = 'internal',
+                       expires_in: int = 86400) -> Optional[Dict[str, Any]]:
+    """Exchanges a refresh token for a new access token without a password login or device verification
+
+    :param refresh_token: The refresh token from :func:`login_and_get_token_data` or an earlier refresh
+    :type refresh_token: str
+    :param device_token: The device token of the original login
+    :type device_token: Optional[str]
+    :param scope: The OAuth scope to request
+    :type scope: str
+    :param expires_in: The requested lifetime of the new access token in seconds
+    :type expires_in: int
+    :returns: The new token data like :func:`login_and_get_token_data`, or None if the refresh token was rejected
+    """
+    payload = {
+        'client_id': CLIENT_ID,
+        'expires_in': expires_in,
+        'grant_type': 'refresh_token',
+        'refresh_token': refresh_token,
+        'scope': scope,
+    }
+    if device_token:
+        payload['device_token'] = device_token
+
+    try:
+        data = _make_request('POST', login_url(), json=payload)
+    except Exception as e:
+        logger.warning("Token refresh failed: %s", e)
+        return None
 
-    return None
\ No newline at end of file
+    if not data or 'access_token' not in data:
+        logger.warning("Token refresh returned no access token")
+        return None
+    if device_token:
+        data['device_token'] = device_token
+    return _with_expiry(dict(data))
@@ -0,0 +1,487 @@
+"""Client-side bracket and OCO orders
+
+Robinhood has no linked orders, so this module emulates them on the client. A
+bracket places a parent order, waits for it to fill, then places a take-profit
+limit leg and a stop leg for the filled quantity. As soon as either leg fills
+the other one is cancelled (one-cancels-other).
+
+Every bracket's state lives in a small JSON journal that is rewritten
+atomically on each change, so a restarted process resumes where it left off.
+All positions share one :class:`~robin_stocks.robinhood.tracker.OrderTracker`,
+so fills are observed with batched polling instead of a thread per position.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from .orders import OrderStateUnknownError, _find_order_by_ref_id, order, cancel_stock_order
+from .tracker import OrderTracker
+from .urls import orders_url
+
+logger = logging.getLogger(__name__)
+
+# Bracket lifecycle
+PENDING_ENTRY = 'pending_entry'
+ACTIVE = 'active'
+CLOSED = 'closed'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+FINAL_STATUSES = {CLOSED, CANCELLED, FAILED}
+
+_LEGS = ('take_profit', 'stop_loss')
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _ref_id(bracket_id: str, role: str) -> str:
+    """Deterministic ref_id per bracket order so resubmissions stay idempotent"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'bracket/{bracket_id}/{role}'))
+
+
+def _opposite(side: str) -> str:
+    return 'sell' if side == 'buy' else 'buy'
+
+
+class BracketEngine:
+    """Places and supervises bracket and OCO orders for one account.
+
+    :param access_token: The access token for authentication
+    :type access_token: str
+    :param journal_path: Path of the JSON journal holding bracket state across restarts
+    :type journal_path: str
+    :param tracker: An existing order tracker to share; one is created if omitted
+    :type tracker: Optional[OrderTracker]
+    :param tracker_kwargs: Options forwarded to :class:`OrderTracker` when it is created here
+    """
+
+    def __init__(self, access_token: str, journal_path: str, tracker: Optional[OrderTracker] = None,
+                 **tracker_kwargs):
+        self.access_token = access_token
+        self.journal_path = journal_path
+        self.tracker = tracker or OrderTracker(access_token, **tracker_kwargs)
+        self._lock = threading.RLock()
+        # Serializes journal writes; snapshots are numbered so an older one never replaces a newer one
+        self._write_lock = threading.Lock()
+        self._snapshot = 0
+        self._written = 0
+        self._brackets: Dict[str, Dict[str, Any]] = {}
+        self._order_index: Dict[str, tuple] = {}
+
+        self.tracker.on(None, self._on_event)
+        self._load()
+        self.recover()
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        """Loads the journal and re-watches every order of unfinished brackets"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r') as f:
+            data = json.load(f)
+
+        with self._lock:
+            self._brackets = data.get('brackets', {})
+            for bracket_id, bracket in self._brackets.items():
+                if bracket['status'] == PENDING_ENTRY and bracket.get('parent_order_id'):
+                    self._watch(bracket_id, 'parent', bracket['parent_order_id'])
+                elif bracket['status'] == ACTIVE:
+                    for leg in _LEGS:
+                        leg_state = bracket['legs'].get(leg)
+                        if leg_state and leg_state.get('order_id') and not leg_state.get('done'):
+                            self._watch(bracket_id, leg, leg_state['order_id'])
+
+    def _save(self) -> None:
+        """Atomically rewrites the journal"""
+        with self._lock:
+            payload = json.dumps({'brackets': self._brackets}, indent=2, sort_keys=True)
+            self._snapshot += 1
+            snapshot = self._snapshot
+        with self._write_lock:
+            if snapshot <= self._written:
+                return
+            tmp_path = f"{self.journal_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+            self._written = snapshot
+
+    def _watch(self, bracket_id: str, role: str, order_id: str, order_data: Optional[Dict] = None) -> None:
+        self._order_index[order_id] = (bracket_id, role)
+        self.tracker.watch(order_id, 'stock', order_data)
+
+    # ------------------------------------------------------------------
+    # Placing
+    # ------------------------------------------------------------------
+
+    def _submit(self, symbol: str, quantity: float, side: str, ref_id: str, **kwargs) -> Tuple[Optional[Dict], bool]:
+        """Submits one order outside the lock. Returns the order, and whether its fate is unknown."""
+        try:
+            placed = order(self.access_token, symbol, quantity, side, ref_id=ref_id, **kwargs)
+        except OrderStateUnknownError as e:
+            logger.warning("Order %s may or may not exist, it is looked up on recovery: %s", ref_id, e)
+            return None, True
+        except Exception as e:
+            logger.error("Order %s for %s failed: %s", ref_id, symbol, e)
+            return None, False
+        return (placed if placed and placed.get('id') else None), False
+
+    def _cancel_order(self, order_id: str) -> None:
+        try:
+            cancel_stock_order(self.access_token, order_id)
+        except Exception as e:
+            logger.error("Could not cancel order %s: %s", order_id, e)
+
+    def place_bracket(self, symbol: str, quantity: float, take_profit: float, stop_loss: float,
+                      side: str = 'buy', price: Optional[float] = None,
+                      time_in_force: str = 'gtc', extended_hours: bool = False) -> Optional[str]:
+        """Submits a parent order and arms take-profit and stop legs for when it fills.
+
+        The bracket is journaled before the parent order is sent, so a crash in between leaves a
+        pending bracket that :meth:`recover` resolves by the parent's ref_id.
+
+        :param symbol: The stock ticker
+        :type symbol: str
+        :param quantity: The number of shares of the parent order
+        :type quantity: float
+        :param take_profit: Limit price of the take-profit leg
+        :type take_profit: float
+        :param stop_loss: Stop price of the stop leg
+        :type stop_loss: float
+        :param side: Side of the parent order, 'buy' or 'sell'. The legs use the opposite side.
+        :type side: str
+        :param price: Limit price of the parent order. A market order is sent when omitted.
+        :type price: Optional[float]
+        :param time_in_force: Time in force of the parent order and both legs
+        :type time_in_force: str
+        :param extended_hours: Whether the parent order may execute during extended hours
+        :type extended_hours: bool
+        :returns: The bracket id, or None if the parent order could not be placed. When the outcome
+            of the submission is unknown the bracket id is returned and the bracket stays pending.
+        """
+        bracket_id = str(uuid.uuid4())
+        bracket = {
+            'id': bracket_id,
+            'symbol': symbol.upper().strip(),
+            'side': side,
+            'quantity': quantity,
+            'take_profit': take_profit,
+            'stop_loss': stop_loss,
+            'time_in_force': time_in_force,
+            'status': PENDING_ENTRY,
+            'parent_order_id': None,
+            'parent_ref_id': _ref_id(bracket_id, 'parent'),
+            'filled_quantity': 0.0,
+            'legs': {},
+            'exit': None,
+            'created_at': _now(),
+            'updated_at': _now(),
+        }
+        with self._lock:
+            self._brackets[bracket_id] = bracket
+        self._save()
+
+        parent, unknown = self._submit(bracket['symbol'], quantity, side, bracket['parent_ref_id'], price=price,
+                                       time_in_force=time_in_force, extended_hours=extended_hours)
+        with self._lock:
+            if parent:
+                bracket['parent_order_id'] = parent['id']
+                self._watch(bracket_id, 'parent', parent['id'], parent)
+            elif not unknown:
+                bracket['status'] = FAILED
+            bracket['updated_at'] = _now()
+        self._save()
+        return bracket_id if parent or unknown else None
+
+    def place_oco(self, symbol: str, quantity: float, take_profit: float, stop_loss: float,
+                  side: str = 'sell', time_in_force: str = 'gtc') -> Optional[str]:
+        """Places a take-profit and a stop order on an existing position as an OCO pair.
+
+        :param symbol: The stock ticker
+        :type symbol: str
+        :param quantity: The number of shares covered by each leg
+        :type quantity: float
+        :param take_profit: Limit price of the take-profit leg
+        :type take_profit: float
+        :param stop_loss: Stop price of the stop leg
+        :type stop_loss: float
+        :param side: Side of both legs, 'sell' to close a long position or 'buy' to close a short one
+        :type side: str
+        :param time_in_force: Time in force of both legs
+        :type time_in_force: str
+        :returns: The bracket id, or None if no leg could be placed
+        """
+        bracket_id = str(uuid.uuid4())
+        bracket = {
+            'id': bracket_id,
+            'symbol': symbol.upper().strip(),
+            'side': _opposite(side),
+            'quantity': quantity,
+            'take_profit': take_profit,
+            'stop_loss': stop_loss,
+            'time_in_force': time_in_force,
+            'status': ACTIVE,
+            'parent_order_id': None,
+            'filled_quantity': quantity,
+            'legs': {},
+            'exit': None,
+            'created_at': _now(),
+            'updated_at': _now(),
+        }
+        with self._lock:
+            self._brackets[bracket_id] = bracket
+            self._journal_legs(bracket_id, quantity)
+        self._save()
+        self._submit_legs(bracket_id)
+        return bracket_id if bracket['status'] == ACTIVE else None
+
+    def _journal_legs(self, bracket_id: str, quantity: float) -> None:
+        """Records both exit legs with their ref_ids before they are submitted. Call with the lock held."""
+        bracket = self._brackets[bracket_id]
+        for leg in _LEGS:
+            bracket['legs'][leg] = {'order_id': None, 'ref_id': _ref_id(bracket_id, leg), 'quantity': quantity,
+                                    'done': False, 'filled_quantity': 0.0, 'submitted_at': _now()}
+        bracket['updated_at'] = _now()
+
+    def _submit_legs(self, bracket_id: str) -> None:
+        """Submits the journaled legs that have no order yet, without holding the lock"""
+        with self._lock:
+            bracket = self._brackets.get(bracket_id)
+            if bracket is None or bracket['status'] != ACTIVE:
+                return
+            pending = {leg: dict(leg_state) for leg, leg_state in bracket['legs'].items()
+                       if leg_state['order_id'] is None and not leg_state['done']}
+            symbol, exit_side = bracket['symbol'], _opposite(bracket['side'])
+            prices = {'take_profit': {'price': bracket['take_profit']},
+                      'stop_loss': {'stop_price': bracket['stop_loss']}}
+            time_in_force = bracket['time_in_force']
+
+        results = {leg: self._submit(symbol, leg_state['quantity'], exit_side, leg_state['ref_id'],
+                                     time_in_force=time_in_force, **prices[leg])
+                   for leg, leg_state in pending.items()}
+
+        cancels = []
+        with self._lock:
+            for leg, (leg_order, unknown) in results.items():
+                leg_state = bracket['legs'][leg]
+                if leg_order:
+                    leg_state['order_id'] = leg_order['id']
+                    if bracket['status'] != ACTIVE or bracket['exit'] is not None:
+                        # Cancelled, or the sibling filled, while this leg was in flight
+                        cancels.append(leg_order['id'])
+                        leg_state['done'] = True
+                    else:
+                        self._watch(bracket_id, leg, leg_order['id'], leg_order)
+                elif not unknown:
+                    logger.error("Bracket %s: could not place %s leg for %s", bracket_id, leg, symbol)
+                    leg_state['done'] = True
+
+            if bracket['status'] == ACTIVE and all(leg_state['done'] and not leg_state['order_id']
+                                                   for leg_state in bracket['legs'].values()):
+                bracket['status'] = FAILED
+            bracket['updated_at'] = _now()
+        self._save()
+        for order_id in cancels:
+            self._cancel_order(order_id)
+
+    def cancel(self, bracket_id: str) -> bool:
+        """Cancels every open order of a bracket.
+
+        :param bracket_id: The id returned by :meth:`place_bracket` or :meth:`place_oco`
+        :type bracket_id: str
+        :returns: True if the bracket existed and was not already finished
+        """
+        with self._lock:
+            bracket = self._brackets.get(bracket_id)
+            if not bracket or bracket['status'] in FINAL_STATUSES:
+                return False
+
+            order_ids = []
+            if bracket['status'] == PENDING_ENTRY and bracket['parent_order_id']:
+                order_ids.append(bracket['parent_order_id'])
+            for leg_state in bracket['legs'].values():
+                if leg_state['order_id'] and not leg_state['done']:
+                    order_ids.append(leg_state['order_id'])
+            bracket['status'] = CANCELLED
+            bracket['updated_at'] = _now()
+        self._save()
+        for order_id in order_ids:
+            self._cancel_order(order_id)
+        return True
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def _find_by_ref_id(self, ref_id: str, submitted_at: str) -> Optional[Dict[str, Any]]:
+        not_before = datetime.fromisoformat(submitted_at) - timedelta(minutes=5)
+        lookup_url = orders_url(start_date=not_before.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+        return _find_order_by_ref_id(self.access_token, lookup_url, ref_id, not_before)
+
+    def recover(self) -> None:
+        """Resolves orders that were journaled but whose submission outcome is unknown.
+
+        Pending parents are looked up by ref_id and watched when found; a parent that never reached
+        the server fails its bracket. Journaled legs that never reached the server are submitted.
+        A lookup that fails leaves the order pending for the next call. Runs when the engine loads.
+        """
+        with self._lock:
+            parents = [(bracket_id, bracket['parent_ref_id'], bracket['created_at'])
+                       for bracket_id, bracket in self._brackets.items()
+                       if bracket['status'] in (PENDING_ENTRY, CANCELLED) and not bracket['parent_order_id']
+                       and bracket.get('parent_ref_id') and not bracket.get('parent_resolved')]
+            legs = [(bracket_id, leg, leg_state['ref_id'], leg_state['submitted_at'])
+                    for bracket_id, bracket in self._brackets.items() if bracket['status'] == ACTIVE
+                    for leg, leg_state in bracket['legs'].items()
+                    if leg_state.get('ref_id') and not leg_state['order_id'] and not leg_state['done']]
+
+        cancels = []
+        for bracket_id, ref_id, created_at in parents:
+            try:
+                parent = self._find_by_ref_id(ref_id, created_at)
+            except Exception as e:
+                logger.warning("Bracket %s: parent lookup failed, retrying on the next recovery: %s", bracket_id, e)
+                continue
+            with self._lock:
+                bracket = self._brackets[bracket_id]
+                bracket['parent_resolved'] = True
+                if parent:
+                    bracket['parent_order_id'] = parent['id']
+                    if bracket['status'] == CANCELLED:
+                        cancels.append(parent['id'])
+                    else:
+                        self._watch(bracket_id, 'parent', parent['id'])
+                elif bracket['status'] == PENDING_ENTRY:
+                    logger.warning("Bracket %s: parent order %s never reached the server", bracket_id, ref_id)
+                    bracket['status'] = FAILED
+                bracket['updated_at'] = _now()
+
+        resubmit = set()
+        for bracket_id, leg, ref_id, submitted_at in legs:
+            try:
+                leg_order = self._find_by_ref_id(ref_id, submitted_at)
+            except Exception as e:
+                logger.warning("Bracket %s: %s leg lookup failed, retrying on the next recovery: %s",
+                               bracket_id, leg, e)
+                continue
+            with self._lock:
+                if leg_order:
+                    self._brackets[bracket_id]['legs'][leg]['order_id'] = leg_order['id']
+                    self._watch(bracket_id, leg, leg_order['id'])
+                else:
+                    resubmit.add(bracket_id)
+
+        if parents or legs:
+            self._save()
+        for order_id in cancels:
+            self._cancel_order(order_id)
+        for bracket_id in resubmit:
+            self._submit_legs(bracket_id)
+
+    # ------------------------------------------------------------------
+    # Event handling
+    # ------------------------------------------------------------------
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        # Decide under the lock, send orders and cancels after releasing it so one bracket's
+        # network calls do not stall every other bracket
+        submit_legs, cancels = None, []
+        with self._lock:
+            key = self._order_index.get(event['order_id'])
+            if key is None:
+                return
+            bracket_id, role = key
+            bracket = self._brackets.get(bracket_id)
+            if bracket is None:
+                return
+
+            if role == 'parent':
+                if self._on_parent_event(bracket_id, bracket, event):
+                    submit_legs = bracket_id
+            else:
+                cancels = self._on_leg_event(bracket, role, event)
+
+            if event['type'] != 'partial_fill':
+                self._order_index.pop(event['order_id'], None)
+            bracket['updated_at'] = _now()
+        self._save()
+        for order_id in cancels:
+            self._cancel_order(order_id)
+        if submit_legs:
+            self._submit_legs(submit_legs)
+
+    def _on_parent_event(self, bracket_id: str, bracket: Dict[str, Any], event: Dict[str, Any]) -> bool:
+        """Updates a bracket for a parent event and returns True when its legs must be placed"""
+        bracket['filled_quantity'] = event['filled_quantity']
+        if event['type'] == 'partial_fill' or bracket['status'] != PENDING_ENTRY:
+            return False
+
+        if event['filled_quantity'] > 0:
+            # Fully filled, or cancelled/rejected after a partial fill: protect what was filled
+            bracket['status'] = ACTIVE
+            self._journal_legs(bracket_id, event['filled_quantity'])
+            return True
+        if event['type'] == 'cancel':
+            bracket['status'] = CANCELLED
+        else:
+            bracket['status'] = FAILED
+        return False
+
+    def _on_leg_event(self, bracket: Dict[str, Any], leg: str, event: Dict[str, Any]) -> List[str]:
+        """Updates a bracket for a leg event and returns the order ids to cancel"""
+        leg_state = bracket['legs'][leg]
+        leg_state['filled_quantity'] = event['filled_quantity']
+        if event['type'] != 'partial_fill':
+            leg_state['done'] = True
+
+        cancels = []
+        if event['type'] in ('fill', 'partial_fill') and bracket['exit'] is None:
+            # One-cancels-other: the first fill on either leg retires its sibling. A partially
+            # filled leg keeps working its remaining quantity.
+            bracket['exit'] = leg
+            sibling = bracket['legs'].get('stop_loss' if leg == 'take_profit' else 'take_profit')
+            if sibling and sibling['order_id'] and not sibling['done']:
+                cancels.append(sibling['order_id'])
+
+        if all(leg_state['done'] for leg_state in bracket['legs'].values()):
+            bracket['status'] = CLOSED if bracket['exit'] else CANCELLED
+        return cancels
+
+    # ------------------------------------------------------------------
+    # Inspection and run loop
+    # ------------------------------------------------------------------
+
+    def get_bracket(self, bracket_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a copy of a bracket's journaled state"""
+        with self._lock:
+            bracket = self._brackets.get(bracket_id)
+            return json.loads(json.dumps(bracket)) if bracket else None
+
+    def open_brackets(self) -> List[Dict[str, Any]]:
+        """Returns copies of every bracket that is not finished yet"""
+        with self._lock:
+            return [json.loads(json.dumps(bracket)) for bracket in self._brackets.values()
+                    if bracket['status'] not in FINAL_STATUSES]
+
+    def run(self, until_idle: bool = True) -> None:
+        """Supervises brackets in the calling thread, see :meth:`OrderTracker.run`"""
+        self.tracker.run(until_idle=until_idle)
+
+    def start(self) -> None:
+        """Supervises brackets on a background thread"""
+        self.tracker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops background supervision. Open brackets stay in the journal."""
+        self.tracker.stop(timeout)
@@ -0,0 +1,149 @@
+"""Response cache for slow-moving GET endpoints
+
+Decoded GET responses are kept in a size-bounded LRU for a time-to-live chosen
+by the first matching URL pattern. Endpoints that match no pattern are never
+cached, so quotes, orders and positions always go to the server. With
+stale-while-revalidate an expired entry is still served for a grace period
+while a background thread refreshes it.
+
+Entries are keyed like coalesced requests (method, URL, parameters and a
+digest of the access token) so accounts never see each other's data.
+
+Install a cache with :func:`robin_stocks.robinhood.helper.set_response_cache`.
+"""
+
+import copy
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (URL regex, TTL in seconds). The first match wins.
+DEFAULT_TTL_POLICIES: List[Tuple[str, float]] = [
+    (r'/markets/[^/]+/hours/', 3600.0),
+    (r'/markets/', 3600.0),
+    (r'nummus\.robinhood\.com/currency_pairs/', 3600.0),
+    (r'/instruments/[^/]+/splits/', 86400.0),
+    (r'/midlands/ratings/', 3600.0),
+    (r'/fundamentals/', 300.0),
+    (r'/options/chains/', 3600.0),
+    (r'/user/', 600.0),
+]
+
+
+class ResponseCache:
+    """LRU cache of decoded GET responses with per-URL-pattern TTLs.
+
+    :param policies: (URL regex, TTL seconds) pairs, first match wins. Defaults to :data:`DEFAULT_TTL_POLICIES`.
+    :type policies: Optional[list]
+    :param max_entries: Largest number of responses kept before the least recently used is evicted
+    :type max_entries: int
+    :param stale_while_revalidate: Seconds an expired entry may still be served while it is refreshed
+        in the background, 0 to always refetch synchronously
+    :type stale_while_revalidate: float
+    """
+
+    def __init__(self, policies: Optional[List[Tuple[str, float]]] = None, max_entries: int = 1024,
+                 stale_while_revalidate: float = 0.0):
+        self.policies = [(re.compile(pattern), ttl)
+                         for pattern, ttl in (DEFAULT_TTL_POLICIES if policies is None else policies)]
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        """Returns the TTL configured for a URL, or None if it is not cacheable"""
+        for pattern, ttl in self.policies:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    def fetch(self, key: Hashable, url: str, loader: Callable[[], Any]) -> Any:
+        """Returns a cached copy of the response for ``key``, calling ``loader`` when it is missing or expired
+
+        :param key: Identity of the request
+        :param url: The request URL, used to pick the TTL
+        :param loader: Fetches and decodes the response
+        :returns: The decoded response
+        """
+        ttl = self.ttl_for(url)
+        if ttl is None:
+            return loader()
+
+        now = time.monotonic()
+        refresh = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, _, value = entry
+                if now < expires:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return copy.deepcopy(value)
+                if now < expires + self.stale_while_revalidate:
+                    self._entries.move_to_end(key)
+                    self._counters['stale_hits'] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        refresh = True
+                    stale = copy.deepcopy(value)
+                else:
+                    entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+
+        if entry is not None:
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, url, ttl, loader),
+                                 name='robinhood-cache-refresh', daemon=True).start()
+            return stale
+
+        value = loader()
+        self._store(key, url, ttl, value)
+        return value
+
+    def _refresh(self, key: Hashable, url: str, ttl: float, loader: Callable[[], Any]) -> None:
+        try:
+            self._store(key, url, ttl, loader())
+        except Exception as e:
+            logger.warning("Response cache refresh failed for %s: %s", url, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key: Hashable, url: str, ttl: float, value: Any) -> None:
+        if value is None:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, url, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, pattern: Optional[str] = None) -> int:
+        """Drops cached responses whose URL matches ``pattern``, or every response if no pattern is given
+
+        :returns: The number of entries removed
+        """
+        regex = re.compile(pattern) if pattern else None
+        with self._lock:
+            keys = [key for key, (_, url, _) in self._entries.items() if regex is None or regex.search(url)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit, stale hit, miss and eviction counters plus the current size"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        return stats
@@ -0,0 +1,254 @@
+"""Record and replay HTTP exchanges for deterministic offline runs
+
+:class:`CassetteRecorder` is a transport (see
+:func:`robin_stocks.robinhood.helper.set_transport`) that forwards every
+request to the real transport and appends the exchange to a cassette file.
+:class:`CassettePlayer` serves those exchanges back without touching the
+network, as fast as possible or paced by the recorded latencies. Because both
+sit under the request layer, every module works with them unchanged::
+
+    with record('session.jsonl.gz'):
+        stocks.get_quotes(token, ['AAPL'])
+
+    with replay('session.jsonl.gz'):
+        stocks.get_quotes('any-token', ['AAPL'])
+
+Cassettes are JSON lines, gzip compressed when the name ends in ``.gz``.
+Authorization headers are never written, and secret fields in request and
+response bodies (passwords, tokens, MFA codes) are replaced before writing.
+"""
+
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import requests
+from requests.structures import CaseInsensitiveDict
+from . import helper
+
+CASSETTE_VERSION = 1
+
+REDACTED = '***REDACTED***'
+
+# Body fields replaced before an exchange is written
+SECRET_FIELDS = frozenset({
+    'password', 'access_token', 'refresh_token', 'mfa_code', 'device_token', 'token', 'client_secret',
+})
+
+# Request bodies also carry verification codes, e.g. {'response': '123456'} for SMS challenges
+REQUEST_SECRET_FIELDS = SECRET_FIELDS | frozenset({'response', 'challenge_code'})
+
+# Response headers kept in the cassette; the request layer reads nothing else
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+
+class CassetteError(Exception):
+    """Raised when a replayed request has no recorded exchange"""
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def redact(value: Any, fields: Iterable[str] = SECRET_FIELDS) -> Any:
+    """Returns a copy of a JSON-like value with secret fields replaced"""
+    fields = fields if isinstance(fields, frozenset) else frozenset(fields)
+    if isinstance(value, dict):
+        return {key: (REDACTED if key in fields and value[key] is not None else redact(item, fields))
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item, fields) for item in value]
+    return value
+
+
+def _request_key(method: str, url: str, params: Optional[Dict]) -> str:
+    items = sorted((str(key), str(value)) for key, value in (params or {}).items())
+    return json.dumps([method.upper(), url, items])
+
+
+class CassetteRecorder:
+    """Transport that records every exchange to a cassette while forwarding it.
+
+    :param path: Cassette file, truncated when the recorder is created
+    :type path: str
+    :param transport: Transport that actually sends requests, defaults to :func:`helper.http_transport`
+    :param secret_fields: Body field names replaced before writing
+    :type secret_fields: iterable of str
+    """
+
+    def __init__(self, path: str, transport: Optional[Callable[..., requests.Response]] = None,
+                 secret_fields: Iterable[str] = SECRET_FIELDS):
+        self.path = path
+        self.transport = transport or helper.http_transport
+        self.secret_fields = frozenset(secret_fields)
+        self._lock = threading.Lock()
+        self._file = _open(path, 'w')
+        self._write({'version': CASSETTE_VERSION, 'created_at': datetime.now(timezone.utc).isoformat()})
+
+    def __call__(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, data: Optional[Dict] = None,
+                 json: Optional[Dict] = None, params: Optional[Dict] = None, timeout: float = 16) -> requests.Response:
+        started = time.perf_counter()
+        entry = {
+            'method': method,
+            'url': url,
+            'params': params,
+            'body': redact(json if json is not None else data, self.secret_fields | REQUEST_SECRET_FIELDS),
+        }
+        try:
+            response = self.transport(method, url, headers=headers, data=data, json=json,
+                                      params=params, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            entry.update(elapsed=time.perf_counter() - started, error=type(e).__name__, message=str(e))
+            self._write(entry)
+            raise
+
+        entry['elapsed'] = time.perf_counter() - started
+        entry['status'] = response.status_code
+        entry['headers'] = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        entry.update(self._encode_body(response.content))
+        self._write(entry)
+        return response
+
+    def _encode_body(self, content: bytes) -> Dict[str, Any]:
+        if not content:
+            return {'text': ''}
+        try:
+            return {'json': redact(json.loads(content), self.secret_fields)}
+        except ValueError:
+            pass
+        try:
+            return {'text': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            return {'base64': base64.b64encode(content).decode('ascii')}
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, separators=(',', ':'), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        """Flushes and closes the cassette"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class CassettePlayer:
+    """Transport that serves recorded exchanges instead of sending requests.
+
+    Requests are matched on method, URL and query parameters; repeated identical requests
+    receive the recorded responses in order. Once those are used up the last one is served
+    again, which keeps polling loops running.
+
+    :param path: Cassette written by :class:`CassetteRecorder`
+    :type path: str
+    :param speed: None to replay as fast as possible, otherwise a factor applied to the recorded
+        latencies (1.0 real time, 2.0 twice as fast)
+    :type speed: Optional[float]
+    :param strict: Raise :class:`CassetteError` for requests that were never recorded.
+        Otherwise they receive a 404 response.
+    :type strict: bool
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = None, strict: bool = True):
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._exchanges: Dict[str, deque] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self.misses: List[str] = []
+        with _open(path, 'r') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('version') != CASSETTE_VERSION:
+                raise CassetteError(f"Unsupported cassette version in {path}: {header.get('version')}")
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._exchanges[_request_key(entry['method'], entry['url'], entry.get('params'))].append(entry)
+
+    def __call__(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, data: Optional[Dict] = None,
+                 json: Optional[Dict] = None, params: Optional[Dict] = None, timeout: float = 16) -> requests.Response:
+        key = _request_key(method, url, params)
+        with self._lock:
+            queue = self._exchanges.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            else:
+                entry = self._last.get(key)
+            if entry is None:
+                self.misses.append(f'{method} {url}')
+
+        if entry is None:
+            if self.strict:
+                raise CassetteError(f"No recorded exchange for {method} {url} params={params}")
+            return self._response(method, url, {'status': 404, 'json': {'detail': 'Not recorded'}})
+
+        if self.speed:
+            time.sleep(entry.get('elapsed', 0.0) / self.speed)
+
+        if 'error' in entry:
+            error_class = getattr(requests.exceptions, entry['error'], requests.exceptions.ConnectionError)
+            raise error_class(entry.get('message', 'Recorded transport error'))
+        return self._response(method, url, entry)
+
+    @staticmethod
+    def _response(method: str, url: str, entry: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry.get('headers') or {})
+        if 'json' in entry:
+            response._content = json.dumps(entry['json']).encode('utf-8')
+        elif 'base64' in entry:
+            response._content = base64.b64decode(entry['base64'])
+        else:
+            response._content = entry.get('text', '').encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = url
+        try:
+            response.reason = HTTPStatus(response.status_code).phrase
+        except ValueError:
+            response.reason = ''
+        return response
+
+    def remaining(self) -> int:
+        """Number of recorded exchanges not served yet"""
+        with self._lock:
+            return sum(len(queue) for queue in self._exchanges.values())
+
+
+@contextmanager
+def record(path: str, transport: Optional[Callable[..., requests.Response]] = None,
+           secret_fields: Iterable[str] = SECRET_FIELDS):
+    """Records every request made inside the block to ``path``"""
+    previous = helper._transport
+    recorder = CassetteRecorder(path, transport or previous, secret_fields)
+    helper.set_transport(recorder)
+    try:
+        yield recorder
+    finally:
+        helper.set_transport(previous)
+        recorder.close()
+
+
+@contextmanager
+def replay(path: str, speed: Optional[float] = None, strict: bool = True):
+    """Serves every request made inside the block from the cassette at ``path``"""
+    previous = helper._transport
+    player = CassettePlayer(path, speed, strict)
+    helper.set_transport(player)
+    try:
+        yield player
+    finally:
+        helper.set_transport(previous)
+
@@ -0,0 +1,189 @@
+"""Circuit breakers for the request layer
+
+One breaker per host and endpoint group. While the circuit is closed requests
+flow normally and failures are counted. After too many consecutive failures
+the circuit opens and requests fail immediately with :class:`CircuitOpenError`
+instead of waiting out the full timeout. After a cool-down a limited number of
+probe requests are let through (half-open); a success closes the circuit, a
+failure opens it again.
+
+Install a registry with :func:`robin_stocks.robinhood.helper.set_circuit_breakers`.
+Schedulers can read :meth:`CircuitBreakerRegistry.state` or
+:meth:`CircuitBreakerRegistry.is_open` to pause their polling loops.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Callable, Iterable
+from .urls import endpoint_group, endpoint_host
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while its circuit is open"""
+
+    def __init__(self, key: str, retry_in: float):
+        super().__init__(f"Circuit {key} is open, failing fast (retry in {retry_in:.1f}s)")
+        self.key = key
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """A single closed/open/half-open circuit.
+
+    :param failure_threshold: Consecutive failures that open the circuit
+    :type failure_threshold: int
+    :param recovery_timeout: Seconds the circuit stays open before probing
+    :type recovery_timeout: float
+    :param half_open_max_calls: Probe requests allowed at once while half-open
+    :type half_open_max_calls: int
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """The current state, moving from open to half-open once the cool-down has passed"""
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit starts letting probes through"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Reserves permission to send one request. Returns False to fail fast."""
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def release(self) -> None:
+        """Returns a permission from :meth:`allow` whose request was never sent or never completed"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> str:
+        """Records a successful request and returns the resulting state"""
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
+            return self._state
+
+    def record_failure(self) -> str:
+        """Records a failed request and returns the resulting state"""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            return self._state
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by host and endpoint group.
+
+    :param failure_threshold: Consecutive failures that open a circuit
+    :type failure_threshold: int
+    :param recovery_timeout: Seconds a circuit stays open before probing
+    :type recovery_timeout: float
+    :param half_open_max_calls: Probe requests allowed at once while half-open
+    :type half_open_max_calls: int
+    :param failure_statuses: HTTP status codes counted as failures. Client errors such as 400 or 404
+        say nothing about the health of the endpoint and are not counted.
+    :type failure_statuses: iterable of int
+    :param on_state_change: Optional callback ``(key, old_state, new_state)``
+    :type on_state_change: Optional[Callable]
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1,
+                 failure_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+                 on_state_change: Optional[Callable[[str, str, str], None]] = None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.failure_statuses = frozenset(failure_statuses)
+        self.on_state_change = on_state_change
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """Returns the breaker key ('host/group') of a URL"""
+        return f'{endpoint_host(url)}/{endpoint_group(url)}'
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """Returns the breaker guarding a URL, creating it on first use"""
+        key = self.key_for(url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout, self.half_open_max_calls)
+                self._breakers[key] = breaker
+            return breaker
+
+    def before_request(self, url: str) -> None:
+        """Raises :class:`CircuitOpenError` if the URL's circuit does not allow a request now"""
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(self.key_for(url), breaker.retry_in())
+
+    def release(self, url: str) -> None:
+        """Gives back the permission reserved by :meth:`before_request` when no outcome was recorded"""
+        self.breaker(url).release()
+
+    def after_request(self, url: str, status_code: Optional[int] = None, error: Optional[Exception] = None) -> None:
+        """Records the outcome of a request. Transport errors and failure statuses count as failures."""
+        breaker = self.breaker(url)
+        old_state = breaker._state
+        if error is not None or (status_code is not None and status_code in self.failure_statuses):
+            new_state = breaker.record_failure()
+        else:
+            new_state = breaker.record_success()
+        if new_state != old_state and self.on_state_change:
+            try:
+                self.on_state_change(self.key_for(url), old_state, new_state)
+            except Exception:
+                logger.exception("Circuit breaker state callback failed")
+
+    def state(self, url: str) -> str:
+        """Returns the state of the circuit guarding a URL"""
+        return self.breaker(url).state
+
+    def is_open(self, url: str) -> bool:
+        """True while requests to the URL would fail fast"""
+        return self.state(url) == OPEN
+
+    def states(self) -> Dict[str, str]:
+        """Returns the state of every known circuit keyed by 'host/group'"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {key: breaker.state for key, breaker in breakers.items()}
@@ -0,0 +1,108 @@
+"""Single-flight coalescing of identical concurrent GET requests
+
+When several threads ask for the same resource at the same moment only the
+first one (the leader) sends the request; the others wait for it and receive
+a copy of its decoded result, or the same exception. Requests are identical
+when method, URL, query parameters and the identity of the access token all
+match, so data is never shared between accounts.
+
+Install a coalescer with :func:`robin_stocks.robinhood.helper.set_coalescer`.
+"""
+
+import copy
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Hashable
+
+
+def token_identity(headers: Optional[Dict[str, str]]) -> Optional[str]:
+    """Returns a digest of the Authorization header so raw tokens are never kept as keys"""
+    if not headers:
+        return None
+    for name, value in headers.items():
+        if name.lower() == 'authorization':
+            return hashlib.sha256(value.encode()).hexdigest()
+    return None
+
+
+def request_key(method: str, url: str, params: Optional[Dict] = None,
+                headers: Optional[Dict[str, str]] = None) -> Hashable:
+    """Builds the key under which identical requests are coalesced"""
+    items = ()
+    if params:
+        items = tuple(sorted((str(k), repr(v)) for k, v in params.items()))
+    return method.upper(), url, items, token_identity(headers)
+
+
+class _Flight:
+    """A request in flight and everyone waiting for it"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Coalescer:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    Every caller receives its own deep copy of the result once it was shared,
+    because callers such as :func:`robin_stocks.robinhood.helper.request_get`
+    modify the decoded response in place.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Runs ``fn`` unless a call with the same key is already in flight, in which case its result is shared
+
+        :param key: Identity of the call, see :func:`request_key`
+        :param fn: Performs the call and returns its result
+        :returns: The result of ``fn``, copied when it was shared
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self.followers += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                shared = flight.waiters > 0
+            flight.done.set()
+
+        return copy.deepcopy(flight.result) if shared else flight.result
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently in flight"""
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of calls sent (leaders) and the number served from another call (followers)"""
+        with self._lock:
+            return {'leaders': self.leaders, 'followers': self.followers}
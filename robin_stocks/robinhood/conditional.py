@@ -0,0 +1,110 @@
+"""Conditional GET support for slowly changing resources
+
+The validators (``ETag`` and ``Last-Modified``) of responses from matching
+URLs are kept together with the decoded body. The next GET of the same
+resource sends ``If-None-Match`` / ``If-Modified-Since``; when the server
+answers ``304 Not Modified`` the stored body is returned without downloading
+or decoding it again. Servers that never send validators are unaffected.
+
+Entries are keyed like coalesced requests, including a digest of the access
+token. Install a store with :func:`robin_stocks.robinhood.helper.set_validator_store`.
+"""
+
+import copy
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from requests import Response
+
+# URLs whose validators are remembered. Only GET responses are ever considered.
+DEFAULT_CONDITIONAL_PATTERNS: List[str] = [
+    r'/instruments/',
+    r'/options/chains/',
+    r'/options/instruments/',
+    r'/watchlists/',
+    r'/documents/',
+    r'/fundamentals/',
+]
+
+NOT_MODIFIED = 304
+
+
+class ValidatorStore:
+    """Validators and decoded bodies of recent GET responses, bounded as an LRU.
+
+    :param patterns: URL regexes eligible for conditional requests, None for every GET
+    :type patterns: Optional[list]
+    :param max_entries: Largest number of resources remembered
+    :type max_entries: int
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = DEFAULT_CONDITIONAL_PATTERNS, max_entries: int = 2048):
+        self.patterns = None if patterns is None else [re.compile(pattern) for pattern in patterns]
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[str], Optional[str], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'not_modified': 0, 'modified': 0}
+
+    def applies_to(self, url: str) -> bool:
+        """True if conditional requests are used for the URL"""
+        return self.patterns is None or any(pattern.search(url) for pattern in self.patterns)
+
+    def prepare(self, key: Hashable, headers: Optional[Dict[str, str]]) -> Tuple[Optional[Dict[str, str]], Any]:
+        """Adds conditional headers for a stored resource
+
+        :returns: The headers to send and the stored entry the response must be resolved against
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return headers, None
+
+        etag, last_modified, _ = entry
+        headers = dict(headers or {})
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers, entry
+
+    def resolve(self, key: Hashable, entry: Any, response: Response, decode: Callable[[Response], Any]) -> Any:
+        """Returns the decoded body of a response, taking it from ``entry`` on 304 Not Modified
+
+        :param key: Identity of the request
+        :param entry: The entry returned by :meth:`prepare`
+        :param response: The HTTP response
+        :param decode: Decodes a full response body
+        """
+        if response.status_code == NOT_MODIFIED and entry is not None:
+            with self._lock:
+                self._counters['not_modified'] += 1
+            return copy.deepcopy(entry[2])
+
+        data = decode(response)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            self._counters['modified'] += 1
+            if etag or last_modified:
+                self._entries[key] = (etag, last_modified, copy.deepcopy(data))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.pop(key, None)
+        return data
+
+    def clear(self) -> None:
+        """Forgets every stored validator"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of 304 and full responses seen plus the current size"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        return stats
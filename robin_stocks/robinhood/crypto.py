@@ -2,6 +2,7 @@
 
 from typing import Dict, List, Any, Optional, Union
 from .helper import _make_request, request_get
+from .tracing import traced
 from .urls import (
     crypto_account_url, crypto_holdings_url, crypto_quote_url,
     crypto_currency_pairs_url, crypto_historical_url, crypto_currency_url
@@ -30,6 +31,7 @@ def get_crypto_positions(access_token: str, info: Optional[str] = None) -> List[
         return positions
     return []
 
+@traced
 def get_crypto_quote(access_token: str, symbol: str, info: Optional[str] = None) -> Optional[Dict]:
     """Get crypto quote by symbol - STATELESS VERSION"""
     # First, get the currency pair ID for this symbol
@@ -72,6 +74,7 @@ def get_crypto_currency_pairs(access_token: str, info: Optional[str] = None) ->
         return pairs
     return []
 
+@traced
 def get_crypto_historicals(access_token: str, symbol: str, interval: str = '5minute', 
                           span: str = 'day', bounds: str = '24_7', info: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get crypto historical data - STATELESS VERSION"""
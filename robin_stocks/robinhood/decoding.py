@@ -0,0 +1,151 @@
+"""JSON decoding backends for the request layer
+
+Response bodies are decoded with the fastest parser available: ``orjson``,
+then ``simdjson`` (pysimdjson), then the standard library. Install the fast
+path with ``pip install robin_stocks[fast]``. Bodies a fast parser rejects,
+such as ones that are not UTF-8, are decoded again with the standard library.
+
+Robinhood sends prices and quantities as strings. A :class:`JSONDecoder`
+can convert the known numeric fields of selected endpoints straight into
+floats or Decimals while decoding. This is off by default because existing
+callers expect strings. Install a decoder with
+:func:`robin_stocks.robinhood.helper.set_json_decoder`.
+"""
+
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, FrozenSet, Iterable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+QUOTE_NUMERIC_FIELDS = frozenset({
+    'ask_price', 'ask_size', 'bid_price', 'bid_size', 'last_trade_price', 'last_extended_hours_trade_price',
+    'last_non_reg_trade_price', 'previous_close', 'adjusted_previous_close', 'mark_price', 'high_price',
+    'low_price', 'open_price', 'volume',
+})
+
+OPTION_MARKET_DATA_NUMERIC_FIELDS = QUOTE_NUMERIC_FIELDS | frozenset({
+    'adjusted_mark_price', 'break_even_price', 'chance_of_profit_long', 'chance_of_profit_short',
+    'delta', 'gamma', 'implied_volatility', 'open_interest', 'rho', 'theta', 'vega',
+    'high_fill_rate_buy_price', 'high_fill_rate_sell_price', 'low_fill_rate_buy_price',
+    'low_fill_rate_sell_price',
+})
+
+CHAIN_NUMERIC_FIELDS = frozenset({'strike_price', 'trade_value_multiplier', 'min_ticks', 'above_tick',
+                                  'below_tick', 'cutoff_price'})
+
+# (URL regex, numeric field names) used when a decoder is created with convert_numbers=True
+DEFAULT_NUMERIC_SCHEMAS: List[Tuple[str, FrozenSet[str]]] = [
+    (r'/marketdata/options/', OPTION_MARKET_DATA_NUMERIC_FIELDS),
+    (r'/marketdata/quotes/|/quotes/', QUOTE_NUMERIC_FIELDS),
+    (r'/options/chains/|/options/instruments/', CHAIN_NUMERIC_FIELDS),
+]
+
+
+def available_backend() -> str:
+    """Returns the name of the fastest JSON backend installed"""
+    if orjson is not None:
+        return 'orjson'
+    if simdjson is not None:
+        return 'simdjson'
+    return 'json'
+
+
+def _loader(backend: str) -> Callable[[bytes], Any]:
+    if backend == 'orjson':
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        return orjson.loads
+    if backend == 'simdjson':
+        if simdjson is None:
+            raise ImportError("pysimdjson is not installed")
+        return simdjson.loads
+    if backend == 'json':
+        return json.loads
+    raise ValueError("backend must be 'auto', 'orjson', 'simdjson' or 'json'")
+
+
+class JSONDecoder:
+    """Decodes response bodies, optionally converting numeric string fields.
+
+    :param backend: 'auto' for the fastest installed parser, or one of 'orjson', 'simdjson', 'json'
+    :type backend: str
+    :param convert_numbers: Convert numeric string fields of the endpoints in ``schemas``
+    :type convert_numbers: bool
+    :param number_type: ``float`` or ``decimal.Decimal``
+    :type number_type: type
+    :param schemas: (URL regex, field names) pairs, first match wins. Defaults to :data:`DEFAULT_NUMERIC_SCHEMAS`.
+    :type schemas: Optional[list]
+    """
+
+    def __init__(self, backend: str = 'auto', convert_numbers: bool = False, number_type: type = float,
+                 schemas: Optional[List[Tuple[str, Iterable[str]]]] = None):
+        self.backend = available_backend() if backend == 'auto' else backend
+        self._loads = _loader(self.backend)
+        if number_type not in (float, Decimal):
+            raise ValueError("number_type must be float or Decimal")
+        self.convert_numbers = convert_numbers
+        self.number_type = number_type
+        self.schemas = [(re.compile(pattern), frozenset(fields))
+                        for pattern, fields in (DEFAULT_NUMERIC_SCHEMAS if schemas is None else schemas)]
+
+    def decode(self, content: bytes, url: Optional[str] = None) -> Any:
+        """Decodes a JSON body
+
+        :param content: The raw body
+        :type content: bytes
+        :param url: The URL the body came from, used to pick the numeric schema
+        :type url: Optional[str]
+        """
+        try:
+            data = self._loads(content)
+        except ValueError:
+            if self.backend == 'json':
+                raise
+            # Non UTF-8 bodies or values outside a fast parser's range
+            data = json.loads(content)
+
+        if self.convert_numbers and url:
+            fields = self._fields_for(url)
+            if fields:
+                data = self._convert(data, fields)
+        return data
+
+    def _fields_for(self, url: str) -> Optional[FrozenSet[str]]:
+        for pattern, fields in self.schemas:
+            if pattern.search(url):
+                return fields
+        return None
+
+    def _convert(self, data: Any, fields: FrozenSet[str]) -> Any:
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if isinstance(value, str):
+                    if key in fields:
+                        data[key] = self._number(value)
+                elif isinstance(value, (dict, list)):
+                    self._convert(value, fields)
+        elif isinstance(data, list):
+            for item in data:
+                if isinstance(item, (dict, list)):
+                    self._convert(item, fields)
+        return data
+
+    def _number(self, value: str) -> Any:
+        try:
+            return self.number_type(value)
+        except (ValueError, InvalidOperation):
+            return value
+
+
+# Decoder used when none is installed: fastest backend, no conversion
+DEFAULT_DECODER = JSONDecoder()
@@ -1,73 +1,235 @@
-"""STATELESS export functions - NO GLOBAL STATE"""
+"""STATELESS export functions - NO GLOBAL STATE
 
-from typing import Dict, List, Any, Optional
+The ``export_completed_*`` functions return completed orders, including
+cancelled orders that partly filled, optionally only those updated since a
+timestamp. :func:`export_orders_incremental` builds on
+them for nightly jobs: it keeps the newest ``updated_at`` seen per account and
+asset class in a small JSON state file, asks only for orders updated since then
+and appends them to one JSON Lines file per account and asset class::
+
+    counts = export_orders_incremental(token, 'exports', account_number='5QR12345')
+
+Stock and option orders are filtered on the server with ``updated_at[gte]``.
+The crypto endpoint has no date filter, so its pagination stops once a page
+only holds orders created well before the watermark.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from urllib.parse import quote
 from .helper import _make_request
 from .urls import orders_url, option_orders_url, crypto_orders_url
 
-# STATELESS REPLACEMENTS for all export functions - NO MORE BLOCKING!
+logger = logging.getLogger(__name__)
+
+COMPLETED_STATES = ('filled', 'confirmed')
+
+ASSET_CLASSES = ('stock', 'option', 'crypto')
+
+# Crypto orders are not filtered on the server; pagination goes back this far past the
+# watermark so good-till-cancelled orders that filled recently are still picked up
+CRYPTO_LOOKBACK = timedelta(days=90)
+
 
-def export_completed_stock_orders(access_token: str) -> List[Dict[str, Any]]:
-    """Exports all completed stock orders - STATELESS VERSION"""
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _has_executions(order: Dict[str, Any]) -> bool:
+    """Whether any part of an order executed, e.g. a partial fill before a cancel"""
+    if order.get('executions'):
+        return True
+    return any(leg.get('executions') for leg in order.get('legs') or [])
+
+
+def _completed_orders(access_token: str, url: str, since: Optional[str] = None,
+                      stop_created_before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Follows ``next`` pages from ``url`` and keeps completed orders updated at or after ``since``"""
     headers = {'Authorization': f'Bearer {access_token}'}
-    
+    since_time = _parse_time(since)
+
     all_orders = []
-    url = orders_url()
-    
     while url:
         response = _make_request('GET', url, headers=headers)
         if not response:
             break
-            
-        if 'results' in response:
-            # Filter for completed orders only
-            completed_orders = [order for order in response['results'] 
-                              if order.get('state') in ['filled', 'confirmed']]
-            all_orders.extend(completed_orders)
-            
-        url = response.get('next')
-    
-    return all_orders
 
-def export_completed_option_orders(access_token: str) -> List[Dict[str, Any]]:
-    """Exports all completed option orders - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
-    all_orders = []
-    url = option_orders_url()
-    
-    while url:
-        response = _make_request('GET', url, headers=headers)
-        if not response:
+        results = response.get('results') or []
+        for order in results:
+            if order.get('state') not in COMPLETED_STATES and not _has_executions(order):
+                continue
+            if since_time is not None and (_parse_time(order.get('updated_at')) or since_time) < since_time:
+                continue
+            all_orders.append(order)
+
+        # Pages are newest first, so once a whole page was created before the cut-off the rest is too
+        if stop_created_before is not None and results and \
+                all((_parse_time(order.get('created_at')) or stop_created_before) < stop_created_before
+                    for order in results):
             break
-            
-        if 'results' in response:
-            # Filter for completed orders only
-            completed_orders = [order for order in response['results'] 
-                              if order.get('state') in ['filled', 'confirmed']]
-            all_orders.extend(completed_orders)
-            
+
         url = response.get('next')
-    
+
     return all_orders
 
-def export_completed_crypto_orders(access_token: str) -> List[Dict[str, Any]]:
-    """Exports all completed crypto orders - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
-    all_orders = []
-    url = crypto_orders_url()
-    
-    while url:
-        response = _make_request('GET', url, headers=headers)
-        if not response:
-            break
-            
-        if 'results' in response:
-            # Filter for completed orders only
-            completed_orders = [order for order in response['results'] 
-                              if order.get('state') in ['filled', 'confirmed']]
-            all_orders.extend(completed_orders)
-            
-        url = response.get('next')
-    
-    return all_orders
\ No newline at end of file
+
+def export_completed_stock_orders(access_token: str, since: Optional[str] = None,
+                                  account_number: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Exports all completed stock orders - STATELESS VERSION
+
+    :param since: Only orders updated at or after this ISO 8601 timestamp
+    :type since: Optional[str]
+    :param account_number: Only orders of this account
+    :type account_number: Optional[str]
+    """
+    start_date = quote(since, safe='') if since else None
+    return _completed_orders(access_token, orders_url(account_number=account_number, start_date=start_date), since)
+
+
+def export_completed_option_orders(access_token: str, since: Optional[str] = None,
+                                   account_number: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Exports all completed option orders - STATELESS VERSION
+
+    :param since: Only orders updated at or after this ISO 8601 timestamp
+    :type since: Optional[str]
+    :param account_number: Only orders of this account
+    :type account_number: Optional[str]
+    """
+    start_date = quote(since, safe='') if since else None
+    return _completed_orders(access_token, option_orders_url(account_number=account_number, start_date=start_date),
+                             since)
+
+
+def export_completed_crypto_orders(access_token: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Exports all completed crypto orders - STATELESS VERSION
+
+    :param since: Only orders updated at or after this ISO 8601 timestamp. Pagination stops
+        :data:`CRYPTO_LOOKBACK` before it, as the endpoint cannot filter by date.
+    :type since: Optional[str]
+    """
+    since_time = _parse_time(since)
+    stop_created_before = since_time - CRYPTO_LOOKBACK if since_time else None
+    return _completed_orders(access_token, crypto_orders_url(), since, stop_created_before)
+
+
+def _load_watermarks(state_path: str) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, 'r') as f:
+        return json.load(f).get('watermarks', {})
+
+
+def _save_watermarks(state_path: str, watermarks: Dict[str, Dict[str, Any]]) -> None:
+    """Atomically rewrites the state file"""
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps({'watermarks': watermarks}, indent=2, sort_keys=True))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, state_path)
+
+
+def _new_orders(orders: List[Dict[str, Any]], watermark: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Drops orders already exported at the watermark and returns the rest oldest first with the new watermark"""
+    since_time = _parse_time(watermark.get('updated_at'))
+    seen = set(watermark.get('ids') or ())
+    undated = [order.get('id') for order in orders if not order.get('updated_at')]
+    if undated:
+        # Without updated_at an order can never fall behind the watermark and would be appended every run
+        logger.warning("Skipped %d orders without updated_at: %s", len(undated), undated)
+    new = [order for order in orders if order.get('updated_at') and
+           (since_time is None or _parse_time(order.get('updated_at')) != since_time or order.get('id') not in seen)]
+    new.sort(key=lambda order: _parse_time(order.get('updated_at')) or datetime.min.replace(tzinfo=timezone.utc))
+    if not new:
+        return new, watermark
+
+    newest = new[-1].get('updated_at')
+    newest_time = _parse_time(newest)
+    ids = [order.get('id') for order in new if _parse_time(order.get('updated_at')) == newest_time]
+    if newest_time == since_time:
+        ids = sorted(seen.union(ids))
+    return new, dict(watermark, updated_at=newest, ids=ids)
+
+
+def export_orders_incremental(access_token: str, output_dir: str, account_number: Optional[str] = None,
+                              asset_classes: Iterable[str] = ASSET_CLASSES,
+                              state_path: Optional[str] = None) -> Dict[str, int]:
+    """Appends the completed orders updated since the previous run to JSON Lines files.
+
+    Each asset class goes to ``<output_dir>/<account>_<asset_class>_orders.jsonl``, oldest first,
+    where account is the account number or 'default'. The watermark of an asset class only moves
+    once its orders are written, so a failed run is repeated in full the next time; records a
+    crashed run appended past the saved watermark are truncated first. An order that is updated
+    again after it was exported is appended again; readers keep the last record per id. Orders
+    without ``updated_at`` are skipped.
+
+    :param access_token: The access token
+    :type access_token: str
+    :param output_dir: Directory of the output files, created if missing
+    :type output_dir: str
+    :param account_number: Only orders of this account. Crypto orders are exported per login.
+    :type account_number: Optional[str]
+    :param asset_classes: Any of 'stock', 'option' and 'crypto'
+    :type asset_classes: iterable of str
+    :param state_path: The watermark file, ``<output_dir>/export_state.json`` by default
+    :type state_path: Optional[str]
+    :returns: Asset classes mapped to the number of orders appended
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = state_path or os.path.join(output_dir, 'export_state.json')
+    watermarks = _load_watermarks(state_path)
+    account = account_number or 'default'
+
+    counts = {}
+    for asset_class in asset_classes:
+        key = f'{account}/{asset_class}'
+        watermark = watermarks.get(key, {})
+        since = watermark.get('updated_at')
+        if asset_class == 'stock':
+            orders = export_completed_stock_orders(access_token, since, account_number)
+        elif asset_class == 'option':
+            orders = export_completed_option_orders(access_token, since, account_number)
+        elif asset_class == 'crypto':
+            orders = export_completed_crypto_orders(access_token, since)
+        else:
+            raise ValueError(f"Unknown asset class: {asset_class}")
+
+        new, watermark = _new_orders(orders, watermark)
+        if new:
+            path = os.path.join(output_dir, f'{account}_{asset_class}_orders.jsonl')
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if 'offset' not in watermark:
+                # Record where this file's committed records end before the first append
+                watermarks[key] = dict(watermarks.get(key, {}), offset=size)
+                _save_watermarks(state_path, watermarks)
+                watermark['offset'] = size
+            elif size > watermark['offset']:
+                logger.warning("Dropping %d bytes a previous run appended to %s without saving its watermark",
+                               size - watermark['offset'], path)
+            with open(path, 'a') as f:
+                f.truncate(min(watermark['offset'], size))
+                for order in new:
+                    f.write(json.dumps(order, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+                watermark['offset'] = f.tell()
+            watermarks[key] = watermark
+            _save_watermarks(state_path, watermarks)
+        counts[asset_class] = len(new)
+        logger.info("Exported %d new %s orders for account %s", len(new), asset_class, account)
+
+    return counts
+
+
+def iter_exported_orders(path: str) -> Iterator[Dict[str, Any]]:
+    """Streams the orders of a file written by :func:`export_orders_incremental`"""
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,230 @@
+"""Fault-injection transport for resilience and tail-latency testing
+
+:class:`FaultInjector` wraps another transport (see
+:func:`robin_stocks.robinhood.helper.set_transport`) and, per URL pattern,
+adds latency drawn from a distribution, hangs until the caller's timeout,
+answers with bursts of 429/5xx responses, truncates JSON bodies or resets the
+connection. With a seed every decision is derived from the seed, the request
+and how often that request was seen, and error bursts are tracked per request,
+so runs are reproducible even when threads interleave differently::
+
+    rules = [
+        FaultRule(r'/orders/', latency=lognormal(0.08, 0.5), error_rate=0.05, burst_length=3),
+        FaultRule(r'/marketdata/|/quotes/', truncate_rate=0.01, reset_rate=0.01),
+    ]
+    with inject(rules, seed=42):
+        ...
+
+Combine it with the benchmark mock server or a replayed cassette to run
+degraded scenarios without touching the live service.
+"""
+
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import requests
+from requests.structures import CaseInsensitiveDict
+from . import helper
+
+Distribution = Callable[[random.Random], float]
+
+
+def fixed(seconds: float) -> Distribution:
+    """Always the same delay"""
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Distribution:
+    """Delay uniformly distributed between ``low`` and ``high`` seconds"""
+    return lambda rng: rng.uniform(low, high)
+
+
+def exponential(mean: float) -> Distribution:
+    """Exponentially distributed delay with the given mean"""
+    return lambda rng: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+
+
+def lognormal(median: float, sigma: float) -> Distribution:
+    """Log-normal delay with the given median, the usual shape of service latency with a long tail"""
+    mu = math.log(median) if median > 0 else 0.0
+    return lambda rng: rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+
+
+class FaultRule:
+    """Faults injected into requests whose URL matches ``pattern``.
+
+    Rates are probabilities per request and are checked in the order: reset, timeout,
+    error status, truncation.
+
+    :param pattern: Regex searched in the request URL
+    :type pattern: str
+    :param methods: HTTP methods the rule applies to, None for all
+    :type methods: Optional[iterable of str]
+    :param latency: Extra delay before the request is sent, drawn from a distribution
+    :type latency: Optional[Callable]
+    :param timeout_rate: Probability that the request hangs and then raises ``requests.exceptions.ReadTimeout``
+    :type timeout_rate: float
+    :param hang: Seconds a timed out request hangs, None for the caller's timeout
+    :type hang: Optional[float]
+    :param error_rate: Probability that an error status starts
+    :type error_rate: float
+    :param error_statuses: Statuses to choose from when an error starts
+    :type error_statuses: sequence of int
+    :param burst_length: Consecutive attempts of the same request (method, URL and params) failing with
+        the same status once an error starts
+    :type burst_length: int
+    :param retry_after: ``Retry-After`` seconds sent with 429 and 503 responses, None to omit the header
+    :type retry_after: Optional[float]
+    :param truncate_rate: Probability that the real response body is cut in half
+    :type truncate_rate: float
+    :param reset_rate: Probability that the connection is reset before a response arrives
+    :type reset_rate: float
+    """
+
+    def __init__(self, pattern: str = '.*', methods: Optional[Iterable[str]] = None,
+                 latency: Optional[Distribution] = None, timeout_rate: float = 0.0, hang: Optional[float] = None,
+                 error_rate: float = 0.0, error_statuses: Sequence[int] = (429, 500, 502, 503, 504),
+                 burst_length: int = 1, retry_after: Optional[float] = None,
+                 truncate_rate: float = 0.0, reset_rate: float = 0.0):
+        self.pattern = re.compile(pattern)
+        self.methods = None if methods is None else frozenset(method.upper() for method in methods)
+        self.latency = latency
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.burst_length = max(1, burst_length)
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.reset_rate = reset_rate
+
+    def matches(self, method: str, url: str) -> bool:
+        return (self.methods is None or method.upper() in self.methods) and bool(self.pattern.search(url))
+
+
+class FaultInjector:
+    """Transport injecting faults described by :class:`FaultRule` objects before delegating.
+
+    The first matching rule applies to a request.
+
+    :param rules: The fault rules
+    :type rules: iterable of FaultRule
+    :param transport: Transport receiving requests that are not failed, defaults to :func:`helper.http_transport`
+    :param seed: Seed making every decision reproducible, None for fresh randomness
+    :type seed: Optional[int]
+    """
+
+    def __init__(self, rules: Iterable[FaultRule], transport: Optional[Callable[..., requests.Response]] = None,
+                 seed: Optional[int] = None):
+        self.rules: List[FaultRule] = list(rules)
+        self.transport = transport or helper.http_transport
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self._bursts: Dict[Tuple[int, str], List] = {}
+        self.counts = {'requests': 0, 'latency': 0, 'timeout': 0, 'error': 0, 'truncated': 0, 'reset': 0}
+
+    @staticmethod
+    def _key(method: str, url: str, params: Optional[Dict]) -> str:
+        return f"{method} {url} {sorted((params or {}).items())}"
+
+    def _rng(self, key: str) -> random.Random:
+        with self._lock:
+            count = self._seen.get(key, 0)
+            self._seen[key] = count + 1
+        if self.seed is None:
+            return random.Random()
+        digest = hashlib.sha256(f'{self.seed}|{key}|{count}'.encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def _count(self, fault: str) -> None:
+        with self._lock:
+            self.counts[fault] += 1
+
+    def __call__(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, data: Optional[Dict] = None,
+                 json: Optional[Dict] = None, params: Optional[Dict] = None, timeout: float = 16) -> requests.Response:
+        self._count('requests')
+        rule = next((rule for rule in self.rules if rule.matches(method, url)), None)
+        if rule is None:
+            return self.transport(method, url, headers=headers, data=data, json=json, params=params, timeout=timeout)
+
+        key = self._key(method, url, params)
+        rng = self._rng(key)
+
+        if rule.latency is not None:
+            delay = max(0.0, rule.latency(rng))
+            if delay >= timeout:
+                time.sleep(timeout)
+                self._count('timeout')
+                raise requests.exceptions.ReadTimeout(f"Injected latency of {delay:.3f}s exceeded the {timeout}s timeout")
+            if delay:
+                self._count('latency')
+                time.sleep(delay)
+
+        if rule.reset_rate and rng.random() < rule.reset_rate:
+            self._count('reset')
+            raise requests.exceptions.ConnectionError(ConnectionResetError(104, 'Connection reset by peer (injected)'))
+
+        if rule.timeout_rate and rng.random() < rule.timeout_rate:
+            self._count('timeout')
+            time.sleep(timeout if rule.hang is None else min(rule.hang, timeout))
+            raise requests.exceptions.ReadTimeout(f"Injected timeout after {timeout}s")
+
+        status = self._error_status(rule, key, rng)
+        if status is not None:
+            self._count('error')
+            return self._error_response(url, status, rule.retry_after)
+
+        response = self.transport(method, url, headers=headers, data=data, json=json, params=params, timeout=timeout)
+        if rule.truncate_rate and rng.random() < rule.truncate_rate and response.content:
+            self._count('truncated')
+            response._content = response.content[:len(response.content) // 2]
+        return response
+
+    def _error_status(self, rule: FaultRule, key: str, rng: random.Random) -> Optional[int]:
+        # A burst belongs to one request, so which requests fail does not depend on arrival order
+        with self._lock:
+            burst = self._bursts.get((id(rule), key))
+            if burst and burst[1] > 0:
+                burst[1] -= 1
+                return burst[0]
+        if rule.error_rate and rng.random() < rule.error_rate:
+            status = rng.choice(rule.error_statuses)
+            with self._lock:
+                self._bursts[(id(rule), key)] = [status, rule.burst_length - 1]
+            return status
+        return None
+
+    @staticmethod
+    def _error_response(url: str, status: int, retry_after: Optional[float]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        if retry_after is not None and status in (429, 503):
+            response.headers['Retry-After'] = str(int(retry_after))
+        response._content = b'{"detail":"Injected fault"}'
+        try:
+            response.reason = HTTPStatus(status).phrase
+        except ValueError:
+            response.reason = ''
+        return response
+
+
+@contextmanager
+def inject(rules: Iterable[FaultRule], seed: Optional[int] = None,
+           transport: Optional[Callable[..., requests.Response]] = None):
+    """Injects faults into every request made inside the block, on top of the current transport"""
+    previous = helper._transport
+    injector = FaultInjector(rules, transport or previous, seed)
+    helper.set_transport(injector)
+    try:
+        yield injector
+    finally:
+        helper.set_transport(previous)
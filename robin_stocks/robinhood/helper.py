@@ -3,72 +3,420 @@
 This module contains useful utility functions that have been converted to stateless versions.
 
 NO STATE. NO SESSIONS. NO FILES. NO PICKLES. NO BULLSHIT.
+
+The only module-level values are opt-in request-layer settings (such as the default
+retry policy, a rate limiter, circuit breakers, request coalescing, a response cache, conditional GETs, the JSON decoder, request listeners, a tracer, a session pool or a replacement transport) that callers configure explicitly; no per-user data is ever kept.
 """
+import contextvars
+import itertools
+import logging
+import os
+import time
 import requests
 from requests import Session
-from typing import Dict, List, Any, Optional, Union
-from .urls import instruments_url, option_chains_by_id_url, option_instruments_url
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Union
+from .retry import RetryPolicy, DEFAULT_RETRY_POLICY, IDEMPOTENT_METHODS, parse_retry_after
+from .circuitbreaker import OPEN
+from .coalesce import request_key
+from .decoding import JSONDecoder, DEFAULT_DECODER
+from . import tracing
+from .tracing import set_tracer, traced  # noqa: F401 (set_tracer is re-exported with the other settings)
+from .urls import instruments_url, option_chains_by_id_url, option_instruments_url, endpoint_group, endpoint_template
+
+logger = logging.getLogger(__name__)
+
+# Retry policy applied to idempotent methods when the caller does not pass one.
+# Set to None with set_default_retry_policy to restore fail-fast behaviour.
+_default_retry_policy: Optional[RetryPolicy] = DEFAULT_RETRY_POLICY
+
+
+def set_default_retry_policy(policy: Optional[RetryPolicy]) -> None:
+    """Replaces the retry policy used for GET and DELETE requests
+    
+    :param policy: The new policy, or None to disable retries by default
+    :type policy: Optional[RetryPolicy]
+    """
+    global _default_retry_policy
+    _default_retry_policy = policy
+
+
+# Optional client-side rate limiter (see ratelimit.RateLimiter), off unless installed.
+_rate_limiter = None
+
+
+def set_rate_limiter(limiter) -> None:
+    """Installs a rate limiter consulted before every HTTP attempt
+    
+    :param limiter: A :class:`~robin_stocks.robinhood.ratelimit.RateLimiter`, or None to remove it
+    """
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+# Optional circuit breakers (see circuitbreaker.CircuitBreakerRegistry), off unless installed.
+_circuit_breakers = None
+
+
+def set_circuit_breakers(registry) -> None:
+    """Installs circuit breakers that make requests to a failing endpoint group fail fast
+    
+    :param registry: A :class:`~robin_stocks.robinhood.circuitbreaker.CircuitBreakerRegistry`, or None to remove it
+    """
+    global _circuit_breakers
+    _circuit_breakers = registry
+
+
+def circuit_wait(url: str) -> float:
+    """Returns how many seconds requests to ``url`` will keep failing fast, 0 if they may be sent.
+    
+    Polling loops call this to pause while the endpoint's circuit is open.
+    """
+    if _circuit_breakers is None:
+        return 0.0
+    breaker = _circuit_breakers.breaker(url)
+    if breaker.state != OPEN:
+        return 0.0
+    return breaker.retry_in()
+
+
+# Optional single-flight coalescing of identical concurrent GETs (see coalesce.Coalescer), off unless installed.
+_coalescer = None
+
+
+def set_coalescer(coalescer) -> None:
+    """Installs a coalescer so identical concurrent GETs share one request
+    
+    :param coalescer: A :class:`~robin_stocks.robinhood.coalesce.Coalescer`, or None to remove it
+    """
+    global _coalescer
+    _coalescer = coalescer
+
+
+# Optional cache of decoded GET responses (see cache.ResponseCache), off unless installed.
+_response_cache = None
+
+
+def set_response_cache(cache) -> None:
+    """Installs a response cache for slow-moving GET endpoints
+    
+    :param cache: A :class:`~robin_stocks.robinhood.cache.ResponseCache`, or None to remove it
+    """
+    global _response_cache
+    _response_cache = cache
+
+
+# Optional ETag / Last-Modified validators for conditional GETs (see conditional.ValidatorStore), off unless installed.
+_validator_store = None
+
+
+def set_validator_store(store) -> None:
+    """Installs a validator store so repeated GETs are sent as conditional requests
+    
+    :param store: A :class:`~robin_stocks.robinhood.conditional.ValidatorStore`, or None to remove it
+    """
+    global _validator_store
+    _validator_store = store
+
+
+# Decoder for response bodies, the fastest installed JSON backend unless replaced.
+_json_decoder: JSONDecoder = DEFAULT_DECODER
+
+
+def set_json_decoder(decoder: Optional[JSONDecoder]) -> None:
+    """Replaces the decoder used for response bodies, e.g. one that converts prices to Decimal
+    
+    :param decoder: A :class:`~robin_stocks.robinhood.decoding.JSONDecoder`, or None to restore the default
+    :type decoder: Optional[JSONDecoder]
+    """
+    global _json_decoder
+    _json_decoder = decoder or DEFAULT_DECODER
+
+
+# Optional replacement for http_transport, e.g. a mock server, recorder or fault injector.
+_transport = None
+
+
+def set_transport(transport: Optional[Callable[..., requests.Response]]) -> None:
+    """Replaces the function that sends single HTTP requests
+    
+    The transport is called as ``transport(method, url, headers=, data=, json=, params=, timeout=)``
+    and must return a :class:`requests.Response` or raise a ``requests`` exception. Everything above
+    it (retries, rate limits, circuit breakers, caching, decoding, listeners) keeps working
+    unchanged. Transports that only observe or alter traffic can delegate to :func:`http_transport`.
+    
+    :param transport: The new transport, or None to restore :func:`http_transport`
+    """
+    global _transport
+    _transport = transport
+
+
+# Optional per-token keep-alive sessions for http_transport (see sessions.SessionPool), off unless installed.
+_session_pool = None
+
+
+def set_session_pool(pool) -> None:
+    """Installs a session pool so http_transport reuses connections per access token
+    
+    :param pool: A :class:`~robin_stocks.robinhood.sessions.SessionPool`, or None to open a session per request
+    """
+    global _session_pool
+    previous = _session_pool
+    _session_pool = pool
+    if previous is not None and previous is not pool:
+        previous.close()
+
+
+# Callables receiving one structured event per request sent over the network. Kept as a
+# tuple so the request path only pays for an emptiness check while nobody listens.
+_request_listeners: tuple = ()
+_request_ids = itertools.count(1)
+
+
+def add_request_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    """Registers a callable receiving event dicts when a request starts and when it ends
+    
+    Every event carries ``phase`` ('start' or 'end'), ``request_id``, ``method``, ``url``,
+    ``endpoint`` (the endpoint group) and ``template`` (see :func:`~robin_stocks.robinhood.urls.endpoint_template`).
+    End events add ``status`` (None when no response arrived), ``latency`` in seconds across all
+    attempts, ``attempts``, ``retries``, ``bytes_sent``, ``bytes_received`` and ``error`` (the
+    exception raised, or None). Responses served from the response cache or shared by the
+    coalescer produce no events.
+    
+    :param listener: Called synchronously on the requesting thread, so it should be cheap
+    :type listener: Callable[[dict], None]
+    """
+    global _request_listeners
+    _request_listeners = _request_listeners + (listener,)
+
+
+def remove_request_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    """Unregisters a listener added with :func:`add_request_listener`"""
+    global _request_listeners
+    _request_listeners = tuple(l for l in _request_listeners if l is not listener)
+
+
+def _body_size(body: Union[bytes, str, None]) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode())
+    return len(body) if isinstance(body, (bytes, bytearray)) else 0
+
+
+def _emit_request_event(event: Dict[str, Any]) -> None:
+    for listener in _request_listeners:
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("Request listener failed")
+
+
+def http_transport(method: str, url: str, headers: Dict[str, str] = None, data: Dict = None,
+                   json: Dict = None, params: Dict = None, timeout: float = 16) -> requests.Response:
+    """Default transport: sends a single HTTP request and returns the raw response
+    
+    Uses the installed session pool when there is one, otherwise a fresh session per request.
+    """
+    session = _session_pool.session_for(headers) if _session_pool is not None else Session()
+    
+    if method == 'GET':
+        return session.get(url, params=params, headers=headers, timeout=timeout)
+    elif method == 'POST':
+        if json:
+            return session.post(url, json=json, headers=headers, timeout=timeout)
+        else:
+            return session.post(url, data=data, headers=headers, timeout=timeout)
+    elif method == 'DELETE':
+        return session.delete(url, headers=headers, timeout=timeout)
+    else:
+        raise ValueError(f"Unsupported method: {method}")
+
+
+def _send(method: str, url: str, headers: Dict[str, str] = None, data: Dict = None,
+          json: Dict = None, params: Dict = None, timeout: float = 16) -> requests.Response:
+    """Sends a single HTTP request through the installed transport"""
+    transport = _transport or http_transport
+    return transport(method, url, headers=headers, data=data, json=json, params=params, timeout=timeout)
+
+
+def _decode(response: requests.Response) -> Any:
+    """Decodes the JSON body of a response with the installed decoder"""
+    return _json_decoder.decode(response.content, response.url)
+
+
+def _send_with_policy(method: str, url: str, headers: Optional[Dict[str, str]], data: Optional[Dict],
+                      json: Optional[Dict], params: Optional[Dict], timeout: float,
+                      policy: Optional[RetryPolicy], span: Any = None) -> Dict:
+    """Sends a request, retrying according to ``policy``, and returns the decoded body.
+
+    The number of attempts made is recorded on a raised exception as ``attempts``, and on
+    ``span`` when the call is traced.
+    """
+    deadline = time.monotonic() + policy.deadline if policy and policy.deadline else None
+    attempt = 0
+    request_id = f'{os.getpid()}-{next(_request_ids)}'
+    started = time.perf_counter()
+    response, failure = None, None
+    listeners = _request_listeners
+    if listeners:
+        event = {'request_id': request_id, 'method': method, 'url': url,
+                 'endpoint': endpoint_group(url), 'template': endpoint_template(url)}
+        _emit_request_event(dict(event, phase='start'))
+        bytes_sent = bytes_received = 0
+
+    conditional_key, stored = None, None
+    if _validator_store is not None and method == 'GET' and _validator_store.applies_to(url):
+        conditional_key = request_key(method, url, params, headers)
+        headers, stored = _validator_store.prepare(conditional_key, headers)
+
+    try:
+        while True:
+            attempt += 1
+            attempt_timeout = timeout
+            if deadline is not None:
+                attempt_timeout = max(0.001, min(timeout, deadline - time.monotonic()))
+
+            breakers = _circuit_breakers
+            if breakers is not None:
+                breakers.before_request(url)
+            recorded = False
+            try:
+                if _rate_limiter is not None:
+                    _rate_limiter.acquire(url)
+
+                response, error = None, None
+                try:
+                    response = _send(method, url, headers=headers, data=data, json=json,
+                                     params=params, timeout=attempt_timeout)
+                except requests.exceptions.RequestException as e:
+                    error = e
+                logger.debug("%s %s %s attempt %d: %s", request_id, method, url, attempt,
+                             response.status_code if response is not None else error)
+                if listeners and response is not None:
+                    bytes_sent += _body_size(response.request.body if response.request is not None else None)
+                    bytes_received += len(response.content or b'')
+
+                if breakers is not None:
+                    breakers.after_request(url, response.status_code if response is not None else None, error)
+                    recorded = True
+            finally:
+                # A half-open probe slot must not leak when the attempt died before an outcome was known
+                if breakers is not None and not recorded:
+                    breakers.release(url)
+            penalty = 0.0
+            if _rate_limiter is not None and response is not None and response.status_code == 429:
+                penalty = parse_retry_after(response) or 1.0
+                _rate_limiter.penalize(url, penalty)
+
+            if policy and policy.should_retry(attempt, response, error):
+                delay = policy.delay(attempt, response)
+                if deadline is None or time.monotonic() + delay < deadline:
+                    # The next acquire already waits out the penalty, only sleep the remainder
+                    time.sleep(max(0.0, delay - penalty))
+                    continue
+
+            if error is not None:
+                raise error
+            response.raise_for_status()
+            if conditional_key is not None:
+                return _validator_store.resolve(conditional_key, stored, response, _decode)
+            return _decode(response)
+    except Exception as e:
+        e.attempts = attempt
+        failure = e
+        raise
+    finally:
+        if span is not None:
+            span.set_attribute('robinhood.attempts', attempt)
+            if response is not None:
+                span.set_attribute('http.response.status_code', response.status_code)
+        if listeners:
+            event.update(phase='end',
+                         status=response.status_code if response is not None else None,
+                         latency=time.perf_counter() - started,
+                         attempts=attempt,
+                         retries=max(0, attempt - 1),
+                         bytes_sent=bytes_sent,
+                         bytes_received=bytes_received,
+                         error=failure)
+            _emit_request_event(event)
+
+
+def _status_hint(status_code: int) -> str:
+    """Returns a short explanation of common error statuses for log messages"""
+    if status_code == 400:
+        return " - check order parameters"
+    if status_code == 401:
+        return " - check access token"
+    if status_code == 403:
+        return " - insufficient permissions"
+    if status_code == 404:
+        return " - check URL/endpoint"
+    if status_code >= 500:
+        return " - Robinhood API issue"
+    return ""
 
 
 def _make_request(method: str, url: str, headers: Dict[str, str] = None, 
                   data: Dict = None, json: Dict = None, params: Dict = None, 
-                  timeout: int = 16, raise_on_error: bool = True) -> Optional[Dict]:
+                  timeout: int = 16, raise_on_error: bool = True,
+                  retry: Optional[RetryPolicy] = None) -> Optional[Dict]:
     """Pure HTTP request function - no state
     
     :param raise_on_error: If True, raise exceptions instead of returning None
+    :param retry: Retry policy for this call. GET and DELETE fall back to the default policy,
+        other methods are only retried when a policy is passed explicitly.
     """
+    method = method.upper()
+    policy = retry
+    if policy is None and method in IDEMPOTENT_METHODS:
+        policy = _default_retry_policy
+
     try:
-        session = Session()
-        if headers:
-            session.headers.update(headers)
-        
-        if method.upper() == 'GET':
-            response = session.get(url, params=params, timeout=timeout)
-        elif method.upper() == 'POST':
-            if json:
-                response = session.post(url, json=json, timeout=timeout)
-            else:
-                response = session.post(url, data=data, timeout=timeout)
-        elif method.upper() == 'DELETE':
-            response = session.delete(url, timeout=timeout)
+        def send():
+            tracer = tracing._tracer
+            if tracer is None:
+                return _send_with_policy(method, url, headers, data, json, params, timeout, policy)
+            template = endpoint_template(url)
+            with tracer.start_as_current_span(f'{method} {template}', attributes={
+                    'http.request.method': method, 'url.full': url, 'robinhood.endpoint': template}) as span:
+                return _send_with_policy(method, url, headers, data, json, params, timeout, policy, span)
+
+        if method != 'GET' or (_coalescer is None and _response_cache is None):
+            return send()
+
+        key = request_key(method, url, params, headers)
+        if _coalescer is None:
+            load = send
         else:
-            raise ValueError(f"Unsupported method: {method}")
-        
-        response.raise_for_status()
-        return response.json()
+            def load():
+                return _coalescer.do(key, send)
+        if _response_cache is not None:
+            return _response_cache.fetch(key, url, load)
+        return load()
     
     except Exception as e:
         error_msg = f"Request failed: {e}"
-        print(f"ROBINHOOD HTTP ERROR: {error_msg}")
+        attempt = getattr(e, 'attempts', 1)
+        if attempt > 1:
+            error_msg += f" (after {attempt} attempts)"
         
         # Add comprehensive response details if available
-        if hasattr(e, 'response') and e.response is not None:
-            response = e.response
-            print(f"ROBINHOOD HTTP ERROR: Status Code: {response.status_code}")
-            print(f"ROBINHOOD HTTP ERROR: Response Headers: {dict(response.headers)}")
-            print(f"ROBINHOOD HTTP ERROR: Response Text: {response.text}")
-            
-            # Log the request details too
-            print(f"ROBINHOOD HTTP ERROR: Request URL: {response.url}")
-            print(f"ROBINHOOD HTTP ERROR: Request Method: {method}")
-            if headers:
-                # Don't log authorization tokens for security
-                safe_headers = {k: ("***REDACTED***" if "authorization" in k.lower() else v) for k, v in headers.items()}
-                print(f"ROBINHOOD HTTP ERROR: Request Headers: {safe_headers}")
-            
+        response = getattr(e, 'response', None)
+        if response is not None:
             error_msg += f" | Status: {response.status_code} | Response: {response.text[:500]}..."
-            
-            # Check for specific error patterns
-            if response.status_code == 400:
-                print("ROBINHOOD HTTP ERROR: 400 Bad Request - Check order parameters")
-            elif response.status_code == 401:
-                print("ROBINHOOD HTTP ERROR: 401 Unauthorized - Check access token")
-            elif response.status_code == 403:
-                print("ROBINHOOD HTTP ERROR: 403 Forbidden - Insufficient permissions")
-            elif response.status_code == 404:
-                print("ROBINHOOD HTTP ERROR: 404 Not Found - Check URL/endpoint")
-            elif response.status_code >= 500:
-                print("ROBINHOOD HTTP ERROR: Server error - Robinhood API issue")
+            logger.warning("%s %s failed with status %s%s", method, url, response.status_code,
+                           _status_hint(response.status_code))
+            if logger.isEnabledFor(logging.DEBUG):
+                # Don't log authorization tokens for security
+                safe_headers = {k: ("***REDACTED***" if "authorization" in k.lower() else v)
+                                for k, v in (headers or {}).items()}
+                logger.debug("Request headers: %s", safe_headers)
+                logger.debug("Response headers: %s", dict(response.headers))
+                logger.debug("Response text: %s", response.text)
+        else:
+            logger.warning("%s %s: %s", method, url, error_msg)
         
         if raise_on_error:
             raise Exception(error_msg) from e
@@ -114,6 +462,7 @@ def id_for_chain(access_token: str, symbol: str) -> Optional[str]:
                             payload={'symbol': symbol})
     return instrument.get('tradable_chain_id') if instrument else None
 
+@traced
 def id_for_group(access_token: str, symbol: str) -> Optional[str]:
     """Takes a stock ticker and returns the group id - STATELESS VERSION - ENHANCED with safer array access
     
@@ -142,6 +491,7 @@ def id_for_group(access_token: str, symbol: str) -> Optional[str]:
         return instruments[0].get('id') if instruments else None
     return None
 
+@traced
 def id_for_option(access_token: str, symbol: str, expiration_date: str, strike: float, option_type: str) -> Optional[str]:
     """Returns the id for a specific option - STATELESS VERSION - ENHANCED with safer array access
     
@@ -258,9 +608,32 @@ def inputs_to_set(input_symbols: Union[str, List, tuple, set]) -> List[str]:
 
     return symbols_list
 
+def run_concurrently(calls: Dict[Any, Callable[[], Any]], max_workers: Optional[int] = None) -> Dict[Any, Any]:
+    """Runs independent zero-argument calls concurrently and returns their results by key
+    
+    Composite loaders use this to overlap sub-requests that do not depend on each other.
+    Each call runs in a copy of the caller's context, so tracing spans nest under the caller.
+    
+    :param calls: Keys mapped to zero-argument callables
+    :type calls: dict
+    :param max_workers: Calls running at once, all of them when None
+    :type max_workers: Optional[int]
+    :returns: The same keys mapped to what each call returned
+    :raises Exception: The exception of the first failing call in the key order of ``calls``, not
+        necessarily the first to fail in time, raised after every call has finished
+    """
+    if len(calls) <= 1:
+        return {key: call() for key, call in calls.items()}
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers or len(calls), len(calls))) as executor:
+        futures = {key: executor.submit(contextvars.copy_context().run, call) for key, call in calls.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
 # STATELESS REQUEST FUNCTIONS - These are the safe replacements for the old stateful versions
 
-def request_document(access_token: str, url: str, payload: Optional[Dict] = None, raise_on_error: bool = True):
+def request_document(access_token: str, url: str, payload: Optional[Dict] = None, raise_on_error: bool = True,
+                     retry: Optional[RetryPolicy] = None):
     """Makes a GET request and returns the JSON response - STATELESS VERSION
     
     :param access_token: The access token for authentication
@@ -271,12 +644,15 @@ def request_document(access_token: str, url: str, payload: Optional[Dict] = None
     :type payload: Optional[dict]
     :param raise_on_error: If True, raise exceptions instead of returning None
     :type raise_on_error: bool
+    :param retry: Retry policy overriding the default for GET requests
+    :type retry: Optional[RetryPolicy]
     :returns: Returns the JSON response data
     """
     headers = {'Authorization': f'Bearer {access_token}'}
-    return _make_request('GET', url, headers=headers, params=payload, raise_on_error=raise_on_error)
+    return _make_request('GET', url, headers=headers, params=payload, raise_on_error=raise_on_error, retry=retry)
 
-def request_get(access_token: str, url: str, data_type: str = 'regular', payload: Optional[Dict] = None, jsonify_data: bool = True, raise_on_error: bool = True):
+def request_get(access_token: str, url: str, data_type: str = 'regular', payload: Optional[Dict] = None, jsonify_data: bool = True, raise_on_error: bool = True,
+                retry: Optional[RetryPolicy] = None):
     """Makes a GET request with various data filtering options - STATELESS VERSION
     
     :param access_token: The access token for authentication
@@ -289,10 +665,12 @@ def request_get(access_token: str, url: str, data_type: str = 'regular', payload
     :type payload: Optional[dict]
     :param jsonify_data: Whether to return JSON data (always True in stateless version)
     :type jsonify_data: bool
+    :param retry: Retry policy overriding the default for GET requests
+    :type retry: Optional[RetryPolicy]
     :returns: Filtered data based on data_type parameter
     """
     headers = {'Authorization': f'Bearer {access_token}'}
-    response = _make_request('GET', url, headers=headers, params=payload, raise_on_error=raise_on_error)
+    response = _make_request('GET', url, headers=headers, params=payload, raise_on_error=raise_on_error, retry=retry)
     
     if not response:
         return [None] if data_type in ['results', 'pagination'] else None
@@ -306,7 +684,7 @@ def request_get(access_token: str, url: str, data_type: str = 'regular', payload
         next_url = response.get('next')
         
         while next_url:
-            next_response = _make_request('GET', next_url, headers=headers, raise_on_error=raise_on_error)
+            next_response = _make_request('GET', next_url, headers=headers, raise_on_error=raise_on_error, retry=retry)
             if next_response and 'results' in next_response:
                 all_results.extend(next_response['results'])
                 next_url = next_response.get('next')
@@ -321,7 +699,8 @@ def request_get(access_token: str, url: str, data_type: str = 'regular', payload
         return response
 
 def request_post(access_token: str, url: str, payload: Optional[Dict] = None, timeout: int = 16, 
-                json_data: bool = False, jsonify_data: bool = True, raise_on_error: bool = True):
+                json_data: bool = False, jsonify_data: bool = True, raise_on_error: bool = True,
+                retry: Optional[RetryPolicy] = None):
     """Makes a POST request - STATELESS VERSION
     
     :param access_token: The access token for authentication
@@ -336,17 +715,19 @@ def request_post(access_token: str, url: str, payload: Optional[Dict] = None, ti
     :type json_data: bool
     :param jsonify_data: Whether to return JSON data (always True in stateless version)
     :type jsonify_data: bool
+    :param retry: Opt-in retry policy. POSTs are never retried unless one is given.
+    :type retry: Optional[RetryPolicy]
     :returns: Response data
     """
     headers = {'Authorization': f'Bearer {access_token}'}
     
     if json_data:
         headers['Content-Type'] = 'application/json'
-        return _make_request('POST', url, headers=headers, json=payload, timeout=timeout, raise_on_error=raise_on_error)
+        return _make_request('POST', url, headers=headers, json=payload, timeout=timeout, raise_on_error=raise_on_error, retry=retry)
     else:
-        return _make_request('POST', url, headers=headers, data=payload, timeout=timeout, raise_on_error=raise_on_error)
+        return _make_request('POST', url, headers=headers, data=payload, timeout=timeout, raise_on_error=raise_on_error, retry=retry)
 
-def request_delete(access_token: str, url: str, raise_on_error: bool = True):
+def request_delete(access_token: str, url: str, raise_on_error: bool = True, retry: Optional[RetryPolicy] = None):
     """Makes a DELETE request - STATELESS VERSION
     
     :param access_token: The access token for authentication
@@ -355,7 +736,9 @@ def request_delete(access_token: str, url: str, raise_on_error: bool = True):
     :type url: str
     :param raise_on_error: If True, raise exceptions instead of returning None
     :type raise_on_error: bool
+    :param retry: Retry policy overriding the default for DELETE requests
+    :type retry: Optional[RetryPolicy]
     :returns: Response data
     """
     headers = {'Authorization': f'Bearer {access_token}'}
-    return _make_request('DELETE', url, headers=headers, raise_on_error=raise_on_error)
\ No newline at end of file
+    return _make_request('DELETE', url, headers=headers, raise_on_error=raise_on_error, retry=retry)
\ No newline at end of file
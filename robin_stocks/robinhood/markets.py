@@ -2,6 +2,7 @@
 
 from typing import Dict, List, Any, Optional
 from .helper import _make_request, request_get
+from .tracing import traced
 from .urls import (
     movers_sp500_url, get_100_most_popular_url, markets_url,
     market_hours_url, currency_url, market_category_url,
@@ -29,6 +30,7 @@ def get_top_movers_sp500(access_token: str, direction: str, info: Optional[str]
         return movers
     return []
 
+@traced
 def get_top_100(access_token: str, info: Optional[str] = None) -> List[Dict[str, Any]]:
     """Returns a list of the Top 100 stocks on Robinhood - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
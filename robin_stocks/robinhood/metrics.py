@@ -0,0 +1,157 @@
+"""Request metrics with Prometheus text export
+
+:class:`RequestMetrics` is a request listener (see
+:func:`robin_stocks.robinhood.helper.add_request_listener`) that aggregates
+latency histograms, request, error and retry counters, bytes sent and
+received, and in-flight gauges. Series are labelled by method and endpoint
+template, for example ``api.robinhood.com/orders/{orderID}/``, so ids in URLs
+never multiply the number of series.
+
+Export is pull based: serve :meth:`RequestMetrics.render` from the
+application's ``/metrics`` handler::
+
+    metrics = RequestMetrics().install()
+    ...
+    body = metrics.render()
+"""
+
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .helper import add_request_listener, remove_request_listener
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class RequestMetrics:
+    """Aggregates request events into Prometheus metrics.
+
+    :param namespace: Prefix of every metric name
+    :type namespace: str
+    :param buckets: Upper bounds of the latency histogram buckets in seconds
+    :type buckets: iterable of float
+    """
+
+    def __init__(self, namespace: str = 'robinhood', buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: Dict[Labels, List[float]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {
+            'requests_total': {},
+            'request_errors_total': {},
+            'request_retries_total': {},
+            'request_bytes_sent_total': {},
+            'response_bytes_received_total': {},
+        }
+        self._in_flight: Dict[Labels, int] = {}
+        self._started = set()
+
+    def install(self) -> 'RequestMetrics':
+        """Registers these metrics as a request listener and returns them"""
+        add_request_listener(self)
+        return self
+
+    def uninstall(self) -> None:
+        """Stops collecting"""
+        remove_request_listener(self)
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        labels = (('method', event['method']), ('endpoint', event['template']))
+        with self._lock:
+            if event['phase'] == 'start':
+                self._started.add(event['request_id'])
+                self._in_flight[labels] = self._in_flight.get(labels, 0) + 1
+                return
+
+            if event['request_id'] in self._started:
+                self._started.discard(event['request_id'])
+                self._in_flight[labels] -= 1
+
+            status = event['status']
+            self._add('requests_total', labels + (('status', str(status) if status is not None else 'none'),))
+            if event['error'] is not None:
+                reason = str(status) if status is not None else type(event['error']).__name__
+                self._add('request_errors_total', labels + (('reason', reason),))
+            self._add('request_retries_total', labels, event['retries'])
+            self._add('request_bytes_sent_total', labels, event['bytes_sent'])
+            self._add('response_bytes_received_total', labels, event['bytes_received'])
+
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                # One slot per bucket, then +Inf, sum and count
+                histogram = self._histograms[labels] = [0.0] * (len(self.buckets) + 3)
+            latency = event['latency']
+            histogram[bisect.bisect_left(self.buckets, latency)] += 1
+            histogram[-2] += latency
+            histogram[-1] += 1
+
+    def _add(self, name: str, labels: Labels, amount: float = 1) -> None:
+        series = self._counters[name]
+        series[labels] = series.get(labels, 0) + amount
+
+    def reset(self) -> None:
+        """Clears every series except requests currently in flight"""
+        with self._lock:
+            self._histograms.clear()
+            for series in self._counters.values():
+                series.clear()
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format (version 0.0.4)"""
+        prefix = self.namespace + '_' if self.namespace else ''
+        lines = []
+        with self._lock:
+            name = prefix + 'request_duration_seconds'
+            lines.append(f'# HELP {name} Latency of Robinhood API requests including retries.')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in sorted(self._histograms.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets + (float('inf'),), histogram):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", _format_value(bound)))} '
+                                 f'{_format_value(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {_format_value(histogram[-1])}')
+
+            descriptions = {
+                'requests_total': 'Robinhood API requests by final status.',
+                'request_errors_total': 'Robinhood API requests that failed, by status or exception.',
+                'request_retries_total': 'Retried attempts of Robinhood API requests.',
+                'request_bytes_sent_total': 'Request body bytes sent to the Robinhood API.',
+                'response_bytes_received_total': 'Response body bytes received from the Robinhood API.',
+            }
+            for counter, description in descriptions.items():
+                name = prefix + counter
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(self._counters[counter].items()):
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+            name = prefix + 'requests_in_flight'
+            lines.append(f'# HELP {name} Robinhood API requests currently in flight.')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in sorted(self._in_flight.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
@@ -3,6 +3,7 @@
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
 from .helper import _make_request, request_get
+from .tracing import traced
 from .urls import (
     aggregate_url, option_positions_url, instruments_url, option_instruments_url,
     option_historicals_url, marketdata_options_url, option_chains_url, chains_url
@@ -66,6 +67,7 @@ def get_open_option_positions(access_token: str, info: Optional[str] = None) ->
         return positions
     return []
 
+@traced
 def get_chains(access_token: str, symbol: str, info: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get options chains for symbol - STATELESS VERSION - ENHANCED with indexzero pattern"""
     # Use indexzero pattern for cleaner first result access
@@ -119,6 +121,7 @@ def get_option_historicals(access_token: str, option_id: str, interval: str = '5
         return data
     return []
 
+@traced
 def get_option_instrument_data(access_token: str, symbol: str, expiration_date: str, strike: float, 
                               option_type: str, info: Optional[str] = None) -> Optional[Dict]:
     """Get option instrument data - STATELESS VERSION - ENHANCED with indexzero pattern"""
@@ -189,6 +192,7 @@ def get_option_market_data_by_id(access_token: str, option_id: str, info: Option
     return request_get(access_token, marketdata_options_url(), data_type='indexzero',
                       payload={'instruments': option_id})
 
+@traced
 def find_tradable_options(access_token: str, symbol: str, expiration_date: Optional[str] = None, 
                          strike: Optional[float] = None, option_type: Optional[str] = None, 
                          info: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -0,0 +1,205 @@
+"""Run the same operations across many accounts
+
+Every function in this package takes the access token as its first argument,
+so running an operation for hundreds of managed accounts is a fan-out problem.
+:class:`AccountOrchestrator` calls one or more functions for every token on a
+shared worker pool, caps how many calls run at once overall and per account,
+and isolates failures so one expired token or failing account never aborts the
+batch::
+
+    with AccountOrchestrator(max_workers=32, per_account=2) as orchestrator:
+        snapshot = orchestrator.map_many(
+            {'positions': account.get_open_stock_positions,
+             'portfolio': profiles.load_portfolio_profile},
+            tokens_by_account)
+
+    for account_id, calls in snapshot.items():
+        if not calls['portfolio'].ok:
+            ...
+
+Install a :class:`~robin_stocks.robinhood.sessions.SessionPool` with
+:func:`robin_stocks.robinhood.helper.set_session_pool` so every account reuses
+its own keep-alive connections instead of opening one per request.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+Tokens = Union[Mapping[Hashable, str], Iterable[str]]
+
+
+class AccountResult:
+    """The outcome of one call for one account.
+
+    :ivar account: The account key the call ran for
+    :ivar value: What the function returned, None when it raised
+    :ivar error: The exception the function raised, None on success
+    :ivar elapsed: Seconds the call took
+    """
+
+    __slots__ = ('account', 'value', 'error', 'elapsed')
+
+    def __init__(self, account: Hashable, value: Any = None, error: Optional[BaseException] = None,
+                 elapsed: float = 0.0):
+        self.account = account
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        outcome = f'error={self.error!r}' if self.error is not None else 'ok'
+        return f'AccountResult({self.account!r}, {outcome}, elapsed={self.elapsed:.3f})'
+
+
+def _label(account: Hashable, token: str, keyed: bool) -> str:
+    """Names an account in log records without ever writing the raw token"""
+    if keyed:
+        return str(account)
+    return 'token ' + hashlib.sha256(token.encode()).hexdigest()[:8]
+
+
+class _Batch:
+    """Pending calls of one map_many invocation and how many run per account"""
+
+    def __init__(self, per_account: int, total: int, on_result: Optional[Callable]):
+        self.per_account = per_account
+        self.remaining = total
+        self.on_result = on_result
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.pending: Dict[Hashable, deque] = {}
+        self.running: Dict[Hashable, int] = {}
+        if total == 0:
+            self.done.set()
+
+
+class AccountOrchestrator:
+    """Fans calls out over accounts with a global and a per-account concurrency cap.
+
+    :param max_workers: Calls running at once across all accounts
+    :type max_workers: int
+    :param per_account: Calls running at once for the same account
+    :type per_account: int
+    """
+
+    def __init__(self, max_workers: int = 16, per_account: int = 1):
+        if max_workers < 1 or per_account < 1:
+            raise ValueError("max_workers and per_account must be at least 1")
+        self.max_workers = max_workers
+        self.per_account = per_account
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='robinhood-accounts')
+
+    def __enter__(self) -> 'AccountOrchestrator':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Waits for running calls and stops the worker threads"""
+        self._executor.shutdown(wait=True)
+
+    def map(self, func: Callable, tokens: Tokens, *args,
+            on_result: Optional[Callable[[AccountResult], None]] = None, **kwargs) -> Dict[Hashable, AccountResult]:
+        """Calls ``func(token, *args, **kwargs)`` for every account.
+
+        :param func: Any function taking the access token first, e.g. ``account.get_open_stock_positions``
+        :type func: Callable
+        :param tokens: A mapping of account keys to access tokens, or an iterable of tokens that are
+            then used as the keys
+        :type tokens: Mapping or iterable of str
+        :param on_result: Called with every :class:`AccountResult` as soon as it is ready
+        :type on_result: Optional[Callable]
+        :returns: A dict of account key to :class:`AccountResult`, in the order of ``tokens``
+        """
+        results = self.map_many({None: func}, tokens, *args, on_result=on_result, **kwargs)
+        return {account: calls[None] for account, calls in results.items()}
+
+    def map_many(self, funcs: Mapping[Hashable, Callable], tokens: Tokens, *args,
+                 on_result: Optional[Callable[[AccountResult], None]] = None,
+                 **kwargs) -> Dict[Hashable, Dict[Hashable, AccountResult]]:
+        """Calls every function in ``funcs`` with ``(token, *args, **kwargs)`` for every account.
+
+        Accounts are served round robin, so with fewer workers than accounts every account
+        makes progress instead of the first ones finishing all their calls before the rest start.
+
+        :param funcs: A mapping of names to functions taking the access token first
+        :type funcs: Mapping
+        :param tokens: A mapping of account keys to access tokens, or an iterable of tokens that are
+            then used as the keys
+        :type tokens: Mapping or iterable of str
+        :param on_result: Called with every :class:`AccountResult` as soon as it is ready
+        :type on_result: Optional[Callable]
+        :returns: A dict of account key to a dict of function name to :class:`AccountResult`
+        """
+        keyed = isinstance(tokens, Mapping)
+        # A dict drops repeated tokens, which would otherwise share one queue
+        accounts = list(tokens.items()) if keyed else list({token: token for token in tokens}.items())
+        results: Dict[Hashable, Dict[Hashable, AccountResult]] = {account: {} for account, _ in accounts}
+
+        batch = _Batch(self.per_account, len(accounts) * len(funcs), on_result)
+        for account, token in accounts:
+            label = _label(account, token, keyed)
+            batch.pending[account] = deque(
+                (account, label, name, func, token) for name, func in funcs.items())
+            batch.running[account] = 0
+
+        # Start up to per_account calls per account, one account after another
+        starting = []
+        with batch.lock:
+            for _ in range(self.per_account):
+                for account, _ in accounts:
+                    call = self._next(batch, account)
+                    if call is not None:
+                        starting.append(call)
+        for call in starting:
+            self._executor.submit(self._run, batch, results, call, args, kwargs)
+
+        batch.done.wait()
+        return results
+
+    @staticmethod
+    def _next(batch: _Batch, account: Hashable):
+        """Takes the account's next call if it is below its cap, with batch.lock held"""
+        queue = batch.pending[account]
+        if not queue or batch.running[account] >= batch.per_account:
+            return None
+        batch.running[account] += 1
+        return queue.popleft()
+
+    def _run(self, batch: _Batch, results: Dict, call: tuple, args: tuple, kwargs: Dict) -> None:
+        account, label, name, func, token = call
+        started = time.perf_counter()
+        try:
+            result = AccountResult(account, value=func(token, *args, **kwargs),
+                                   elapsed=time.perf_counter() - started)
+        except Exception as e:
+            result = AccountResult(account, error=e, elapsed=time.perf_counter() - started)
+            logger.warning("%s failed for account %s: %s", getattr(func, '__name__', name), label, e)
+
+        results[account][name] = result
+        if batch.on_result is not None:
+            try:
+                batch.on_result(result)
+            except Exception:
+                logger.exception("on_result callback failed for account %s", label)
+
+        with batch.lock:
+            batch.running[account] -= 1
+            follow_up = self._next(batch, account)
+            batch.remaining -= 1
+            if batch.remaining == 0:
+                batch.done.set()
+        if follow_up is not None:
+            self._executor.submit(self._run, batch, results, follow_up, args, kwargs)
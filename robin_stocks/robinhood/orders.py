@@ -1,7 +1,12 @@
 """STATELESS orders functions - NO GLOBAL STATE"""
 
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Any, Optional, Union
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
 from .helper import _make_request, id_for_option, request_get, round_price
+from .tracing import traced
 from .urls import (
     account_profile_url, crypto_account_url, crypto_cancel_url, 
     crypto_orders_url, order_crypto_url, option_cancel_url,
@@ -9,6 +14,8 @@ from .urls import (
     option_instruments_url
 )
 
+logger = logging.getLogger(__name__)
+
 # STATELESS REPLACEMENTS for all order functions - NO MORE BLOCKING!
 
 # ========================
@@ -44,6 +51,88 @@ def _get_instrument_by_symbol(access_token: str, symbol: str) -> Optional[Dict[s
     return request_get(access_token, instruments_url(), data_type='indexzero', 
                       payload={'symbol': symbol.upper().strip()})
 
+# ========================
+# IDEMPOTENT SUBMISSION - ref_id based safe retry
+# ========================
+
+class OrderStateUnknownError(Exception):
+    """Raised when an order submission failed in transit and whether the order exists is unknown"""
+
+    def __init__(self, ref_id: str, message: str):
+        super().__init__(message)
+        self.ref_id = ref_id
+
+def _is_transport_error(error: Exception) -> bool:
+    """True when a request failed before a response was received (timeout, reset, DNS...)"""
+    cause = getattr(error, '__cause__', None)
+    return isinstance(cause, (RequestsConnectionError, Timeout))
+
+def _parse_order_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _find_order_by_ref_id(access_token: str, lookup_url: str, ref_id: str,
+                          not_before: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """Looks for an order with the given ref_id, following ``next`` pages until it is found.
+
+    Pages are newest first, so paging stops early once a whole page was created before
+    ``not_before``. Request errors are raised: None means every candidate page was read.
+    """
+    headers = {'Authorization': f'Bearer {access_token}'}
+    url = lookup_url
+    while url:
+        response = _make_request('GET', url, headers=headers)
+        results = (response or {}).get('results') or []
+        for existing in results:
+            if existing and existing.get('ref_id') == ref_id:
+                return existing
+        if not_before is not None and results and all(
+                (_parse_order_time(existing.get('created_at')) or not_before) < not_before for existing in results):
+            return None
+        url = (response or {}).get('next')
+    return None
+
+def _submit_order(access_token: str, submit_url: str, payload: Dict[str, Any], lookup_url: str,
+                  submit_attempts: int = 3, timeout: int = 16) -> Optional[Dict]:
+    """POSTs an order payload, retrying transport errors without risking a duplicate.
+
+    The payload carries a ref_id. When a POST dies before the response arrives the order may or
+    may not exist, so before every resubmission the recent orders are checked for that ref_id and
+    a match is returned instead of posting again. HTTP error responses are never retried.
+
+    :raises OrderStateUnknownError: If a POST died in transit and the lookup failed, or the last
+        attempt died in transit. The order may exist; look it up by ref_id before placing it again.
+    """
+    headers = {'Authorization': f'Bearer {access_token}'}
+    ref_id = payload['ref_id']
+    not_before = datetime.now(timezone.utc) - timedelta(minutes=5)
+
+    for attempt in range(submit_attempts):
+        if attempt:
+            try:
+                existing = _find_order_by_ref_id(access_token, lookup_url, ref_id, not_before)
+            except Exception as e:
+                raise OrderStateUnknownError(ref_id, f"Could not check whether order {ref_id} exists: {e}") from e
+            if existing:
+                return existing
+        try:
+            return _make_request('POST', submit_url, headers=headers, json=payload, timeout=timeout)
+        except Exception as e:
+            if not _is_transport_error(e):
+                raise
+            if attempt == submit_attempts - 1:
+                raise OrderStateUnknownError(ref_id, f"Order {ref_id} submission failed in transit: {e}") from e
+            logger.warning("Order submission with ref_id %s hit a transport error, checking before retrying: %s", ref_id, e)
+    return None
+
+def _recent_orders_url(url_builder) -> str:
+    """Builds a lookup URL for orders updated in the last few minutes"""
+    start_date = (datetime.now(timezone.utc) - timedelta(minutes=5)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return url_builder(start_date=start_date)
+
+@traced
 def cancel_all_crypto_orders(access_token: str) -> bool:
     """Cancel all crypto orders - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
@@ -57,6 +146,7 @@ def cancel_all_crypto_orders(access_token: str) -> bool:
     
     return True
 
+@traced
 def cancel_all_option_orders(access_token: str) -> bool:
     """Cancel all option orders - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
@@ -70,6 +160,7 @@ def cancel_all_option_orders(access_token: str) -> bool:
     
     return True
 
+@traced
 def cancel_all_stock_orders(access_token: str) -> bool:
     """Cancel all stock orders - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
@@ -83,18 +174,21 @@ def cancel_all_stock_orders(access_token: str) -> bool:
     
     return True
 
+@traced
 def cancel_crypto_order(access_token: str, order_id: str) -> bool:
     """Cancel crypto order - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
     response = _make_request('POST', crypto_cancel_url(order_id), headers=headers)
     return response is not None
 
+@traced
 def cancel_option_order(access_token: str, order_id: str) -> bool:
     """Cancel option order - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
     response = _make_request('POST', option_cancel_url(order_id), headers=headers)
     return response is not None
 
+@traced
 def cancel_stock_order(access_token: str, order_id: str) -> bool:
     """Cancel stock order - STATELESS VERSION"""
     headers = {'Authorization': f'Bearer {access_token}'}
@@ -163,16 +257,25 @@ def get_stock_order_info(access_token: str, order_id: str) -> Optional[Dict]:
     headers = {'Authorization': f'Bearer {access_token}'}
     return _make_request('GET', orders_url(order_id), headers=headers)
 
+@traced
 def order(access_token: str, symbol: str, quantity: Union[int, float], side: str,
           order_type: str = 'market', price: Optional[float] = None, stop_price: Optional[float] = None,
-          time_in_force: str = 'gtc', market_hours: str = 'regular_hours', extended_hours: bool = False, **kwargs) -> Optional[Dict]:
-    """Generic order function - STATELESS VERSION - Fixed to match original robin_stocks exactly"""
+          time_in_force: str = 'gtc', market_hours: str = 'regular_hours', extended_hours: bool = False,
+          ref_id: Optional[str] = None, submit_attempts: int = 3, timeout: int = 16, **kwargs) -> Optional[Dict]:
+    """Generic order function - STATELESS VERSION - Fixed to match original robin_stocks exactly
+
+    :param ref_id: Idempotency key sent with the order. A fresh uuid4 is used when omitted. Reusing
+        the same ref_id for the same logical order makes resubmission safe.
+    :param submit_attempts: How many times a POST that failed with a transport error is attempted.
+        Before each retry the recent orders are searched for the ref_id so no duplicate is placed.
+    :param timeout: Request timeout in seconds for the order POST
+    """
     headers = {'Authorization': f'Bearer {access_token}'}
 
     try:
         symbol = symbol.upper().strip()
     except AttributeError as message:
-        print(f"Symbol error: {message}")
+        logger.error("Symbol error: %s", message)
         return None
 
     # Determine trigger type
@@ -216,7 +319,7 @@ def order(access_token: str, symbol: str, quantity: Union[int, float], side: str
     from robin_stocks.robinhood.stocks import get_quotes
     quote = get_quotes(access_token, [symbol])
     if not quote or not quote[0]:
-        print(f"Could not get quote for {symbol}")
+        logger.error("Could not get quote for %s", symbol)
         return None
 
     quote_data = quote[0]
@@ -234,10 +337,8 @@ def order(access_token: str, symbol: str, quantity: Union[int, float], side: str
         else:
             price = bid_price
 
-    # Generate unique reference ID like original
-    import uuid
-    from datetime import datetime
-    ref_id = str(uuid.uuid4())
+    # Caller supplied ref_id makes retries idempotent, otherwise generate one like original
+    ref_id = ref_id or str(uuid.uuid4())
 
     # Round quantity if it's a string (like original)
     if isinstance(quantity, str):
@@ -293,63 +394,75 @@ def order(access_token: str, symbol: str, quantity: Union[int, float], side: str
     payload = {key: value for key, value in payload.items() if value is not None}
 
     # Debug output
-    print(f"ROBINHOOD PAYLOAD DEBUG: Full order payload for {symbol}: {payload}")
+    logger.debug("Order payload for %s: %s", symbol, payload)
 
-    return _make_request('POST', orders_url(), headers=headers, json=payload)
+    return _submit_order(access_token, orders_url(), payload, _recent_orders_url(orders_url),
+                         submit_attempts=submit_attempts, timeout=timeout)
 
 # Market order functions
+@traced
 def order_buy_market(access_token: str, symbol: str, quantity: Union[int, float], 
-                     time_in_force: str = 'gfd', extended_hours: bool = False) -> Optional[Dict]:
+                     time_in_force: str = 'gfd', extended_hours: bool = False, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy market order - STATELESS VERSION (supports fractional shares)"""
     return order(access_token, symbol, quantity, 'buy', 'market', 
-                time_in_force=time_in_force, extended_hours=extended_hours)
+                time_in_force=time_in_force, extended_hours=extended_hours, ref_id=ref_id)
 
+@traced
 def order_sell_market(access_token: str, symbol: str, quantity: Union[int, float], 
-                      time_in_force: str = 'gfd', extended_hours: bool = False) -> Optional[Dict]:
+                      time_in_force: str = 'gfd', extended_hours: bool = False, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell market order - STATELESS VERSION"""
     return order(access_token, symbol, quantity, 'sell', 'market', 
-                time_in_force=time_in_force, extended_hours=extended_hours)
+                time_in_force=time_in_force, extended_hours=extended_hours, ref_id=ref_id)
 
 # Limit order functions
-def order_buy_limit(access_token: str, symbol: str, quantity: int, price: float) -> Optional[Dict]:
+@traced
+def order_buy_limit(access_token: str, symbol: str, quantity: int, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy limit order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'buy', 'limit', price)
+    return order(access_token, symbol, quantity, 'buy', 'limit', price, ref_id=ref_id)
 
-def order_sell_limit(access_token: str, symbol: str, quantity: int, price: float) -> Optional[Dict]:
+@traced
+def order_sell_limit(access_token: str, symbol: str, quantity: int, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell limit order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'sell', 'limit', price)
+    return order(access_token, symbol, quantity, 'sell', 'limit', price, ref_id=ref_id)
 
 # Stop-loss order functions
-def order_buy_stop_loss(access_token: str, symbol: str, quantity: int, stop_price: float) -> Optional[Dict]:
+@traced
+def order_buy_stop_loss(access_token: str, symbol: str, quantity: int, stop_price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy stop-loss order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'buy', 'market', trigger='stop', stop_price=str(stop_price))
+    return order(access_token, symbol, quantity, 'buy', 'market', trigger='stop', stop_price=str(stop_price), ref_id=ref_id)
 
-def order_sell_stop_loss(access_token: str, symbol: str, quantity: int, stop_price: float) -> Optional[Dict]:
+@traced
+def order_sell_stop_loss(access_token: str, symbol: str, quantity: int, stop_price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell stop-loss order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'sell', 'market', trigger='stop', stop_price=str(stop_price))
+    return order(access_token, symbol, quantity, 'sell', 'market', trigger='stop', stop_price=str(stop_price), ref_id=ref_id)
 
 # Stop-limit order functions  
-def order_buy_stop_limit(access_token: str, symbol: str, quantity: int, price: float, stop_price: float) -> Optional[Dict]:
+@traced
+def order_buy_stop_limit(access_token: str, symbol: str, quantity: int, price: float, stop_price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy stop-limit order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'buy', 'limit', price, trigger='stop', stop_price=str(stop_price))
+    return order(access_token, symbol, quantity, 'buy', 'limit', price, trigger='stop', stop_price=str(stop_price), ref_id=ref_id)
 
-def order_sell_stop_limit(access_token: str, symbol: str, quantity: int, price: float, stop_price: float) -> Optional[Dict]:
+@traced
+def order_sell_stop_limit(access_token: str, symbol: str, quantity: int, price: float, stop_price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell stop-limit order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'sell', 'limit', price, trigger='stop', stop_price=str(stop_price))
+    return order(access_token, symbol, quantity, 'sell', 'limit', price, trigger='stop', stop_price=str(stop_price), ref_id=ref_id)
 
 # Trailing stop functions
-def order_buy_trailing_stop(access_token: str, symbol: str, quantity: int, trailing_pct: float) -> Optional[Dict]:
+@traced
+def order_buy_trailing_stop(access_token: str, symbol: str, quantity: int, trailing_pct: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy trailing stop order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'buy', 'market', trigger='stop', trailing_pct=str(trailing_pct))
+    return order(access_token, symbol, quantity, 'buy', 'market', trigger='stop', trailing_pct=str(trailing_pct), ref_id=ref_id)
 
-def order_sell_trailing_stop(access_token: str, symbol: str, quantity: int, trailing_pct: float) -> Optional[Dict]:
+@traced
+def order_sell_trailing_stop(access_token: str, symbol: str, quantity: int, trailing_pct: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell trailing stop order - STATELESS VERSION"""
-    return order(access_token, symbol, quantity, 'sell', 'market', trigger='stop', trailing_pct=str(trailing_pct))
+    return order(access_token, symbol, quantity, 'sell', 'market', trigger='stop', trailing_pct=str(trailing_pct), ref_id=ref_id)
 
 # Fractional order functions
+@traced
 def order_buy_fractional_by_price(access_token: str, symbol: str, amount_in_dollars: float, 
                                   account_number: Optional[str] = None, time_in_force: str = 'gfd',
-                                  extended_hours: bool = False, market_hours: str = 'regular_hours') -> Optional[Dict]:
+                                  extended_hours: bool = False, market_hours: str = 'regular_hours', ref_id: Optional[str] = None) -> Optional[Dict]:
     """Submits a market order to be executed immediately for fractional shares by specifying the amount in dollars.
     
     :param access_token: The access token for authentication
@@ -362,7 +475,7 @@ def order_buy_fractional_by_price(access_token: str, symbol: str, amount_in_doll
     :returns: Dictionary containing order information
     """
     if amount_in_dollars < 1:
-        print(f"ERROR: Fractional share price should meet minimum 1.00, got {amount_in_dollars}")
+        logger.error("Fractional share amount should be at least 1.00, got %s", amount_in_dollars)
         return None
 
     # Get the current ask price to calculate fractional shares (matching GitHub implementation)
@@ -370,33 +483,34 @@ def order_buy_fractional_by_price(access_token: str, symbol: str, amount_in_doll
     quotes = get_quotes(access_token, [symbol])
     
     if not quotes or not quotes[0]:
-        print(f"ERROR: Could not get quote for {symbol}")
+        logger.error("Could not get quote for %s", symbol)
         return None
     
     quote = quotes[0]
     ask_price = float(quote.get('ask_price', 0.0))
     
     if ask_price == 0.0:
-        print(f"ERROR: Invalid ask price for {symbol}")
+        logger.error("Invalid ask price for %s", symbol)
         return None
     
     # Calculate fractional shares (matching GitHub logic)
     fractional_shares = round_price(amount_in_dollars / ask_price)
     
-    print(f"ROBINHOOD DEBUG: {symbol} ask_price=${ask_price}, amount=${amount_in_dollars}, fractional_shares={fractional_shares}")
+    logger.debug("%s ask_price=%s amount=%s fractional_shares=%s", symbol, ask_price, amount_in_dollars, fractional_shares)
     
     # Use the generic order function like the GitHub version
     return order(access_token, symbol, fractional_shares, 'buy', 'market', 
-                time_in_force=time_in_force, market_hours=market_hours)
+                time_in_force=time_in_force, market_hours=market_hours, ref_id=ref_id)
 
-def order_sell_fractional_by_price(access_token: str, symbol: str, amount: float) -> Optional[Dict]:
+@traced
+def order_sell_fractional_by_price(access_token: str, symbol: str, amount: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell fractional shares by dollar amount - STATELESS VERSION
 
     Note: Converts dollar amount to quantity and uses order_sell_fractional_by_quantity
     because dollar_based_amount approach doesn't work reliably with the API
     """
     if amount < 1:
-        print(f"ERROR: Fractional share price should meet minimum 1.00, got {amount}")
+        logger.error("Fractional share amount should be at least 1.00, got %s", amount)
         return None
 
     # Get the current bid price to calculate fractional shares
@@ -404,40 +518,41 @@ def order_sell_fractional_by_price(access_token: str, symbol: str, amount: float
     quotes = get_quotes(access_token, [symbol])
 
     if not quotes or not quotes[0]:
-        print(f"ERROR: Could not get quote for {symbol}")
+        logger.error("Could not get quote for %s", symbol)
         return None
 
     quote = quotes[0]
     bid_price = float(quote.get('bid_price', 0.0))
 
     if bid_price == 0.0:
-        print(f"ERROR: Invalid bid price for {symbol}")
+        logger.error("Invalid bid price for %s", symbol)
         return None
 
     # Calculate fractional shares (round to 6 decimals for Robinhood API)
     fractional_shares = round(amount / bid_price, 6)
 
-    print(f"ROBINHOOD DEBUG: {symbol} bid_price=${bid_price}, amount=${amount}, fractional_shares={fractional_shares}")
+    logger.debug("%s bid_price=%s amount=%s fractional_shares=%s", symbol, bid_price, amount, fractional_shares)
 
     # Use fractional by quantity which works reliably
-    return order_sell_fractional_by_quantity(access_token, symbol, fractional_shares)
+    return order_sell_fractional_by_quantity(access_token, symbol, fractional_shares, ref_id=ref_id)
 
-def order_buy_fractional_by_quantity(access_token: str, symbol: str, quantity: float) -> Optional[Dict]:
+@traced
+def order_buy_fractional_by_quantity(access_token: str, symbol: str, quantity: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy fractional shares by quantity - STATELESS VERSION (matching original robin-stocks)"""
     # Use the standard order function like the original implementation
     return order(access_token, symbol, quantity, 'buy', 'market', 
-                time_in_force='gfd', market_hours='regular_hours')
+                time_in_force='gfd', market_hours='regular_hours', ref_id=ref_id)
 
-def order_sell_fractional_by_quantity(access_token: str, symbol: str, quantity: float) -> Optional[Dict]:
+@traced
+def order_sell_fractional_by_quantity(access_token: str, symbol: str, quantity: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell fractional shares by quantity - STATELESS VERSION"""
     # Use 'gfd' (good for day) like original GitHub implementation
-    return order(access_token, symbol, quantity, 'sell', 'market', time_in_force='gfd')
+    return order(access_token, symbol, quantity, 'sell', 'market', time_in_force='gfd', ref_id=ref_id)
 
 # Crypto order functions  
-def order_buy_crypto_by_price(access_token: str, symbol: str, amount_in_dollars: float) -> Optional[Dict]:
+@traced
+def order_buy_crypto_by_price(access_token: str, symbol: str, amount_in_dollars: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy crypto by dollar amount - STATELESS VERSION (matching GitHub logic)"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get crypto account ID (not URL)
     first_crypto_account = request_get(access_token, crypto_account_url(), data_type='indexzero')
     if not first_crypto_account:
@@ -461,9 +576,8 @@ def order_buy_crypto_by_price(access_token: str, symbol: str, amount_in_dollars:
     from .helper import round_price
     quantity = round_price(amount_in_dollars / crypto_price_float)
     
-    # Generate unique reference ID (like GitHub)
-    import uuid
-    ref_id = str(uuid.uuid4())
+    # Caller supplied ref_id makes retries idempotent, otherwise generate one (like GitHub)
+    ref_id = ref_id or str(uuid.uuid4())
     
     # Build payload matching GitHub format exactly
     payload = {
@@ -477,14 +591,11 @@ def order_buy_crypto_by_price(access_token: str, symbol: str, amount_in_dollars:
         'type': 'market'
     }
     
-    result = _make_request('POST', order_crypto_url(), headers=headers, json=payload)
-    
-    return result
+    return _submit_order(access_token, order_crypto_url(), payload, crypto_orders_url())
 
-def order_sell_crypto_by_price(access_token: str, symbol: str, amount: float) -> Optional[Dict]:
+@traced
+def order_sell_crypto_by_price(access_token: str, symbol: str, amount: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell crypto by dollar amount - STATELESS VERSION (matching GitHub format)"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get crypto account ID (not URL)
     first_crypto_account = request_get(access_token, crypto_account_url(), data_type='indexzero')
     if not first_crypto_account:
@@ -508,9 +619,8 @@ def order_sell_crypto_by_price(access_token: str, symbol: str, amount: float) ->
     from .helper import round_price
     quantity = round_price(amount / crypto_price_float)
     
-    # Generate unique reference ID (like GitHub)
-    import uuid
-    ref_id = str(uuid.uuid4())
+    # Caller supplied ref_id makes retries idempotent, otherwise generate one (like GitHub)
+    ref_id = ref_id or str(uuid.uuid4())
     
     # Build payload matching GitHub format exactly
     payload = {
@@ -524,12 +634,11 @@ def order_sell_crypto_by_price(access_token: str, symbol: str, amount: float) ->
         'type': 'market'
     }
     
-    return _make_request('POST', order_crypto_url(), headers=headers, json=payload)
+    return _submit_order(access_token, order_crypto_url(), payload, crypto_orders_url())
 
-def order_buy_crypto_by_quantity(access_token: str, symbol: str, quantity: float) -> Optional[Dict]:
+@traced
+def order_buy_crypto_by_quantity(access_token: str, symbol: str, quantity: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy crypto by quantity - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get crypto account URL
     account_url = _get_crypto_account_url(access_token)
     if not account_url:
@@ -538,18 +647,18 @@ def order_buy_crypto_by_quantity(access_token: str, symbol: str, quantity: float
     payload = {
         'account': account_url,
         'currency_pair_id': symbol,
+        'ref_id': ref_id or str(uuid.uuid4()),
         'quantity': str(quantity),
         'side': 'buy',
         'time_in_force': 'gtc',
         'type': 'market'
     }
     
-    return _make_request('POST', order_crypto_url(), headers=headers, json=payload)
+    return _submit_order(access_token, order_crypto_url(), payload, crypto_orders_url())
 
-def order_sell_crypto_by_quantity(access_token: str, symbol: str, quantity: float) -> Optional[Dict]:
+@traced
+def order_sell_crypto_by_quantity(access_token: str, symbol: str, quantity: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell crypto by quantity - STATELESS VERSION (matching GitHub format)"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get crypto account ID (not URL)
     first_crypto_account = request_get(access_token, crypto_account_url(), data_type='indexzero')
     if not first_crypto_account:
@@ -569,9 +678,8 @@ def order_sell_crypto_by_quantity(access_token: str, symbol: str, quantity: floa
     
     crypto_price_float = round(float(crypto_price), 2)  # Round to nearest cent
     
-    # Generate unique reference ID (like GitHub)
-    import uuid
-    ref_id = str(uuid.uuid4())
+    # Caller supplied ref_id makes retries idempotent, otherwise generate one (like GitHub)
+    ref_id = ref_id or str(uuid.uuid4())
     
     # Build payload matching GitHub format exactly
     payload = {
@@ -585,13 +693,12 @@ def order_sell_crypto_by_quantity(access_token: str, symbol: str, quantity: floa
         'type': 'market'
     }
     
-    return _make_request('POST', order_crypto_url(), headers=headers, json=payload)
+    return _submit_order(access_token, order_crypto_url(), payload, crypto_orders_url())
 
+@traced
 def order_crypto(access_token: str, symbol: str, side: str, quantity: Optional[float] = None, 
-                price: Optional[float] = None, order_type: str = 'market') -> Optional[Dict]:
+                price: Optional[float] = None, order_type: str = 'market', ref_id: Optional[str] = None) -> Optional[Dict]:
     """Generic crypto order - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get crypto account URL
     account_url = _get_crypto_account_url(access_token)
     if not account_url:
@@ -600,6 +707,7 @@ def order_crypto(access_token: str, symbol: str, side: str, quantity: Optional[f
     payload = {
         'account': account_url,
         'currency_pair_id': symbol,
+        'ref_id': ref_id or str(uuid.uuid4()),
         'side': side,
         'time_in_force': 'gtc',
         'type': order_type
@@ -610,33 +718,36 @@ def order_crypto(access_token: str, symbol: str, side: str, quantity: Optional[f
     if price:
         payload['price'] = str(price)
     
-    return _make_request('POST', order_crypto_url(), headers=headers, json=payload)
+    return _submit_order(access_token, order_crypto_url(), payload, crypto_orders_url())
 
-def order_buy_crypto_limit(access_token: str, symbol: str, quantity: float, price: float) -> Optional[Dict]:
+@traced
+def order_buy_crypto_limit(access_token: str, symbol: str, quantity: float, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy crypto limit order - STATELESS VERSION"""
-    return order_crypto(access_token, symbol, 'buy', quantity=quantity, price=price, order_type='limit')
+    return order_crypto(access_token, symbol, 'buy', quantity=quantity, price=price, order_type='limit', ref_id=ref_id)
 
-def order_sell_crypto_limit(access_token: str, symbol: str, quantity: float, price: float) -> Optional[Dict]:
+@traced
+def order_sell_crypto_limit(access_token: str, symbol: str, quantity: float, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell crypto limit order - STATELESS VERSION"""
-    return order_crypto(access_token, symbol, 'sell', quantity=quantity, price=price, order_type='limit')
+    return order_crypto(access_token, symbol, 'sell', quantity=quantity, price=price, order_type='limit', ref_id=ref_id)
 
-def order_buy_crypto_limit_by_price(access_token: str, symbol: str, amount: float, price: float) -> Optional[Dict]:
+@traced
+def order_buy_crypto_limit_by_price(access_token: str, symbol: str, amount: float, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy crypto limit by dollar amount - STATELESS VERSION"""
-    return order_crypto(access_token, symbol, 'buy', price=amount, order_type='limit')
+    return order_crypto(access_token, symbol, 'buy', price=amount, order_type='limit', ref_id=ref_id)
 
-def order_sell_crypto_limit_by_price(access_token: str, symbol: str, amount: float, price: float) -> Optional[Dict]:
+@traced
+def order_sell_crypto_limit_by_price(access_token: str, symbol: str, amount: float, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell crypto limit by dollar amount - STATELESS VERSION"""
-    return order_crypto(access_token, symbol, 'sell', price=amount, order_type='limit')
+    return order_crypto(access_token, symbol, 'sell', price=amount, order_type='limit', ref_id=ref_id)
 
 # ============================================================================
 # OPTION ORDER FUNCTIONS - STATELESS IMPLEMENTATIONS
 # ============================================================================
 
+@traced
 def order_buy_option_limit(access_token: str, symbol: str, expiration_date: str, strike: float, 
-                          option_type: str, quantity: int, price: float) -> Optional[Dict]:
+                          option_type: str, quantity: int, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy option limit order - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get account URL
     account_url = _get_account_url(access_token)
     if not account_url:
@@ -662,16 +773,16 @@ def order_buy_option_limit(access_token: str, symbol: str, expiration_date: str,
         'type': 'limit',
         'trigger': 'immediate',
         'quantity': str(quantity),
-        'price': str(price)
+        'price': str(price),
+        'ref_id': ref_id or str(uuid.uuid4())
     }
     
-    return _make_request('POST', option_orders_url(), headers=headers, json=payload)
+    return _submit_order(access_token, option_orders_url(), payload, _recent_orders_url(option_orders_url))
 
+@traced
 def order_sell_option_limit(access_token: str, symbol: str, expiration_date: str, strike: float, 
-                           option_type: str, quantity: int, price: float) -> Optional[Dict]:
+                           option_type: str, quantity: int, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell option limit order - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get account URL
     account_url = _get_account_url(access_token)
     if not account_url:
@@ -697,16 +808,16 @@ def order_sell_option_limit(access_token: str, symbol: str, expiration_date: str
         'type': 'limit',
         'trigger': 'immediate',
         'quantity': str(quantity),
-        'price': str(price)
+        'price': str(price),
+        'ref_id': ref_id or str(uuid.uuid4())
     }
     
-    return _make_request('POST', option_orders_url(), headers=headers, json=payload)
+    return _submit_order(access_token, option_orders_url(), payload, _recent_orders_url(option_orders_url))
 
+@traced
 def order_buy_option_stop_limit(access_token: str, symbol: str, expiration_date: str, strike: float, 
-                               option_type: str, quantity: int, price: float, stop_price: float) -> Optional[Dict]:
+                               option_type: str, quantity: int, price: float, stop_price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Buy option stop limit order - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get account URL
     account_url = _get_account_url(access_token)
     if not account_url:
@@ -733,16 +844,16 @@ def order_buy_option_stop_limit(access_token: str, symbol: str, expiration_date:
         'trigger': 'stop',
         'quantity': str(quantity),
         'price': str(price),
-        'stop_price': str(stop_price)
+        'stop_price': str(stop_price),
+        'ref_id': ref_id or str(uuid.uuid4())
     }
     
-    return _make_request('POST', option_orders_url(), headers=headers, json=payload)
+    return _submit_order(access_token, option_orders_url(), payload, _recent_orders_url(option_orders_url))
 
+@traced
 def order_sell_option_stop_limit(access_token: str, symbol: str, expiration_date: str, strike: float, 
-                                option_type: str, quantity: int, price: float, stop_price: float) -> Optional[Dict]:
+                                option_type: str, quantity: int, price: float, stop_price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Sell option stop limit order - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get account URL
     account_url = _get_account_url(access_token)
     if not account_url:
@@ -769,17 +880,17 @@ def order_sell_option_stop_limit(access_token: str, symbol: str, expiration_date
         'trigger': 'stop',
         'quantity': str(quantity),
         'price': str(price),
-        'stop_price': str(stop_price)
+        'stop_price': str(stop_price),
+        'ref_id': ref_id or str(uuid.uuid4())
     }
     
-    return _make_request('POST', option_orders_url(), headers=headers, json=payload)
+    return _submit_order(access_token, option_orders_url(), payload, _recent_orders_url(option_orders_url))
 
+@traced
 def order_option_spread(access_token: str, symbol: str, expiration_date: str, 
                        buy_strike: float, sell_strike: float, option_type: str, 
-                       quantity: int, price: float, direction: str = 'debit') -> Optional[Dict]:
+                       quantity: int, price: float, direction: str = 'debit', ref_id: Optional[str] = None) -> Optional[Dict]:
     """Generic option spread order - STATELESS VERSION"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     # Get account URL
     account_url = _get_account_url(access_token)
     if not account_url:
@@ -813,39 +924,42 @@ def order_option_spread(access_token: str, symbol: str, expiration_date: str,
         'type': 'limit',
         'trigger': 'immediate',
         'quantity': str(quantity),
-        'price': str(price)
+        'price': str(price),
+        'ref_id': ref_id or str(uuid.uuid4())
     }
     
-    return _make_request('POST', option_orders_url(), headers=headers, json=payload)
+    return _submit_order(access_token, option_orders_url(), payload, _recent_orders_url(option_orders_url))
 
+@traced
 def order_option_credit_spread(access_token: str, symbol: str, expiration_date: str, 
                               short_strike: float, long_strike: float, option_type: str, 
-                              quantity: int, price: float) -> Optional[Dict]:
+                              quantity: int, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Option credit spread order - STATELESS VERSION"""
     # For credit spreads: sell higher strike (short), buy lower strike (long)
     if option_type.lower() == 'put':
         # Put credit spread: sell higher strike, buy lower strike
         return order_option_spread(access_token, symbol, expiration_date, 
                                  long_strike, short_strike, option_type, 
-                                 quantity, price, direction='credit')
+                                 quantity, price, direction='credit', ref_id=ref_id)
     else:
         # Call credit spread: sell lower strike, buy higher strike  
         return order_option_spread(access_token, symbol, expiration_date, 
                                  short_strike, long_strike, option_type, 
-                                 quantity, price, direction='credit')
+                                 quantity, price, direction='credit', ref_id=ref_id)
 
+@traced
 def order_option_debit_spread(access_token: str, symbol: str, expiration_date: str, 
                              long_strike: float, short_strike: float, option_type: str, 
-                             quantity: int, price: float) -> Optional[Dict]:
+                             quantity: int, price: float, ref_id: Optional[str] = None) -> Optional[Dict]:
     """Option debit spread order - STATELESS VERSION"""
     # For debit spreads: buy higher strike (long), sell lower strike (short)  
     if option_type.lower() == 'call':
         # Call debit spread: buy lower strike, sell higher strike
         return order_option_spread(access_token, symbol, expiration_date, 
                                  long_strike, short_strike, option_type, 
-                                 quantity, price, direction='debit')
+                                 quantity, price, direction='debit', ref_id=ref_id)
     else:
         # Put debit spread: buy higher strike, sell lower strike
         return order_option_spread(access_token, symbol, expiration_date, 
                                  long_strike, short_strike, option_type, 
-                                 quantity, price, direction='debit')
+                                 quantity, price, direction='debit', ref_id=ref_id)
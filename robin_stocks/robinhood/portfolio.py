@@ -0,0 +1,382 @@
+"""Columnar portfolio valuation with NumPy
+
+:class:`PortfolioEngine` keeps the stock, option and crypto positions of any
+number of accounts in flat NumPy arrays (quantity, multiplier, cost basis,
+mark, greeks) and values them with vectorised arithmetic. Quote snapshots
+update only the marks of the instruments they contain; nothing is rebuilt from
+the position dicts until positions themselves change::
+
+    engine = PortfolioEngine(sectors={'AAPL': 'Technology'})
+    engine.add_account('acct-1',
+                       stocks=account.get_positions(token),
+                       options=options.get_open_option_positions(token),
+                       crypto=crypto.get_crypto_positions(token))
+
+    engine.update_quotes(stock_quotes=stocks.get_quotes(token, symbols),
+                         option_market_data=options.get_option_market_data(token, option_ids))
+    engine.totals()
+    engine.exposure_by_sector()
+    engine.greek_exposure()
+
+Stock rows are keyed by instrument id, option rows by option instrument id and
+crypto rows by currency code, so one quote updates that instrument in every
+account. Sectors come from a symbol mapping, e.g. the ``sector`` field of
+:func:`stocks.get_fundamentals`.
+
+NumPy is an optional dependency: ``pip install robin_stocks[portfolio]``.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STOCK = 0
+OPTION = 1
+CRYPTO = 2
+ASSET_CLASSES = ('stock', 'option', 'crypto')
+
+UNKNOWN_SECTOR = 'Unknown'
+
+_GREEKS = ('delta', 'gamma', 'theta', 'vega')
+
+
+def _float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value) if value is not None and value != '' else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _last_segment(url: Optional[str]) -> Optional[str]:
+    parts = [part for part in (url or '').split('/') if part]
+    return parts[-1] if parts else None
+
+
+class PortfolioEngine:
+    """Values positions of many accounts from columnar arrays and incremental marks.
+
+    :param sectors: Symbols mapped to sector names; unknown symbols count as 'Unknown'
+    :type sectors: Optional[Mapping[str, str]]
+    """
+
+    def __init__(self, sectors: Optional[Mapping[str, str]] = None):
+        if np is None:
+            raise ImportError("PortfolioEngine requires NumPy: pip install robin_stocks[portfolio]")
+        self.sectors: Dict[str, str] = dict(sectors or {})
+        self._rows: List[Tuple] = []
+        self._accounts: List[Hashable] = []
+        self._account_index: Dict[Hashable, int] = {}
+        # Last known mark and greeks per instrument key, reapplied when arrays are rebuilt
+        self._marks: Dict[Hashable, float] = {}
+        self._greeks: Dict[Hashable, Tuple[float, float, float, float]] = {}
+        self._underlying_marks: Dict[str, float] = {}
+        self._symbols: Dict[Hashable, str] = {}
+        self._built = False
+        self._valued = False
+
+    # ------------------------------------------------------------------
+    # Positions
+    # ------------------------------------------------------------------
+
+    def add_account(self, account: Hashable, stocks: Iterable[Dict] = (), options: Iterable[Dict] = (),
+                    crypto: Iterable[Dict] = ()) -> None:
+        """Adds (or replaces) the positions of one account.
+
+        :param account: Any key naming the account
+        :type account: Hashable
+        :param stocks: Positions from :func:`account.get_positions`
+        :param options: Positions from :func:`options.get_open_option_positions`. ``average_price``
+            is per contract, i.e. already multiplied by ``trade_value_multiplier``
+        :param crypto: Holdings from :func:`crypto.get_crypto_positions`
+        """
+        index = self._account_index.get(account)
+        if index is None:
+            index = self._account_index[account] = len(self._accounts)
+            self._accounts.append(account)
+        else:
+            # A replaced account keeps its slot
+            self._rows = [row for row in self._rows if row[0] != index]
+
+        for position in stocks:
+            key = position.get('instrument_id') or _last_segment(position.get('instrument'))
+            quantity = _float(position.get('quantity'))
+            if not key or not quantity:
+                continue
+            symbol = position.get('symbol') or self._symbols.get(key)
+            if symbol:
+                self._symbols[key] = symbol
+            self._rows.append((index, STOCK, key, quantity, 1.0,
+                               quantity * _float(position.get('average_buy_price'))))
+
+        for position in options:
+            key = position.get('option_id') or _last_segment(position.get('option'))
+            quantity = _float(position.get('quantity'))
+            if not key or not quantity:
+                continue
+            sign = -1.0 if position.get('type') == 'short' else 1.0
+            if position.get('chain_symbol'):
+                self._symbols[key] = position['chain_symbol']
+            self._rows.append((index, OPTION, key, sign * quantity,
+                               _float(position.get('trade_value_multiplier'), 100.0),
+                               sign * quantity * abs(_float(position.get('average_price')))))
+
+        for holding in crypto:
+            code = (holding.get('currency') or {}).get('code')
+            quantity = _float(holding.get('quantity'))
+            if not code or not quantity:
+                continue
+            self._symbols[code] = code
+            cost = sum(_float(basis.get('direct_cost_basis')) for basis in holding.get('cost_bases') or [])
+            self._rows.append((index, CRYPTO, code, quantity, 1.0, cost))
+
+        self._built = False
+
+    def remove_account(self, account: Hashable) -> None:
+        """Drops every position of an account"""
+        index = self._account_index.pop(account, None)
+        if index is None:
+            return
+        self._rows = [row for row in self._rows if row[0] != index]
+        self._built = False
+
+    def _compact(self) -> None:
+        """Renumbers the remaining accounts densely once accounts were removed"""
+        remap = {}
+        self._accounts = []
+        for account, index in sorted(self._account_index.items(), key=lambda item: item[1]):
+            remap[index] = len(self._accounts)
+            self._accounts.append(account)
+        self._account_index = {account: remap[index] for account, index in self._account_index.items()}
+        self._rows = [(remap[row[0]],) + row[1:] for row in self._rows]
+
+    def _build(self) -> None:
+        """Turns the position rows into arrays, reapplying the last known marks"""
+        if len(self._accounts) != len(self._account_index):
+            self._compact()
+        rows = self._rows
+        self._account = np.array([row[0] for row in rows], dtype=np.int32)
+        self._asset_class = np.array([row[1] for row in rows], dtype=np.int8)
+        self._keys = [row[2] for row in rows]
+        self._quantity = np.array([row[3] for row in rows], dtype=np.float64)
+        self._multiplier = np.array([row[4] for row in rows], dtype=np.float64)
+        self._cost_basis = np.array([row[5] for row in rows], dtype=np.float64)
+        self._mark = np.array([self._marks.get(key, np.nan) for key in self._keys], dtype=np.float64)
+        greeks = np.array([self._greeks.get(key, (np.nan,) * 4) for key in self._keys], dtype=np.float64)
+        self._greek_columns = greeks.reshape(len(rows), 4)
+        # Stocks and crypto move one for one with their own price
+        self._greek_columns[self._asset_class != OPTION] = (1.0, 0.0, 0.0, 0.0)
+
+        positions_by_key: Dict[Hashable, List[int]] = {}
+        for row, key in enumerate(self._keys):
+            positions_by_key.setdefault(key, []).append(row)
+        self._rows_by_key = {key: np.array(indices, dtype=np.intp) for key, indices in positions_by_key.items()}
+        self._built = True
+        self._valued = False
+
+    def _ensure(self) -> None:
+        if not self._built:
+            self._build()
+        if not self._valued:
+            self._market_value = self._quantity * self._multiplier * self._mark
+            self._valued = True
+
+    # ------------------------------------------------------------------
+    # Marks
+    # ------------------------------------------------------------------
+
+    def update_marks(self, marks: Mapping[Hashable, float],
+                     greeks: Optional[Mapping[Hashable, Tuple[float, float, float, float]]] = None) -> int:
+        """Sets the mark (and optionally delta, gamma, theta, vega) of instruments by key.
+
+        :returns: The number of position rows updated
+        """
+        if not self._built:
+            self._build()
+        self._marks.update(marks)
+        if greeks:
+            self._greeks.update(greeks)
+
+        rows = [self._rows_by_key[key] for key in marks if key in self._rows_by_key]
+        if not rows:
+            return 0
+        counts = [len(r) for r in rows]
+        rows = np.concatenate(rows)
+        values = np.repeat(np.fromiter((marks[key] for key in marks if key in self._rows_by_key),
+                                       dtype=np.float64), counts)
+        self._mark[rows] = values
+        if greeks:
+            greek_keys = [key for key in greeks if key in self._rows_by_key]
+            if greek_keys:
+                greek_rows = np.concatenate([self._rows_by_key[key] for key in greek_keys])
+                greek_values = np.repeat(np.array([greeks[key] for key in greek_keys], dtype=np.float64),
+                                         [len(self._rows_by_key[key]) for key in greek_keys], axis=0)
+                self._greek_columns[greek_rows] = greek_values
+        if self._valued:
+            self._market_value[rows] = self._quantity[rows] * self._multiplier[rows] * values
+        return len(rows)
+
+    def update_quotes(self, stock_quotes: Iterable[Dict] = (), option_market_data: Iterable[Dict] = (),
+                      crypto_quotes: Iterable[Dict] = ()) -> int:
+        """Updates marks from raw API payloads.
+
+        :param stock_quotes: Results of :func:`stocks.get_quotes`; extended hours prices win when present.
+            They also price option underlyings for dollar delta.
+        :param option_market_data: Results of :func:`options.get_option_market_data`, with greeks
+        :param crypto_quotes: Results of :func:`crypto.get_crypto_quote`
+        :returns: The number of position rows updated
+        """
+        marks: Dict[Hashable, float] = {}
+        greeks: Dict[Hashable, Tuple[float, float, float, float]] = {}
+        for quote in stock_quotes:
+            if not quote:
+                continue
+            price = _float(quote.get('last_extended_hours_trade_price') or quote.get('last_trade_price'), np.nan)
+            key = quote.get('instrument_id') or _last_segment(quote.get('instrument'))
+            if key:
+                marks[key] = price
+                if quote.get('symbol'):
+                    self._symbols[key] = quote['symbol']
+            if quote.get('symbol'):
+                self._underlying_marks[quote['symbol']] = price
+        for data in option_market_data:
+            if not data:
+                continue
+            key = data.get('instrument_id') or _last_segment(data.get('instrument'))
+            if key:
+                marks[key] = _float(data.get('adjusted_mark_price') or data.get('mark_price'), np.nan)
+                greeks[key] = tuple(_float(data.get(name), np.nan) for name in _GREEKS)
+        for quote in crypto_quotes:
+            if not quote:
+                continue
+            symbol = quote.get('symbol') or ''
+            code = symbol[:-3] if symbol.endswith('USD') else symbol
+            if code:
+                price = _float(quote.get('mark_price'), np.nan)
+                marks[code] = price
+                self._underlying_marks[code] = price
+        return self.update_marks(marks, greeks)
+
+    # ------------------------------------------------------------------
+    # Valuation
+    # ------------------------------------------------------------------
+
+    def _summary(self, market_value: 'np.ndarray', cost_basis: 'np.ndarray') -> Dict[str, float]:
+        priced = ~np.isnan(market_value)
+        value = float(market_value[priced].sum())
+        cost = float(cost_basis[priced].sum())
+        return {
+            'market_value': value,
+            'cost_basis': float(cost_basis.sum()),
+            'unrealized_pnl': value - cost,
+            'unrealized_pnl_percent': (value - cost) * 100 / abs(cost) if cost else 0.0,
+            'unpriced_positions': int((~priced).sum()),
+        }
+
+    def totals(self, asset_class: Optional[str] = None) -> Dict[str, float]:
+        """Market value, cost basis and unrealized P&L over every account.
+
+        Positions without a mark are left out of market value and P&L and counted in
+        ``unpriced_positions``; ``cost_basis`` covers every position.
+
+        :param asset_class: 'stock', 'option' or 'crypto' to restrict the totals
+        :type asset_class: Optional[str]
+        """
+        self._ensure()
+        if asset_class is None:
+            return self._summary(self._market_value, self._cost_basis)
+        selected = self._asset_class == ASSET_CLASSES.index(asset_class)
+        return self._summary(self._market_value[selected], self._cost_basis[selected])
+
+    def by_account(self) -> Dict[Hashable, Dict[str, float]]:
+        """Market value, cost basis and unrealized P&L per account"""
+        self._ensure()
+        count = len(self._accounts)
+        priced = ~np.isnan(self._market_value)
+        value = np.bincount(self._account, weights=np.where(priced, self._market_value, 0.0), minlength=count)
+        cost_priced = np.bincount(self._account, weights=np.where(priced, self._cost_basis, 0.0), minlength=count)
+        cost = np.bincount(self._account, weights=self._cost_basis, minlength=count)
+        unpriced = np.bincount(self._account, weights=~priced, minlength=count)
+        results = {}
+        for account, index in self._account_index.items():
+            pnl = value[index] - cost_priced[index]
+            results[account] = {
+                'market_value': float(value[index]),
+                'cost_basis': float(cost[index]),
+                'unrealized_pnl': float(pnl),
+                'unrealized_pnl_percent': float(pnl * 100 / abs(cost_priced[index])) if cost_priced[index] else 0.0,
+                'unpriced_positions': int(unpriced[index]),
+            }
+        return results
+
+    def _group(self, labels: List[str], weights: 'np.ndarray') -> Dict[str, float]:
+        names, inverse = np.unique(np.array(labels, dtype=object), return_inverse=True)
+        sums = np.bincount(inverse, weights=np.nan_to_num(weights), minlength=len(names))
+        return {str(name): float(total) for name, total in zip(names, sums)}
+
+    def _underlyings(self) -> List[str]:
+        return [self._symbols.get(key, str(key)) for key in self._keys]
+
+    def _delta_shares(self) -> 'np.ndarray':
+        return self._greek_columns[:, 0] * self._quantity * self._multiplier
+
+    def exposure_by_sector(self, delta_adjusted: bool = True) -> Dict[str, float]:
+        """Dollar exposure per sector.
+
+        :param delta_adjusted: Count options by delta times the underlying price (dollar delta)
+            instead of their premium
+        :type delta_adjusted: bool
+        """
+        self._ensure()
+        underlyings = self._underlyings()
+        exposure = self._market_value.copy()
+        if delta_adjusted:
+            options = self._asset_class == OPTION
+            prices = np.array([self._underlying_marks.get(symbol, np.nan) for symbol in underlyings],
+                              dtype=np.float64)
+            exposure[options] = (self._delta_shares() * prices)[options]
+        sectors = [self.sectors.get(symbol, UNKNOWN_SECTOR) for symbol in underlyings]
+        return self._group(sectors, exposure)
+
+    def greek_exposure(self, by_underlying: bool = False) -> Dict[str, Any]:
+        """Position-weighted greeks: delta in shares and dollars, gamma, theta and vega.
+
+        Stock and crypto rows have delta 1; option greeks come from market data.
+
+        :param by_underlying: Break the exposure down per underlying symbol
+        :type by_underlying: bool
+        """
+        self._ensure()
+        size = self._quantity * self._multiplier
+        underlyings = self._underlyings()
+        prices = np.array([self._underlying_marks.get(symbol, np.nan) for symbol in underlyings], dtype=np.float64)
+        prices = np.where(self._asset_class == OPTION, prices, self._mark)
+        columns = {
+            'delta': self._delta_shares(),
+            'delta_dollars': self._delta_shares() * prices,
+            'gamma': self._greek_columns[:, 1] * size,
+            'theta': self._greek_columns[:, 2] * size,
+            'vega': self._greek_columns[:, 3] * size,
+        }
+        if not by_underlying:
+            return {name: float(np.nansum(values)) for name, values in columns.items()}
+        grouped = {name: self._group(underlyings, values) for name, values in columns.items()}
+        return {symbol: {name: grouped[name][symbol] for name in columns} for symbol in grouped['delta']}
+
+    def positions(self) -> List[Dict[str, Any]]:
+        """Every position row with its current valuation, for display"""
+        self._ensure()
+        pnl = self._market_value - self._cost_basis
+        return [{
+            'account': self._accounts[self._account[row]],
+            'asset_class': ASSET_CLASSES[self._asset_class[row]],
+            'key': key,
+            'symbol': self._symbols.get(key),
+            'quantity': float(self._quantity[row]),
+            'mark': float(self._mark[row]),
+            'market_value': float(self._market_value[row]),
+            'cost_basis': float(self._cost_basis[row]),
+            'unrealized_pnl': float(pnl[row]),
+        } for row, key in enumerate(self._keys)]
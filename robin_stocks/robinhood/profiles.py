@@ -2,6 +2,7 @@
 
 from typing import Dict, List, Any, Optional
 from .helper import _make_request, request_get
+from .tracing import traced
 from .urls import (
     account_profile_url, basic_profile_url, investment_profile_url,
     portfolio_profile_url, security_profile_url, user_profile_url,
@@ -10,6 +11,7 @@ from .urls import (
 
 # STATELESS REPLACEMENTS for all profile functions - NO MORE BLOCKING!
 
+@traced
 def load_account_profile(access_token: str, account_number: Optional[str] = None, info: Optional[str] = None) -> Optional[Dict]:
     """Gets the information associated with the accounts profile - STATELESS VERSION"""
     if account_number:
@@ -42,6 +44,7 @@ def load_investment_profile(access_token: str, info: Optional[str] = None) -> Op
         return response[info]
     return response
 
+@traced
 def load_portfolio_profile(access_token: str, account_number: Optional[str] = None, info: Optional[str] = None) -> Optional[Dict]:
     """Gets the information associated with the portfolios profile - STATELESS VERSION"""
     if account_number:
@@ -0,0 +1,198 @@
+"""Client-side rate limiting for the request layer
+
+Token buckets per host and per endpoint group (quotes, orders, instruments,
+auth) keep the request rate under the server's throttling threshold. Buckets
+work by reservation: every request takes a token immediately and is told how
+long to wait if the bucket was already empty, so waiting callers queue in
+arrival order without busy-looping.
+
+Buckets live in a backend. :class:`LocalBackend` shares them between threads
+of one process; :class:`FileLockBackend` keeps them in a small file guarded by
+``fcntl.flock`` so several worker processes on one machine draw from the same
+budget. Install a limiter with
+:func:`robin_stocks.robinhood.helper.set_rate_limiter`.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from .urls import endpoint_group, endpoint_host
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# (requests per second, burst capacity)
+DEFAULT_HOST_RATE = (10.0, 20.0)
+DEFAULT_GROUP_RATES = {
+    'orders': (2.0, 5.0),
+    'quotes': (5.0, 10.0),
+    'instruments': (5.0, 10.0),
+    'auth': (0.5, 2.0),
+}
+
+
+def _refill(state: Optional[list], rate: float, capacity: float, now: float) -> float:
+    """Returns the tokens of a bucket state [tokens, timestamp] at ``now``"""
+    if state is None:
+        return capacity
+    available, last = state
+    return min(capacity, available + (now - last) * rate)
+
+
+def _reserve(state: Optional[list], rate: float, capacity: float, tokens: float, now: float) -> Tuple[list, float]:
+    """Takes tokens from a bucket state and returns the new state and the wait"""
+    available = _refill(state, rate, capacity, now) - tokens
+    wait = -available / rate if available < 0 else 0.0
+    return [available, now], wait
+
+
+def _refund(state: Optional[list], rate: float, capacity: float, tokens: float, now: float) -> Tuple[list, float]:
+    """Gives reserved tokens back to a bucket state"""
+    return [min(capacity, _refill(state, rate, capacity, now) + tokens), now], 0.0
+
+
+def _penalize(state: Optional[list], rate: float, capacity: float, seconds: float, now: float) -> Tuple[list, float]:
+    """Puts a bucket at least ``seconds`` in debt; an existing longer debt is kept, not extended"""
+    return [min(_refill(state, rate, capacity, now), -seconds * rate), now], 0.0
+
+
+class LocalBackend:
+    """Bucket storage shared by every thread of the current process"""
+
+    def __init__(self):
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _update(self, key: str, change, *args) -> float:
+        with self._lock:
+            self._buckets[key], wait = change(self._buckets.get(key), *args, time.monotonic())
+        return wait
+
+    def reserve(self, key: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        """Reserves tokens from a bucket and returns how many seconds the caller must wait"""
+        return self._update(key, _reserve, rate, capacity, tokens)
+
+    def refund(self, key: str, rate: float, capacity: float, tokens: float = 1.0) -> None:
+        """Returns tokens reserved by a request that was not sent"""
+        self._update(key, _refund, rate, capacity, tokens)
+
+    def penalize(self, key: str, rate: float, capacity: float, seconds: float) -> None:
+        """Makes the next reservation wait at least ``seconds``"""
+        self._update(key, _penalize, rate, capacity, seconds)
+
+
+class FileLockBackend:
+    """Bucket storage shared across processes through a lock-protected JSON file.
+
+    :param path: File holding the bucket state. Every cooperating process must use the same path.
+    :type path: str
+    """
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("FileLockBackend requires fcntl, which is not available on this platform")
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _update(self, key: str, change, *args) -> float:
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = b''
+                while True:
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        break
+                    raw += chunk
+                try:
+                    buckets = json.loads(raw) if raw else {}
+                except ValueError:
+                    buckets = {}
+
+                # Wall clock time, the only clock every process agrees on
+                buckets[key], wait = change(buckets.get(key), *args, time.time())
+
+                data = json.dumps(buckets).encode()
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        return wait
+
+    def reserve(self, key: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        """Reserves tokens from a bucket and returns how many seconds the caller must wait"""
+        return self._update(key, _reserve, rate, capacity, tokens)
+
+    def refund(self, key: str, rate: float, capacity: float, tokens: float = 1.0) -> None:
+        """Returns tokens reserved by a request that was not sent"""
+        self._update(key, _refund, rate, capacity, tokens)
+
+    def penalize(self, key: str, rate: float, capacity: float, seconds: float) -> None:
+        """Makes the next reservation wait at least ``seconds``"""
+        self._update(key, _penalize, rate, capacity, seconds)
+
+
+class RateLimiter:
+    """Token bucket rate limiter keyed by host and endpoint group.
+
+    :param host_rate: (requests per second, burst) applied to every host, None for no host limit
+    :type host_rate: Optional[tuple]
+    :param group_rates: (requests per second, burst) per endpoint group, see
+        :data:`robin_stocks.robinhood.urls.ENDPOINT_GROUPS`. Groups not listed are only host limited.
+    :type group_rates: Optional[dict]
+    :param backend: Where bucket state lives. Defaults to a :class:`LocalBackend`.
+    :param max_wait: Longest a single request may wait for a token before raising, None to always wait
+    :type max_wait: Optional[float]
+    """
+
+    def __init__(self, host_rate: Optional[Tuple[float, float]] = DEFAULT_HOST_RATE,
+                 group_rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 backend=None, max_wait: Optional[float] = None):
+        self.host_rate = host_rate
+        self.group_rates = dict(DEFAULT_GROUP_RATES if group_rates is None else group_rates)
+        self.backend = backend or LocalBackend()
+        self.max_wait = max_wait
+
+    def _buckets(self, url: str):
+        host = endpoint_host(url)
+        if self.host_rate:
+            yield f'host:{host}', self.host_rate
+        group = endpoint_group(url)
+        if group in self.group_rates:
+            yield f'group:{host}:{group}', self.group_rates[group]
+
+    def delay_for(self, url: str) -> float:
+        """Reserves a token in every bucket the URL belongs to and returns the wait in seconds"""
+        wait = 0.0
+        for key, (rate, capacity) in self._buckets(url):
+            wait = max(wait, self.backend.reserve(key, rate, capacity))
+        return wait
+
+    def acquire(self, url: str) -> float:
+        """Blocks until a request to ``url`` is allowed and returns the time spent waiting"""
+        wait = self.delay_for(url)
+        if self.max_wait is not None and wait > self.max_wait:
+            # The request is not sent, so its reservation must not delay the requests behind it
+            for key, (rate, capacity) in self._buckets(url):
+                self.backend.refund(key, rate, capacity)
+            raise RuntimeError(f"Rate limit wait of {wait:.2f}s for {url} exceeds max_wait")
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, url: str, seconds: float) -> None:
+        """Drains the buckets of ``url`` for ``seconds``, e.g. after the server answered 429.
+
+        Every thread and process sharing the backend then backs off together instead of each
+        discovering the throttle on its own. Penalties do not add up: concurrent 429s leave the
+        buckets ``seconds`` in debt, or the longer debt they already had.
+        """
+        for key, (rate, capacity) in self._buckets(url):
+            self.backend.penalize(key, rate, capacity, seconds)
@@ -0,0 +1,130 @@
+"""Retry policies for the request layer
+
+A :class:`RetryPolicy` decides whether a failed attempt is worth repeating and
+how long to wait first. It classifies transport errors and status codes,
+backs off exponentially with jitter, honours ``Retry-After`` and keeps the
+whole call inside a deadline budget.
+
+:func:`robin_stocks.robinhood.helper._make_request` applies the default policy
+to idempotent methods (GET, DELETE). POSTs are only retried when the caller
+passes a policy explicitly.
+"""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Iterable
+from requests import Response
+from requests.exceptions import ConnectionError, Timeout, ChunkedEncodingError
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'DELETE', 'HEAD', 'OPTIONS'})
+
+# Outcome classes returned by RetryPolicy.classify
+SUCCESS = 'success'
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+
+TRANSPORT_ERRORS = (ConnectionError, Timeout, ChunkedEncodingError)
+
+
+def parse_retry_after(response: Optional[Response]) -> Optional[float]:
+    """Returns the delay requested by a ``Retry-After`` header in seconds, if any.
+
+    :param response: The HTTP response
+    :type response: requests.Response or None
+    :returns: Seconds to wait, or None when the header is missing or malformed
+    """
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, Retry-After support and a deadline budget.
+
+    Subclass and override :meth:`classify` or :meth:`delay` to customise behaviour.
+
+    :param max_attempts: Total number of attempts including the first one
+    :type max_attempts: int
+    :param backoff_base: Delay in seconds before the first retry, doubled on every further retry
+    :type backoff_base: float
+    :param backoff_max: Upper bound for a single backoff delay
+    :type backoff_max: float
+    :param jitter: 'full' (uniform between 0 and the backoff), 'equal' (half fixed, half random) or 'none'
+    :type jitter: str
+    :param deadline: Total seconds the call may take across every attempt and delay, None for no budget
+    :type deadline: Optional[float]
+    :param retry_statuses: HTTP status codes treated as transient
+    :type retry_statuses: iterable of int
+    :param retry_transport_errors: Whether connection errors and timeouts are retried
+    :type retry_transport_errors: bool
+    :param max_retry_after: Largest ``Retry-After`` delay honoured; longer requests give up instead
+    :type max_retry_after: float
+    """
+
+    def __init__(self, max_attempts: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 jitter: str = 'full', deadline: Optional[float] = 30.0,
+                 retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+                 retry_transport_errors: bool = True, max_retry_after: float = 60.0):
+        if jitter not in ('full', 'equal', 'none'):
+            raise ValueError("jitter must be 'full', 'equal' or 'none'")
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_transport_errors = retry_transport_errors
+        self.max_retry_after = max_retry_after
+
+    def classify(self, response: Optional[Response] = None, error: Optional[Exception] = None) -> str:
+        """Classifies the outcome of an attempt as SUCCESS, RETRYABLE or FATAL"""
+        if error is not None:
+            if self.retry_transport_errors and isinstance(error, TRANSPORT_ERRORS):
+                return RETRYABLE
+            return FATAL
+        if response is None:
+            return FATAL
+        if response.status_code in self.retry_statuses:
+            retry_after = parse_retry_after(response)
+            if retry_after is not None and retry_after > self.max_retry_after:
+                return FATAL
+            return RETRYABLE
+        if response.status_code >= 400:
+            return FATAL
+        return SUCCESS
+
+    def delay(self, attempt: int, response: Optional[Response] = None) -> float:
+        """Seconds to wait after the given (1-based) failed attempt"""
+        backoff = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        if self.jitter == 'full':
+            backoff = random.uniform(0, backoff)
+        elif self.jitter == 'equal':
+            backoff = backoff / 2 + random.uniform(0, backoff / 2)
+
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+        return backoff
+
+    def should_retry(self, attempt: int, response: Optional[Response] = None,
+                     error: Optional[Exception] = None) -> bool:
+        """True if another attempt should follow the given (1-based) attempt"""
+        return attempt < self.max_attempts and self.classify(response, error) == RETRYABLE
+
+
+# Safe default for idempotent requests
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# Disables retries when passed explicitly, e.g. for a GET that must fail fast
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -0,0 +1,90 @@
+"""Per-token HTTP connection pools
+
+By default :func:`robin_stocks.robinhood.helper.http_transport` opens a new
+``requests.Session`` for every request, paying a TCP and TLS handshake each
+time. A :class:`SessionPool` keeps one session per access token so keep-alive
+connections are reused, while a busy account can never occupy connections that
+belong to another. Sessions never store cookies and carry no headers of their
+own, so nothing about a user outlives the request except the open sockets.
+
+Install a pool with :func:`robin_stocks.robinhood.helper.set_session_pool`.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+from requests import Session
+from requests.adapters import HTTPAdapter
+from .coalesce import token_identity
+
+
+class SessionPool:
+    """Keeps one keep-alive ``requests.Session`` per access token.
+
+    :param pool_maxsize: Connections kept open per host for one token
+    :type pool_maxsize: int
+    :param max_sessions: Sessions kept at once, the least recently used one is closed beyond that
+    :type max_sessions: int
+    :param idle_timeout: Seconds after which an unused session is closed
+    :type idle_timeout: float
+    """
+
+    def __init__(self, pool_maxsize: int = 4, max_sessions: int = 512, idle_timeout: float = 300.0):
+        self.pool_maxsize = pool_maxsize
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions: 'OrderedDict[Optional[str], list]' = OrderedDict()
+        self._created = 0
+        self._closed = 0
+
+    def _new_session(self) -> Session:
+        session = Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session_for(self, headers: Optional[Dict[str, str]]) -> Session:
+        """Returns the session for the token in ``headers``, creating it when needed"""
+        key = token_identity(headers)
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._sessions.move_to_end(key)
+            else:
+                entry = [self._new_session(), now]
+                self._sessions[key] = entry
+                self._created += 1
+            while len(self._sessions) > self.max_sessions:
+                expired.append(self._sessions.popitem(last=False)[1][0])
+            for other, (session, last_used) in list(self._sessions.items()):
+                if now - last_used <= self.idle_timeout:
+                    break
+                del self._sessions[other]
+                expired.append(session)
+            self._closed += len(expired)
+            session = entry[0]
+        for stale in expired:
+            stale.close()
+        return session
+
+    def close(self) -> None:
+        """Closes every session and its connections"""
+        with self._lock:
+            sessions = [entry[0] for entry in self._sessions.values()]
+            self._closed += len(sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of open, created and closed sessions"""
+        with self._lock:
+            return {'open': len(self._sessions), 'created': self._created, 'closed': self._closed}
@@ -0,0 +1,437 @@
+"""TWAP/VWAP order slicing
+
+Splits a parent quantity into child limit orders spread over a time window.
+TWAP uses evenly sized slices, VWAP weights the slices by the symbol's average
+intraday volume curve built from 5 minute historicals. Children are submitted
+through :func:`robin_stocks.robinhood.orders.order` with limit prices derived
+from live quotes.
+
+A single :class:`SliceScheduler` runs any number of parent orders from one
+timer thread and a small worker pool, and all of them share one
+:class:`QuoteCache` so concurrent parents on the same symbols cost one batched
+quote request per refresh.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from .helper import round_price, circuit_wait
+from .orders import OrderStateUnknownError, _find_order_by_ref_id, order
+from .stocks import get_quotes, get_stock_historicals
+from .urls import orders_url
+
+logger = logging.getLogger(__name__)
+
+BUCKET_MINUTES = 5
+
+
+def _to_utc(value: Optional[datetime]) -> datetime:
+    if value is None:
+        return datetime.now(timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _bucket(due: datetime) -> str:
+    """Returns the 'HH:MM' start of the 5 minute bucket a time falls in"""
+    return f'{due.hour:02d}:{due.minute - due.minute % BUCKET_MINUTES:02d}'
+
+
+def _split_quantity(quantity: float, weights: List[float], fractional: bool) -> List[float]:
+    """Splits a quantity proportionally to weights, keeping whole shares unless fractional"""
+    total_weight = sum(weights)
+    if total_weight <= 0:
+        weights = [1.0] * len(weights)
+        total_weight = float(len(weights))
+
+    if fractional:
+        sizes = [round(quantity * weight / total_weight, 6) for weight in weights]
+        sizes[-1] = round(quantity - sum(sizes[:-1]), 6)
+        return sizes
+
+    # Largest remainder method so the whole-share slices add up exactly
+    exact = [quantity * weight / total_weight for weight in weights]
+    sizes = [int(value) for value in exact]
+    remainder = int(round(quantity)) - sum(sizes)
+    by_fraction = sorted(range(len(exact)), key=lambda i: exact[i] - sizes[i], reverse=True)
+    for i in by_fraction[:remainder]:
+        sizes[i] += 1
+    return [float(size) for size in sizes]
+
+
+def twap_schedule(quantity: float, start: Optional[datetime], end: datetime, slices: int,
+                  fractional: bool = False) -> List[Tuple[datetime, float]]:
+    """Builds an evenly spaced, evenly sized schedule.
+
+    :param quantity: The total quantity of the parent order
+    :type quantity: float
+    :param start: When the first slice is due. Defaults to now.
+    :type start: Optional[datetime]
+    :param end: The end of the execution window
+    :type end: datetime
+    :param slices: The number of child orders
+    :type slices: int
+    :param fractional: Allow fractional slice sizes instead of whole shares
+    :type fractional: bool
+    :returns: A list of (due time, quantity) tuples, zero sized slices removed
+    """
+    if slices < 1:
+        raise ValueError("slices must be at least 1")
+    start, end = _to_utc(start), _to_utc(end)
+    step = (end - start) / slices
+    sizes = _split_quantity(quantity, [1.0] * slices, fractional)
+    return [(start + step * i, size) for i, size in enumerate(sizes) if size > 0]
+
+
+def volume_profile(access_token: str, symbol: str, span: str = 'week') -> Dict[str, float]:
+    """Returns the average traded volume per 5 minute bucket of the trading day.
+
+    :param access_token: The access token for authentication
+    :type access_token: str
+    :param symbol: The stock ticker
+    :type symbol: str
+    :param span: The history used to build the curve, e.g. 'day' or 'week'
+    :type span: str
+    :returns: A dictionary mapping the UTC bucket start ('HH:MM') to its average volume
+    """
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for result in get_stock_historicals(access_token, symbol, interval=f'{BUCKET_MINUTES}minute', span=span):
+        for candle in result.get('historicals', []) if result else []:
+            begins_at = candle.get('begins_at')
+            if not begins_at:
+                continue
+            bucket = begins_at[11:16]
+            totals[bucket] = totals.get(bucket, 0.0) + float(candle.get('volume') or 0)
+            counts[bucket] = counts.get(bucket, 0) + 1
+    return {bucket: totals[bucket] / counts[bucket] for bucket in totals}
+
+
+def vwap_schedule(quantity: float, start: Optional[datetime], end: datetime, profile: Dict[str, float],
+                  fractional: bool = False) -> List[Tuple[datetime, float]]:
+    """Builds a schedule with one slice per 5 minute bucket, sized by the volume profile.
+
+    :param quantity: The total quantity of the parent order
+    :type quantity: float
+    :param start: When the first slice is due. Defaults to now.
+    :type start: Optional[datetime]
+    :param end: The end of the execution window
+    :type end: datetime
+    :param profile: Volume per bucket as returned by :func:`volume_profile`
+    :type profile: dict
+    :param fractional: Allow fractional slice sizes instead of whole shares
+    :type fractional: bool
+    :returns: A list of (due time, quantity) tuples, zero sized slices removed
+    """
+    start, end = _to_utc(start), _to_utc(end)
+    due_times = []
+    due = start
+    while due < end:
+        due_times.append(due)
+        due += timedelta(minutes=BUCKET_MINUTES)
+    if not due_times:
+        due_times = [start]
+
+    # Buckets with no history (pre-market, holidays) fall back to the average volume
+    average = sum(profile.values()) / len(profile) if profile else 1.0
+    weights = [profile.get(_bucket(due), average) for due in due_times]
+    sizes = _split_quantity(quantity, weights, fractional)
+    return [(due, size) for due, size in zip(due_times, sizes) if size > 0]
+
+
+class QuoteCache:
+    """Thread-safe quote cache refreshed with one batched request for all known symbols.
+
+    :param access_token: The access token for authentication
+    :type access_token: str
+    :param ttl: Seconds a quote snapshot stays fresh
+    :type ttl: float
+    """
+
+    def __init__(self, access_token: str, ttl: float = 1.0):
+        self.access_token = access_token
+        self.ttl = ttl
+        self._symbols: set = set()
+        self._quotes: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        # Single flight: one thread refreshes outside the lock, the others wait on this condition
+        self._refreshed = threading.Condition(self._lock)
+        self._refreshing = False
+
+    def add_symbols(self, symbols: Iterable[str]) -> None:
+        """Registers symbols to include in every refresh"""
+        with self._lock:
+            self._symbols.update(symbol.upper().strip() for symbol in symbols)
+
+    def _stale(self, symbol: str) -> bool:
+        return symbol not in self._quotes or time.monotonic() - self._fetched_at > self.ttl
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Returns a quote no older than the ttl, refreshing every registered symbol if needed"""
+        symbol = symbol.upper().strip()
+        with self._lock:
+            self._symbols.add(symbol)
+            while self._stale(symbol) and self._refreshing:
+                self._refreshed.wait()
+            if not self._stale(symbol):
+                return self._quotes.get(symbol)
+            self._refreshing = True
+            symbols = sorted(self._symbols)
+
+        quotes = None
+        try:
+            quotes = get_quotes(self.access_token, symbols)
+        finally:
+            with self._lock:
+                if quotes is not None:
+                    self._quotes.update({quote['symbol']: quote for quote in quotes
+                                         if quote and quote.get('symbol')})
+                    self._fetched_at = time.monotonic()
+                self._refreshing = False
+                self._refreshed.notify_all()
+        with self._lock:
+            return self._quotes.get(symbol)
+
+
+def limit_price_from_quote(quote: Dict[str, Any], side: str, offset: float = 0.001) -> Optional[float]:
+    """Derives a marketable limit price: ask plus offset for buys, bid minus offset for sells.
+
+    :param quote: A quote dictionary as returned by :func:`robin_stocks.robinhood.stocks.get_quotes`
+    :type quote: dict
+    :param side: Either 'buy' or 'sell'
+    :type side: str
+    :param offset: Fraction of the reference price to cross the spread by
+    :type offset: float
+    :returns: The rounded limit price, or None if the quote has no usable price
+    """
+    reference = quote.get('ask_price') if side == 'buy' else quote.get('bid_price')
+    if not reference or float(reference) <= 0:
+        reference = quote.get('last_trade_price')
+    if not reference or float(reference) <= 0:
+        return None
+    factor = 1 + offset if side == 'buy' else 1 - offset
+    return round_price(float(reference) * factor)
+
+
+class SliceScheduler:
+    """Runs many sliced parent orders on one timer thread and a shared worker pool.
+
+    :param access_token: The access token for authentication
+    :type access_token: str
+    :param max_workers: Number of threads submitting child orders
+    :type max_workers: int
+    :param quote_ttl: Freshness of the shared quote cache in seconds
+    :type quote_ttl: float
+    :param limit_offset: Fraction of the quote used to cross the spread
+    :type limit_offset: float
+    """
+
+    def __init__(self, access_token: str, max_workers: int = 4, quote_ttl: float = 1.0,
+                 limit_offset: float = 0.001):
+        self.access_token = access_token
+        self.limit_offset = limit_offset
+        self.quotes = QuoteCache(access_token, ttl=quote_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='robinhood-slicer')
+        self._parents: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, symbol: str, side: str, schedule: List[Tuple[datetime, float]],
+               time_in_force: str = 'gfd') -> str:
+        """Queues a parent order with an explicit schedule.
+
+        :param symbol: The stock ticker
+        :type symbol: str
+        :param side: Either 'buy' or 'sell'
+        :type side: str
+        :param schedule: A list of (due time, quantity) tuples
+        :type schedule: list
+        :param time_in_force: Time in force of the child orders
+        :type time_in_force: str
+        :returns: The parent id
+        """
+        parent_id = str(uuid.uuid4())
+        symbol = symbol.upper().strip()
+        self.quotes.add_symbols([symbol])
+        parent = {
+            'id': parent_id,
+            'symbol': symbol,
+            'side': side,
+            'time_in_force': time_in_force,
+            'quantity': sum(size for _, size in schedule),
+            'children': [{'due': due.isoformat(), 'quantity': size, 'status': 'scheduled',
+                          'price': None, 'order': None, 'sent_at': None,
+                          'ref_id': str(uuid.uuid5(uuid.NAMESPACE_URL, f'slice/{parent_id}/{index}'))}
+                         for index, (due, size) in enumerate(schedule)],
+            'cancelled': False,
+        }
+        with self._lock:
+            self._parents[parent_id] = parent
+            for index, (due, _) in enumerate(schedule):
+                heapq.heappush(self._heap, (due.timestamp(), next(self._counter), parent_id, index))
+            self._wakeup.notify()
+        return parent_id
+
+    def submit_twap(self, symbol: str, quantity: float, side: str, end: datetime, slices: int,
+                    start: Optional[datetime] = None, fractional: bool = False, time_in_force: str = 'gfd') -> str:
+        """Queues a TWAP parent order, see :func:`twap_schedule`"""
+        schedule = twap_schedule(quantity, start, end, slices, fractional)
+        return self.submit(symbol, side, schedule, time_in_force)
+
+    def submit_vwap(self, symbol: str, quantity: float, side: str, end: datetime,
+                    start: Optional[datetime] = None, profile: Optional[Dict[str, float]] = None,
+                    fractional: bool = False, time_in_force: str = 'gfd') -> str:
+        """Queues a VWAP parent order, fetching the volume profile unless one is given"""
+        if profile is None:
+            profile = volume_profile(self.access_token, symbol)
+        schedule = vwap_schedule(quantity, start, end, profile, fractional)
+        return self.submit(symbol, side, schedule, time_in_force)
+
+    def cancel(self, parent_id: str) -> bool:
+        """Drops every child of a parent that has not been submitted yet"""
+        with self._lock:
+            parent = self._parents.get(parent_id)
+            if not parent:
+                return False
+            parent['cancelled'] = True
+            for child in parent['children']:
+                if child['status'] == 'scheduled':
+                    child['status'] = 'cancelled'
+            return True
+
+    def status(self, parent_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a snapshot of a parent order and its children"""
+        with self._lock:
+            parent = self._parents.get(parent_id)
+            if not parent:
+                return None
+            snapshot = dict(parent)
+            snapshot['children'] = [dict(child) for child in parent['children']]
+            snapshot['submitted_quantity'] = sum(child['quantity'] for child in parent['children']
+                                                 if child['status'] == 'submitted')
+            snapshot['unknown_quantity'] = sum(child['quantity'] for child in parent['children']
+                                               if child['status'] == 'unknown')
+            return snapshot
+
+    def _send_child(self, parent_id: str, index: int) -> None:
+        with self._lock:
+            parent = self._parents[parent_id]
+            child = parent['children'][index]
+            if parent['cancelled'] or child['status'] != 'scheduled':
+                return
+            child['status'] = 'sending'
+            child['sent_at'] = datetime.now(timezone.utc).isoformat()
+
+        status = 'failed'
+        try:
+            quote = self.quotes.get(parent['symbol'])
+            price = limit_price_from_quote(quote, parent['side'], self.limit_offset) if quote else None
+            result = None
+            if price is not None:
+                result = order(self.access_token, parent['symbol'], child['quantity'], parent['side'],
+                               price=price, time_in_force=parent['time_in_force'], ref_id=child['ref_id'])
+        except OrderStateUnknownError as e:
+            # The order may exist at the broker; counting it as failed would let the remainder overfill
+            logger.warning("Slice %d of %s may or may not have been placed: %s", index, parent_id, e)
+            status, result = 'unknown', None
+        except Exception as e:
+            logger.error("Slice %d of %s failed: %s", index, parent_id, e)
+            price, result = None, None
+
+        with self._lock:
+            child['price'] = price
+            child['order'] = result
+            child['status'] = 'submitted' if result else status
+        if status == 'unknown':
+            self.reconcile(parent_id)
+
+    def reconcile(self, parent_id: Optional[str] = None) -> int:
+        """Looks up children whose submission outcome is unknown by their ref_id.
+
+        Children found at the broker become 'submitted', children that never arrived become
+        'failed'. A failed lookup leaves the child 'unknown' for the next call.
+
+        :param parent_id: Only reconcile this parent's children
+        :type parent_id: Optional[str]
+        :returns: The number of children still unknown
+        """
+        with self._lock:
+            unknown = [child for pid, parent in self._parents.items() if parent_id in (None, pid)
+                       for child in parent['children'] if child['status'] == 'unknown']
+
+        remaining = 0
+        for child in unknown:
+            not_before = datetime.fromisoformat(child['sent_at']) - timedelta(minutes=5)
+            lookup_url = orders_url(start_date=not_before.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+            try:
+                found = _find_order_by_ref_id(self.access_token, lookup_url, child['ref_id'], not_before)
+            except Exception as e:
+                logger.warning("Looking up slice %s failed, still unknown: %s", child['ref_id'], e)
+                remaining += 1
+                continue
+            with self._lock:
+                if child['status'] == 'unknown':
+                    child['order'] = found
+                    child['status'] = 'submitted' if found else 'failed'
+        return remaining
+
+    def run(self, until_idle: bool = True) -> None:
+        """Dispatches due children in the calling thread until :meth:`stop` is called.
+
+        :param until_idle: If True, also return once every queued child has been dispatched
+        :type until_idle: bool
+        """
+        with self._lock:
+            self._stopped = False
+            while not self._stopped:
+                if not self._heap:
+                    if until_idle:
+                        return
+                    self._wakeup.wait()
+                    continue
+                due, _, parent_id, index = self._heap[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._wakeup.wait(delay)
+                    continue
+                # Hold due children while the orders circuit is open instead of failing them
+                paused = circuit_wait(orders_url())
+                if paused > 0:
+                    self._wakeup.wait(paused)
+                    continue
+                heapq.heappop(self._heap)
+                self._executor.submit(self._send_child, parent_id, index)
+
+    def start(self) -> None:
+        """Dispatches children on a background thread until :meth:`stop`"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run, kwargs={'until_idle': False},
+                                        name='robinhood-slice-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stops dispatching and shuts the worker pool down. Children not yet due are dropped.
+
+        :param wait: If True, wait for the dispatch thread and in-flight child submissions
+        :type wait: bool
+        """
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify()
+        if self._thread and wait:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=wait)
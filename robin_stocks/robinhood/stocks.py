@@ -2,6 +2,7 @@
 
 from typing import Dict, List, Any, Optional, Union
 from .helper import _make_request, request_get
+from .tracing import traced
 from .urls import (
     fundamentals_url, events_url, instruments_url, news_url,
     ratings_url, instrument_splits_url, instrument_by_id_url,
@@ -101,6 +102,7 @@ def get_pricebook_by_id(access_token: str, instrument_id: str) -> Optional[Dict]
     headers = {'Authorization': f'Bearer {access_token}'}
     return _make_request('GET', instrument_by_id_url(instrument_id), headers=headers)
 
+@traced
 def get_pricebook_by_symbol(access_token: str, symbol: str) -> Optional[Dict]:
     """Get price book by symbol - ENHANCED with indexzero pattern"""
     # Use indexzero pattern for cleaner first result access
@@ -135,6 +137,7 @@ def get_ratings(access_token: str, symbol: str) -> Dict:
     
     return response or {}
 
+@traced
 def get_splits(access_token: str, symbol: str) -> List[Dict]:
     """Get stock splits (legacy method using instrument_id lookup) - ENHANCED with indexzero pattern"""
     # Use indexzero pattern for cleaner first result access
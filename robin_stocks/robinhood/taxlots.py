@@ -0,0 +1,478 @@
+"""Tax-lot matching and realized P&L over exported order history
+
+:class:`LotEngine` turns the filled orders returned by the ``export``
+functions into open lots and realized gains. Closing fills are matched
+against open lots FIFO, LIFO or by explicitly chosen lots, for stocks,
+options (per option instrument, 100 multiplier) and crypto (per currency
+pair). Losses on long lots are checked for wash sales: replacement shares
+bought within 30 days before or after the sale absorb the disallowed loss
+into their basis and inherit the holding period.
+
+The engine is incremental. It remembers the timestamp of the last fill it
+applied, so feeding it the full history again only processes new fills, and
+its whole state (open lots plus losses still inside a wash-sale window)
+serialises to a small JSON document::
+
+    engine = LotEngine.load('lots.json.gz') if os.path.exists('lots.json.gz') else LotEngine()
+    records = engine.process(stock_orders=export.export_completed_stock_orders(token),
+                             option_orders=export.export_completed_option_orders(token),
+                             crypto_orders=export.export_completed_crypto_orders(token))
+    engine.save('lots.json.gz')
+
+``process`` returns only the records produced by the new fills: ``disposal``
+records for every matched lot and ``wash_sale`` records when a later purchase
+disallows the loss of an earlier disposal.
+"""
+
+import gzip
+import json
+import logging
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+FIFO = 'fifo'
+LIFO = 'lifo'
+SPECIFIC = 'specific'
+
+WASH_SALE_WINDOW = 30 * 86400
+LONG_TERM_AFTER = 365 * 86400
+
+# Quantities below this are treated as zero, crypto trades in small fractions
+EPSILON = 1e-9
+
+Fill = namedtuple('Fill', 'timestamp id asset_class key symbol side quantity price multiplier fee')
+
+
+def _timestamp(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _last_segment(url: Optional[str]) -> Optional[str]:
+    parts = [part for part in (url or '').split('/') if part]
+    return parts[-1] if parts else None
+
+
+def _purchase_id(lot_id: str) -> str:
+    """Strips the suffix a lot id gets when a wash sale splits it"""
+    return lot_id.split('~', 1)[0]
+
+
+def _order_fee_share(order: Dict[str, Any], quantity: float, total: float) -> float:
+    fees = _float(order.get('fees'))
+    return fees * quantity / total if fees and total else 0.0
+
+
+def stock_fills(order: Dict[str, Any]) -> Iterator[Fill]:
+    """Yields the executions of a filled stock order as fills; the order's fees are split by quantity"""
+    key = order.get('instrument_id') or _last_segment(order.get('instrument'))
+    executions = order.get('executions') or []
+    total = sum(_float(execution.get('quantity')) for execution in executions)
+    side = 1 if order.get('side') == 'buy' else -1
+    for execution in executions:
+        quantity = _float(execution.get('quantity'))
+        if quantity > 0 and key:
+            yield Fill(_timestamp(execution.get('timestamp')), execution.get('id'), 'stock', key,
+                       order.get('symbol'), side, quantity, _float(execution.get('price')), 1.0,
+                       _order_fee_share(order, quantity, total))
+
+
+def option_fills(order: Dict[str, Any]) -> Iterator[Fill]:
+    """Yields the executions of every leg of a filled option order as fills"""
+    for leg in order.get('legs') or []:
+        key = leg.get('option_id') or _last_segment(leg.get('option'))
+        side = 1 if leg.get('side') == 'buy' else -1
+        for execution in leg.get('executions') or []:
+            quantity = _float(execution.get('quantity'))
+            if quantity > 0 and key:
+                yield Fill(_timestamp(execution.get('timestamp')), execution.get('id'), 'option', key,
+                           order.get('chain_symbol'), side, quantity, _float(execution.get('price')), 100.0, 0.0)
+
+
+def crypto_fills(order: Dict[str, Any]) -> Iterator[Fill]:
+    """Yields the executions of a filled crypto order as fills"""
+    key = order.get('currency_pair_id')
+    side = 1 if order.get('side') == 'buy' else -1
+    for execution in order.get('executions') or []:
+        quantity = _float(execution.get('quantity'))
+        if quantity > 0 and key:
+            yield Fill(_timestamp(execution.get('timestamp')), execution.get('id'), 'crypto', key,
+                       order.get('symbol'), side, quantity,
+                       _float(execution.get('effective_price') or execution.get('price')), 1.0, 0.0)
+
+
+class Lot:
+    """An open lot. Quantity is negative for short lots; unit_cost is per unit including the
+    multiplier, fees and wash-sale adjustments (for short lots, the proceeds received per unit)."""
+
+    __slots__ = ('id', 'quantity', 'unit_cost', 'acquired', 'replaced')
+
+    def __init__(self, id: str, quantity: float, unit_cost: float, acquired: float, replaced: float = 0.0):
+        self.id = id
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+        self.acquired = acquired
+        # Units of this lot already used as replacement shares for a wash sale
+        self.replaced = replaced
+
+    def to_list(self) -> List:
+        return [self.id, self.quantity, self.unit_cost, self.acquired, self.replaced]
+
+
+class _Security:
+    """Open lots of one instrument and its losses still inside the wash-sale window"""
+
+    __slots__ = ('asset_class', 'symbol', 'lots', 'recent', 'losses')
+
+    def __init__(self, asset_class: str, symbol: Optional[str]):
+        self.asset_class = asset_class
+        self.symbol = symbol
+        # In purchase order; lots with unreplaced units keep their real purchase date
+        self.lots: deque = deque()
+        # Long lots that may still be replacement shares for a later loss, in purchase order
+        self.recent: deque = deque()
+        # [disposal id, disposed at, unwashed quantity, loss per unit, holding period in seconds]
+        self.losses: List[List] = []
+
+
+class LotEngine:
+    """Matches fills against open lots and reports realized gains and wash sales.
+
+    :param method: 'fifo', 'lifo' or 'specific'
+    :type method: str
+    :param specific_lots: For 'specific', closing fill ids mapped to the lot ids to close first,
+        in order; anything left is closed FIFO
+    :type specific_lots: Optional[Mapping[str, Sequence[str]]]
+    :param wash_sale_asset_classes: Asset classes checked for wash sales
+    :type wash_sale_asset_classes: iterable of str
+    """
+
+    def __init__(self, method: str = FIFO, specific_lots: Optional[Mapping[str, Sequence[str]]] = None,
+                 wash_sale_asset_classes: Iterable[str] = ('stock', 'option')):
+        if method not in (FIFO, LIFO, SPECIFIC):
+            raise ValueError("method must be 'fifo', 'lifo' or 'specific'")
+        self.method = method
+        self.specific_lots = dict(specific_lots or {})
+        self.wash_sale_asset_classes = frozenset(wash_sale_asset_classes)
+        self._securities: Dict[str, _Security] = {}
+        self.watermark = 0.0
+        self._seen_at_watermark: set = set()
+        self.fills_processed = 0
+
+    # ------------------------------------------------------------------
+    # Processing
+    # ------------------------------------------------------------------
+
+    def process(self, stock_orders: Iterable[Dict] = (), option_orders: Iterable[Dict] = (),
+                crypto_orders: Iterable[Dict] = ()) -> List[Dict[str, Any]]:
+        """Applies every fill newer than the watermark, oldest first.
+
+        Orders may be passed in any order, e.g. newest first as the API returns them. Fills at
+        or before the watermark are skipped, so the complete history can be passed every time.
+        The inputs must include cancelled orders that have executions; the ``export`` functions
+        keep them.
+
+        :returns: The disposal and wash sale records produced by the new fills
+        """
+        fills = []
+        for orders, extract in ((stock_orders, stock_fills), (option_orders, option_fills),
+                                (crypto_orders, crypto_fills)):
+            for order in orders:
+                # Every execution counts, whatever the order's state: an order that partly filled
+                # and was then cancelled still moved shares
+                if order:
+                    fills.extend(fill for fill in extract(order) if self._is_new(fill))
+        fills.sort(key=lambda fill: (fill.timestamp, fill.id or ''))
+        return self.apply(fills)
+
+    def _is_new(self, fill: Fill) -> bool:
+        if fill.timestamp > self.watermark:
+            return True
+        return fill.timestamp == self.watermark and fill.id not in self._seen_at_watermark
+
+    def apply(self, fills: Iterable[Fill]) -> List[Dict[str, Any]]:
+        """Applies already extracted fills in the given order and advances the watermark"""
+        records: List[Dict[str, Any]] = []
+        for fill in fills:
+            if fill.timestamp < self.watermark:
+                logger.warning("Fill %s is older than the watermark and was skipped", fill.id)
+                continue
+            if fill.timestamp > self.watermark:
+                self.watermark = fill.timestamp
+                self._seen_at_watermark = set()
+            self._seen_at_watermark.add(fill.id)
+            self._apply(fill, records)
+            self.fills_processed += 1
+        return records
+
+    def _security(self, fill: Fill) -> _Security:
+        security = self._securities.get(fill.key)
+        if security is None:
+            security = self._securities[fill.key] = _Security(fill.asset_class, fill.symbol)
+        elif fill.symbol and not security.symbol:
+            security.symbol = fill.symbol
+        return security
+
+    def _next_lot(self, security: _Security, fill: Fill, preferred: List[str]) -> Lot:
+        lots = security.lots
+        while preferred:
+            lot_id = preferred[0]
+            for lot in lots:
+                if lot.id == lot_id:
+                    return lot
+            preferred.pop(0)
+        return lots[-1] if self.method == LIFO else lots[0]
+
+    def _apply(self, fill: Fill, records: List[Dict[str, Any]]) -> None:
+        security = self._security(fill)
+        remaining = fill.quantity
+        unit_price = fill.price * fill.multiplier
+        fee_per_unit = fill.fee / fill.quantity if fill.quantity else 0.0
+        preferred = list(self.specific_lots.get(fill.id, ())) if self.method == SPECIFIC else []
+        loss_disposals = []
+
+        # Close lots on the other side first
+        while remaining > EPSILON and security.lots and security.lots[0].quantity * fill.side < 0:
+            lot = self._next_lot(security, fill, preferred)
+            matched = min(remaining, abs(lot.quantity))
+            if lot.quantity > 0:
+                proceeds = matched * (unit_price - fee_per_unit)
+                cost = matched * lot.unit_cost
+            else:
+                proceeds = matched * lot.unit_cost
+                cost = matched * (unit_price + fee_per_unit)
+            disposal = {
+                'type': 'disposal',
+                'id': f'{fill.id}:{lot.id}',
+                'asset_class': security.asset_class,
+                'key': fill.key,
+                'symbol': security.symbol,
+                'position': 'long' if lot.quantity > 0 else 'short',
+                'quantity': matched,
+                'proceeds': proceeds,
+                'cost_basis': cost,
+                'gain': proceeds - cost,
+                'wash_sale_disallowed': 0.0,
+                'term': 'long' if fill.timestamp - lot.acquired > LONG_TERM_AFTER else 'short',
+                'acquired_at': _isoformat(lot.acquired),
+                'disposed_at': _isoformat(fill.timestamp),
+                'lot_id': lot.id,
+                'fill_id': fill.id,
+            }
+            lot.quantity -= matched if lot.quantity > 0 else -matched
+            lot.replaced = min(lot.replaced, abs(lot.quantity))
+            if abs(lot.quantity) <= EPSILON:
+                if lot is security.lots[0]:
+                    security.lots.popleft()
+                elif lot is security.lots[-1]:
+                    security.lots.pop()
+                else:
+                    security.lots.remove(lot)
+                if preferred and preferred[0] == lot.id:
+                    preferred.pop(0)
+            remaining -= matched
+
+            if disposal['gain'] < 0 and disposal['position'] == 'long' \
+                    and security.asset_class in self.wash_sale_asset_classes:
+                loss_disposals.append((disposal, fill.timestamp - lot.acquired))
+            records.append(disposal)
+
+        # Shares sold by this same fill are not replacement shares, so check once matching is done
+        for disposal, held in loss_disposals:
+            self._wash_against_prior(security, fill, disposal, held)
+
+        if remaining > EPSILON:
+            unit_cost = unit_price + fee_per_unit if fill.side > 0 else unit_price - fee_per_unit
+            lot = Lot(fill.id, remaining * fill.side, unit_cost, fill.timestamp)
+            security.lots.append(lot)
+            if fill.side > 0 and security.asset_class in self.wash_sale_asset_classes:
+                self._wash_against_later(security, fill, lot, records)
+                # A partly used purchase leaves its unreplaced units last
+                if security.lots[-1].quantity - security.lots[-1].replaced > EPSILON:
+                    security.recent.append(security.lots[-1])
+
+        losses = security.losses
+        cutoff = fill.timestamp - WASH_SALE_WINDOW
+        if losses and (losses[0][1] < cutoff or losses[0][2] <= EPSILON):
+            security.losses = [loss for loss in losses if loss[1] >= cutoff and loss[2] > EPSILON]
+        if not security.lots and not security.losses:
+            del self._securities[fill.key]
+
+    def _wash_against_prior(self, security: _Security, fill: Fill, disposal: Dict[str, Any], held: float) -> None:
+        """Disallows a loss against long lots bought within the 30 days before the sale"""
+        loss_per_unit = -disposal['gain'] / disposal['quantity']
+        unwashed = disposal['quantity']
+        recent = security.recent
+        while recent and (recent[0].quantity - recent[0].replaced <= EPSILON
+                          or fill.timestamp - recent[0].acquired > WASH_SALE_WINDOW):
+            recent.popleft()
+        for index in range(len(recent)):
+            if unwashed <= EPSILON:
+                break
+            lot = recent[index]
+            available = lot.quantity - lot.replaced
+            # The unsold rest of the purchase that took the loss is not a replacement for it
+            if available <= EPSILON or _purchase_id(lot.id) == _purchase_id(disposal['lot_id']):
+                continue
+            washed = min(unwashed, available)
+            _, recent[index] = self._adjust_replacement(security, lot, washed, loss_per_unit, held)
+            disposal['wash_sale_disallowed'] += washed * loss_per_unit
+            unwashed -= washed
+        if unwashed > EPSILON:
+            security.losses.append([disposal['id'], fill.timestamp, unwashed, loss_per_unit, held])
+
+    def _wash_against_later(self, security: _Security, fill: Fill, lot: Lot, records: List[Dict[str, Any]]) -> None:
+        """Uses a new purchase as replacement shares for losses realized in the previous 30 days"""
+        for loss in security.losses:
+            available = lot.quantity - lot.replaced
+            if available <= EPSILON:
+                break
+            disposal_id, disposed_at, unwashed, loss_per_unit, held = loss
+            if fill.timestamp - disposed_at > WASH_SALE_WINDOW or unwashed <= EPSILON:
+                continue
+            washed = min(unwashed, available)
+            replacement, lot = self._adjust_replacement(security, lot, washed, loss_per_unit, held)
+            loss[2] -= washed
+            records.append({
+                'type': 'wash_sale',
+                'disposal_id': disposal_id,
+                'asset_class': security.asset_class,
+                'key': fill.key,
+                'symbol': security.symbol,
+                'quantity': washed,
+                'wash_sale_disallowed': washed * loss_per_unit,
+                'replacement_lot_id': replacement.id,
+                'replaced_at': _isoformat(fill.timestamp),
+            })
+
+    @staticmethod
+    def _adjust_replacement(security: _Security, lot: Lot, quantity: float, loss_per_unit: float,
+                            held: float) -> Tuple[Lot, Lot]:
+        """Adds the disallowed loss to ``quantity`` unreplaced units of a lot, splitting it when only
+        part is used. Returns the adjusted lot and the lot holding the other units."""
+        rest = lot
+        if lot.quantity - quantity > EPSILON:
+            rest = Lot(lot.id, lot.quantity - quantity, lot.unit_cost, lot.acquired, lot.replaced)
+            lot.id = f'{lot.id}~w'
+            lot.quantity = quantity
+            if lot is security.lots[-1]:
+                security.lots.append(rest)
+            else:
+                security.lots.insert(security.lots.index(lot) + 1, rest)
+        lot.unit_cost += loss_per_unit
+        lot.acquired -= held
+        lot.replaced = lot.quantity
+        return lot, rest
+
+    # ------------------------------------------------------------------
+    # Inspection
+    # ------------------------------------------------------------------
+
+    def open_lots(self, key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the open lots, of one instrument or of all of them"""
+        securities = [(key, self._securities[key])] if key in self._securities else \
+            [] if key is not None else list(self._securities.items())
+        return [{
+            'key': security_key,
+            'asset_class': security.asset_class,
+            'symbol': security.symbol,
+            'lot_id': lot.id,
+            'quantity': lot.quantity,
+            'unit_cost': lot.unit_cost,
+            'cost_basis': abs(lot.quantity) * lot.unit_cost,
+            'acquired_at': _isoformat(lot.acquired),
+        } for security_key, security in securities for lot in security.lots]
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def to_state(self) -> Dict[str, Any]:
+        """Returns the engine state as a JSON-serialisable dict"""
+        return {
+            'version': STATE_VERSION,
+            'method': self.method,
+            'watermark': self.watermark,
+            'seen_at_watermark': sorted(self._seen_at_watermark, key=str),
+            'fills_processed': self.fills_processed,
+            'securities': {key: [security.asset_class, security.symbol,
+                                 [lot.to_list() for lot in security.lots], security.losses]
+                           for key, security in self._securities.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], **kwargs) -> 'LotEngine':
+        """Restores an engine from :meth:`to_state`; keyword arguments override the saved settings"""
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported lot state version: {state.get('version')}")
+        engine = cls(**{'method': state.get('method', FIFO), **kwargs})
+        engine.watermark = state.get('watermark', 0.0)
+        engine._seen_at_watermark = set(state.get('seen_at_watermark') or ())
+        engine.fills_processed = state.get('fills_processed', 0)
+        for key, (asset_class, symbol, lots, losses) in state.get('securities', {}).items():
+            security = engine._securities[key] = _Security(asset_class, symbol)
+            security.lots = deque(Lot(*values) for values in lots)
+            security.recent = deque(lot for lot in security.lots if lot.quantity - lot.replaced > EPSILON
+                                    and engine.watermark - lot.acquired <= WASH_SALE_WINDOW)
+            security.losses = [list(loss) for loss in losses]
+        return engine
+
+    def save(self, path: str) -> None:
+        """Writes the state as JSON, gzip compressed when the name ends in ``.gz``"""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            json.dump(self.to_state(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'LotEngine':
+        """Reads a state written by :meth:`save`"""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return cls.from_state(json.load(f), **kwargs)
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Totals disposal and wash sale records per (asset class, term).
+
+    :returns: ``{(asset_class, term): {'proceeds', 'cost_basis', 'gain', 'wash_sale_disallowed'}}``;
+        the gain includes the disallowed losses added back
+    """
+    terms: Dict[str, str] = {}
+    totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+    for record in records:
+        if record['type'] == 'disposal':
+            terms[record['id']] = record['term']
+            group = (record['asset_class'], record['term'])
+            total = totals.setdefault(group, {'proceeds': 0.0, 'cost_basis': 0.0, 'gain': 0.0,
+                                              'wash_sale_disallowed': 0.0})
+            total['proceeds'] += record['proceeds']
+            total['cost_basis'] += record['cost_basis']
+            total['gain'] += record['gain'] + record['wash_sale_disallowed']
+            total['wash_sale_disallowed'] += record['wash_sale_disallowed']
+        elif record['type'] == 'wash_sale':
+            group = (record['asset_class'], terms.get(record['disposal_id'], 'short'))
+            total = totals.setdefault(group, {'proceeds': 0.0, 'cost_basis': 0.0, 'gain': 0.0,
+                                              'wash_sale_disallowed': 0.0})
+            total['gain'] += record['wash_sale_disallowed']
+            total['wash_sale_disallowed'] += record['wash_sale_disallowed']
+    return totals
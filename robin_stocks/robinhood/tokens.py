@@ -0,0 +1,287 @@
+"""Access token lifecycle: keep tokens valid without password logins in the request path
+
+A password login (:func:`authentication.login_and_get_token`) can take
+seconds, may wait up to two minutes for device approval and every extra one
+risks another verification challenge. :class:`TokenManager` does that login
+once per account, keeps the returned refresh token and expiry, and exchanges
+the refresh token for a new access token before the old one expires::
+
+    manager = TokenManager(refresh_margin=600, on_refresh=save_to_vault)
+    manager.add('acct-1', stored_token_data)          # or manager.login('acct-1', user, password)
+    manager.start()                                   # refresh in the background
+
+    stocks.get_quotes(manager.get('acct-1'), ['AAPL'])
+
+Concurrent callers that find a token due for refresh share a single refresh
+request. The manager never stores passwords; hand it a ``relogin`` callable if
+a rejected refresh token should fall back to a full login.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from .authentication import login_and_get_token_data, refresh_token_data
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefreshError(Exception):
+    """Raised when no valid access token can be obtained for an account"""
+
+
+class _Entry:
+    """Token data of one account and the lock serialising its refreshes"""
+
+    __slots__ = ('data', 'lock', 'failures', 'retry_at')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class TokenManager:
+    """Hands out valid access tokens for any number of accounts and refreshes them ahead of expiry.
+
+    :param refresh_margin: Seconds before expiry at which a token is refreshed
+    :type refresh_margin: float
+    :param on_refresh: Called as ``on_refresh(key, token_data)`` after every login or refresh,
+        e.g. to persist the new tokens
+    :type on_refresh: Optional[Callable]
+    :param relogin: Called as ``relogin(key)`` when a refresh is rejected; returns token data
+        like :func:`authentication.login_and_get_token_data` or None
+    :type relogin: Optional[Callable]
+    :param retry_interval: Seconds to wait after a failed background refresh, doubled per failure
+    :type retry_interval: float
+    """
+
+    def __init__(self, refresh_margin: float = 300.0, on_refresh: Optional[Callable[[Hashable, Dict], None]] = None,
+                 relogin: Optional[Callable[[Hashable], Optional[Dict]]] = None, retry_interval: float = 30.0):
+        self.refresh_margin = refresh_margin
+        self.on_refresh = on_refresh
+        self.relogin = relogin
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refreshes = 0
+        self._failures = 0
+
+    # ------------------------------------------------------------------
+    # Accounts
+    # ------------------------------------------------------------------
+
+    def add(self, key: Hashable, token_data: Dict[str, Any]) -> None:
+        """Starts managing the tokens of an account.
+
+        :param key: Any key naming the account
+        :type key: Hashable
+        :param token_data: At least ``access_token``; ``refresh_token``, ``device_token`` and ``expires_at``
+            (or ``expires_in`` counted from now) enable refreshing
+        :type token_data: dict
+        """
+        if not token_data or 'access_token' not in token_data:
+            raise ValueError("token_data must contain an access_token")
+        data = dict(token_data)
+        if data.get('expires_at') is None and data.get('expires_in') is not None:
+            data['expires_at'] = time.time() + float(data['expires_in'])
+        with self._lock:
+            self._entries[key] = _Entry(data)
+        self._wakeup.set()
+
+    def login(self, key: Hashable, username: str, password: str, mfa_code: Optional[str] = None,
+              challenge_callback: Optional[Callable[[str, str], str]] = None,
+              device_token: Optional[str] = None) -> str:
+        """Performs one password login for an account and manages the resulting tokens.
+
+        :returns: The access token
+        :raises TokenRefreshError: If the login failed
+        """
+        data = login_and_get_token_data(username, password, mfa_code, challenge_callback, device_token)
+        if not data:
+            raise TokenRefreshError(f"Login failed for account {key}")
+        self.add(key, data)
+        self._notify(key, data)
+        return data['access_token']
+
+    def remove(self, key: Hashable) -> None:
+        """Stops managing an account"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def token_data(self, key: Hashable) -> Dict[str, Any]:
+        """Returns a copy of the current token data of an account"""
+        return dict(self._entry(key).data)
+
+    def _entry(self, key: Hashable) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            raise KeyError(f"No tokens for account {key}")
+        return entry
+
+    # ------------------------------------------------------------------
+    # Handing out tokens
+    # ------------------------------------------------------------------
+
+    def _due(self, data: Dict[str, Any], now: float) -> bool:
+        expires_at = data.get('expires_at')
+        return expires_at is not None and now >= expires_at - self.refresh_margin
+
+    def get(self, key: Hashable) -> str:
+        """Returns a valid access token for the account, refreshing it first if it is about to expire.
+
+        :raises TokenRefreshError: If the token expired and could not be refreshed
+        :raises KeyError: If the account is not managed
+        """
+        entry = self._entry(key)
+        data = entry.data
+        if not self._due(data, time.time()):
+            return data['access_token']
+
+        data = self._refresh(key, entry, force=False)
+        expires_at = data.get('expires_at')
+        if expires_at is not None and time.time() >= expires_at:
+            raise TokenRefreshError(f"Access token for account {key} expired and could not be refreshed")
+        return data['access_token']
+
+    def invalidate(self, key: Hashable) -> str:
+        """Refreshes an account's token now, e.g. after the API answered 401 for it
+
+        :returns: The new access token
+        :raises TokenRefreshError: If the token could not be refreshed
+        """
+        entry = self._entry(key)
+        stale = entry.data['access_token']
+        data = self._refresh(key, entry, force=True, stale=stale)
+        if data['access_token'] == stale:
+            raise TokenRefreshError(f"Could not refresh the access token for account {key}")
+        return data['access_token']
+
+    def _refresh(self, key: Hashable, entry: _Entry, force: bool, stale: Optional[str] = None) -> Dict[str, Any]:
+        """Refreshes once per due token; callers arriving meanwhile wait and reuse the result"""
+        with entry.lock:
+            data = entry.data
+            if force:
+                # Someone else already replaced the token this caller saw fail
+                if data['access_token'] != stale:
+                    return data
+            elif not self._due(data, time.time()) or time.time() < entry.retry_at:
+                # Not due, or a recent refresh failed and is backing off
+                return data
+
+            new_data = None
+            if data.get('refresh_token'):
+                # A raising refresh counts as a failure below, so retry_at always backs off
+                try:
+                    new_data = refresh_token_data(data['refresh_token'], data.get('device_token'),
+                                                  data.get('scope') or 'internal')
+                except Exception as e:
+                    logger.warning("Refresh request failed for account %s: %s", key, e)
+            if new_data is None and self.relogin is not None:
+                logger.info("Refresh failed for account %s, logging in again", key)
+                try:
+                    new_data = self.relogin(key)
+                except Exception as e:
+                    logger.warning("Login fallback failed for account %s: %s", key, e)
+
+            with self._lock:
+                if new_data is None:
+                    self._failures += 1
+                    entry.failures += 1
+                    entry.retry_at = time.time() + self.retry_interval * 2 ** min(entry.failures - 1, 6)
+                    logger.warning("Could not refresh the access token for account %s", key)
+                    return data
+                self._refreshes += 1
+            merged = dict(data)
+            merged.update(new_data)
+            if not new_data.get('refresh_token'):
+                merged['refresh_token'] = data.get('refresh_token')
+            entry.data = merged
+            entry.failures = 0
+            # A token issued with less lifetime than the margin is due at once; don't spin on it
+            entry.retry_at = time.time() + self.retry_interval if self._due(merged, time.time()) else 0.0
+
+        self._notify(key, merged)
+        self._wakeup.set()
+        return merged
+
+    def _notify(self, key: Hashable, data: Dict[str, Any]) -> None:
+        if self.on_refresh is None:
+            return
+        try:
+            self.on_refresh(key, dict(data))
+        except Exception:
+            logger.exception("on_refresh callback failed for account %s", key)
+
+    # ------------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------------
+
+    def start(self) -> 'TokenManager':
+        """Starts a daemon thread refreshing tokens as they come due"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._loop, name='robinhood-tokens', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the background thread"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'TokenManager':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _schedule(self) -> List:
+        """Returns a heap of (refresh time, key) for every account with an expiry"""
+        with self._lock:
+            entries = list(self._entries.items())
+        heap = []
+        for key, entry in entries:
+            expires_at = entry.data.get('expires_at')
+            if expires_at is None or (not entry.data.get('refresh_token') and self.relogin is None):
+                continue
+            heap.append((max(expires_at - self.refresh_margin, entry.retry_at), id(entry), key))
+        heapq.heapify(heap)
+        return heap
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            heap = self._schedule()
+            now = time.time()
+            due = [key for when, _, key in heap if when <= now]
+            for key in due:
+                if self._stopped.is_set():
+                    return
+                try:
+                    self._refresh(key, self._entry(key), force=False)
+                except KeyError:
+                    continue
+                except Exception:
+                    logger.exception("Background refresh failed for account %s", key)
+            if due:
+                continue
+            self._wakeup.wait(heap[0][0] - now if heap else None)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of managed accounts, successful refreshes and failed refreshes"""
+        with self._lock:
+            return {'accounts': len(self._entries), 'refreshes': self._refreshes, 'failures': self._failures}
@@ -0,0 +1,57 @@
+"""Optional tracing of public functions and HTTP calls
+
+Install any tracer with an OpenTelemetry-compatible
+``start_as_current_span(name, attributes=...)`` context manager, for example
+``opentelemetry.trace.get_tracer("robin_stocks")``. Composite functions
+decorated with :func:`traced` then open a parent span, and every HTTP call made
+by the request layer opens a child span named after its method and endpoint
+template. OpenTelemetry is not a dependency; with no tracer installed the
+decorator only checks a module global.
+"""
+
+import functools
+from typing import Any, Callable, Optional
+
+# Tracer used for spans, None to disable tracing
+_tracer = None
+
+
+def set_tracer(tracer: Optional[Any]) -> None:
+    """Installs the tracer used for function and HTTP spans
+
+    :param tracer: An object providing ``start_as_current_span(name, attributes=...)``, or None to disable tracing
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Any]:
+    """Returns the installed tracer, if any"""
+    return _tracer
+
+
+def traced(func: Optional[Callable] = None, *, name: Optional[str] = None) -> Callable:
+    """Decorator opening a span around a function while a tracer is installed.
+
+    Arguments are never recorded, so access tokens cannot leak into traces.
+
+    :param name: Span name, defaults to '<module>.<function>', e.g. 'orders.order'
+    :type name: Optional[str]
+    """
+    def decorate(function: Callable) -> Callable:
+        module = function.__module__
+        span_name = name or f"{module.rsplit('.', 1)[-1]}.{function.__name__}"
+        attributes = {'code.namespace': module, 'code.function': function.__name__}
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.start_as_current_span(span_name, attributes=attributes):
+                return function(*args, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorate(func)
+    return decorate
@@ -0,0 +1,426 @@
+"""Order status tracking - batched polling with fill events
+
+Watches many order ids at once. Rather than one GET per live order, every poll
+issues a single list request per asset class filtered by ``updated_at`` and
+picks the watched orders out of the result. The crypto endpoint cannot be
+filtered, so its pages are read only until every watched order was seen. The poll interval adapts: it is
+short right after an order is submitted or changes state, and backs off while
+orders rest on the book.
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Callable, Iterable
+from .helper import request_get, circuit_wait
+from .urls import orders_url, option_orders_url, crypto_orders_url
+
+logger = logging.getLogger(__name__)
+
+ASSET_CLASSES = ('stock', 'option', 'crypto')
+EVENT_TYPES = ('fill', 'partial_fill', 'cancel', 'reject')
+
+FILLED_STATES = {'filled'}
+CANCELLED_STATES = {'cancelled', 'canceled'}
+REJECTED_STATES = {'rejected', 'failed'}
+TERMINAL_STATES = FILLED_STATES | CANCELLED_STATES | REJECTED_STATES
+
+# Field names holding the cumulative filled quantity, by order payload flavour
+_FILLED_QUANTITY_FIELDS = ('cumulative_quantity', 'processed_quantity')
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parses a Robinhood ISO timestamp into an aware datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _filled_quantity(order: Dict[str, Any]) -> float:
+    """Returns the cumulative filled quantity of an order payload"""
+    for field in _FILLED_QUANTITY_FIELDS:
+        value = order.get(field)
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return 0.0
+    return 0.0
+
+
+def _order_info_url(asset_class: str, order_id: Optional[str]) -> str:
+    if asset_class == 'option':
+        return option_orders_url(order_id)
+    if asset_class == 'crypto':
+        return crypto_orders_url(order_id)
+    return orders_url(order_id)
+
+
+def _fetch_updated_orders(access_token: str, asset_class: str, since: datetime) -> List[Dict[str, Any]]:
+    """Fetches every stock or option order updated at or after ``since`` in one paginated pass"""
+    start_date = since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    if asset_class == 'option':
+        url = option_orders_url(start_date=start_date)
+    else:
+        url = orders_url(start_date=start_date)
+
+    orders = request_get(access_token, url, data_type='pagination')
+    return [order for order in orders if order]
+
+
+def _fetch_crypto_orders(access_token: str, order_ids: Iterable[str]) -> List[Dict[str, Any]]:
+    """Fetches crypto orders until every order in ``order_ids`` was seen.
+
+    The crypto endpoint has no ``updated_at`` filter. Pages are newest first, so paging stops at
+    the oldest watched order instead of walking the whole history.
+    """
+    remaining = set(order_ids)
+    orders = []
+    url = crypto_orders_url()
+    while url and remaining:
+        response = request_get(access_token, url)
+        if not response:
+            break
+        for order in response.get('results') or []:
+            if order:
+                orders.append(order)
+                remaining.discard(order.get('id'))
+        url = response.get('next')
+    return orders
+
+
+class OrderTracker:
+    """Tracks the status of many orders with shared, adaptively paced polling.
+
+    Events are plain dictionaries with the keys ``type`` (one of
+    ``fill``, ``partial_fill``, ``cancel`` or ``reject``), ``order_id``,
+    ``asset_class``, ``state``, ``filled_quantity``, ``last_fill_quantity``
+    and ``order`` (the latest order payload).
+
+    :param access_token: The access token for authentication
+    :type access_token: str
+    :param min_interval: Poll interval in seconds right after a submit or state change
+    :type min_interval: float
+    :param max_interval: Upper bound for the poll interval while orders are resting
+    :type max_interval: float
+    :param backoff: Factor applied to the interval after every poll without changes
+    :type backoff: float
+    :param clock_skew: Seconds subtracted from the ``updated_at`` cursor to tolerate clock drift.
+        The cursor of each asset class is the newest ``updated_at`` returned by its previous poll,
+        so resting orders do not hold it back.
+    :type clock_skew: float
+    """
+
+    def __init__(self, access_token: str, min_interval: float = 1.0, max_interval: float = 30.0,
+                 backoff: float = 1.5, clock_skew: float = 5.0):
+        self.access_token = access_token
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.clock_skew = clock_skew
+        self.interval = min_interval
+
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        # Per asset class: newest updated_at returned by the last list request, and the oldest
+        # updated_at of orders watched since then
+        self._cursors: Dict[str, datetime] = {}
+        self._pending: Dict[str, datetime] = {}
+        self._callbacks: Dict[Optional[str], List[Callable[[Dict[str, Any]], None]]] = {}
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------------
+
+    def watch(self, order_id: str, asset_class: str = 'stock', order: Optional[Dict[str, Any]] = None) -> None:
+        """Starts watching an order.
+
+        :param order_id: The id of the order to watch
+        :type order_id: str
+        :param asset_class: Either 'stock', 'option' or 'crypto'
+        :type asset_class: str
+        :param order: The order payload returned at submission, if available. Passing it
+            lets the tracker skip the initial per-order lookup.
+        :type order: Optional[dict]
+        """
+        if asset_class not in ASSET_CLASSES:
+            raise ValueError(f"asset_class must be one of {ASSET_CLASSES}")
+
+        entry = {
+            'asset_class': asset_class,
+            'state': None,
+            'filled_quantity': 0.0,
+            'updated_at': None,
+        }
+        if order:
+            entry['state'] = order.get('state')
+            entry['filled_quantity'] = _filled_quantity(order)
+            entry['updated_at'] = _parse_timestamp(order.get('updated_at')) or datetime.now(timezone.utc)
+
+        with self._lock:
+            self._orders[order_id] = entry
+            if entry['updated_at'] is not None:
+                self._hold(asset_class, entry['updated_at'])
+            self.interval = self.min_interval
+        self._wakeup.set()
+
+    def unwatch(self, order_id: str) -> None:
+        """Stops watching an order without emitting any event"""
+        with self._lock:
+            self._orders.pop(order_id, None)
+
+    def watched(self) -> List[str]:
+        """Returns the ids of every order still being watched"""
+        with self._lock:
+            return list(self._orders)
+
+    def on(self, event_type: Optional[str], callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Registers a callback for an event type, or for every event when ``event_type`` is None"""
+        if event_type is not None and event_type not in EVENT_TYPES:
+            raise ValueError(f"event_type must be one of {EVENT_TYPES} or None")
+        with self._lock:
+            self._callbacks.setdefault(event_type, []).append(callback)
+
+    # ------------------------------------------------------------------
+    # Polling
+    # ------------------------------------------------------------------
+
+    def poll_once(self) -> List[Dict[str, Any]]:
+        """Polls every watched order once and dispatches the resulting events.
+
+        Orders registered without a payload are looked up individually the first
+        time; afterwards each asset class costs one paginated list request.
+
+        :returns: The list of events produced by this poll
+        """
+        with self._lock:
+            snapshot = {order_id: dict(entry) for order_id, entry in self._orders.items()}
+
+        by_class: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for order_id, entry in snapshot.items():
+            by_class.setdefault(entry['asset_class'], {})[order_id] = entry
+
+        events = []
+        for asset_class, entries in by_class.items():
+            # Skip the asset class while its endpoint's circuit is open
+            if circuit_wait(_order_info_url(asset_class, None)) > 0:
+                continue
+            try:
+                latest = self._latest_orders(asset_class, entries)
+            except Exception as e:
+                logger.warning("Polling %s orders failed, retrying next poll: %s", asset_class, e)
+                continue
+
+            # Dispatch per asset class: terminal orders are dropped by _apply, so their events must
+            # not wait on requests for other asset classes that may still fail
+            class_events = []
+            for order_id, order in latest.items():
+                class_events.extend(self._apply(order_id, order))
+            for event in class_events:
+                self._dispatch(event)
+            events.extend(class_events)
+
+        with self._lock:
+            if events:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+        return events
+
+    def _hold(self, asset_class: str, updated_at: datetime) -> None:
+        """Makes the next list request of an asset class start no later than ``updated_at``"""
+        pending = self._pending.get(asset_class)
+        if pending is None or updated_at < pending:
+            self._pending[asset_class] = updated_at
+
+    def _latest_orders(self, asset_class: str, entries: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Fetches the current payload of the watched orders of one asset class that changed"""
+        latest: Dict[str, Dict[str, Any]] = {}
+        for order_id, entry in entries.items():
+            if entry['updated_at'] is None:
+                order = request_get(self.access_token, _order_info_url(asset_class, order_id),
+                                    raise_on_error=False)
+                if order:
+                    latest[order_id] = order
+                    with self._lock:
+                        self._hold(asset_class, datetime.now(timezone.utc))
+
+        if asset_class == 'crypto':
+            unseen = [order_id for order_id in entries if order_id not in latest]
+            fetched = _fetch_crypto_orders(self.access_token, unseen) if unseen else []
+        else:
+            with self._lock:
+                pending = self._pending.pop(asset_class, None)
+                cursor = self._cursors.get(asset_class)
+            starts = [start for start in (cursor, pending) if start is not None]
+            if not starts:
+                return latest
+            try:
+                fetched = _fetch_updated_orders(self.access_token, asset_class,
+                                                min(starts) - timedelta(seconds=self.clock_skew))
+            except Exception:
+                if pending is not None:
+                    with self._lock:
+                        self._hold(asset_class, pending)
+                raise
+            newest = max(starts)
+            for order in fetched:
+                updated_at = _parse_timestamp(order.get('updated_at'))
+                if updated_at is not None and updated_at > newest:
+                    newest = updated_at
+            with self._lock:
+                self._cursors[asset_class] = max(newest, self._cursors.get(asset_class, newest))
+
+        for order in fetched:
+            order_id = order.get('id')
+            if order_id in entries and order_id not in latest:
+                latest[order_id] = order
+        return latest
+
+    def _apply(self, order_id: str, order: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Updates the stored state of an order and returns the events its change implies"""
+        with self._lock:
+            entry = self._orders.get(order_id)
+            if entry is None:
+                return []
+
+            state = order.get('state')
+            filled = _filled_quantity(order)
+            last_fill = filled - entry['filled_quantity']
+            entry['state'] = state
+            entry['filled_quantity'] = filled
+            entry['updated_at'] = _parse_timestamp(order.get('updated_at')) or entry['updated_at'] \
+                or datetime.now(timezone.utc)
+
+            def event(event_type):
+                return {
+                    'type': event_type,
+                    'order_id': order_id,
+                    'asset_class': entry['asset_class'],
+                    'state': state,
+                    'filled_quantity': filled,
+                    'last_fill_quantity': last_fill,
+                    'order': order,
+                }
+
+            events = []
+            if state in FILLED_STATES:
+                events.append(event('fill'))
+            else:
+                if last_fill > 0:
+                    events.append(event('partial_fill'))
+                if state in CANCELLED_STATES:
+                    events.append(event('cancel'))
+                elif state in REJECTED_STATES:
+                    events.append(event('reject'))
+
+            if state in TERMINAL_STATES:
+                del self._orders[order_id]
+            return events
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            callbacks = self._callbacks.get(event['type'], []) + self._callbacks.get(None, [])
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Order tracker callback failed")
+
+    # ------------------------------------------------------------------
+    # Run loops
+    # ------------------------------------------------------------------
+
+    def _circuit_pause(self) -> float:
+        """Seconds until every watched asset class can be polled again, 0 if none is blocked"""
+        with self._lock:
+            asset_classes = {entry['asset_class'] for entry in self._orders.values()}
+        waits = [circuit_wait(_order_info_url(asset_class, None)) for asset_class in asset_classes]
+        return min(waits) if waits else 0.0
+
+    def run(self, until_idle: bool = True) -> None:
+        """Polls in the calling thread until stopped, or until nothing is left to watch.
+
+        :param until_idle: If True, return once every watched order has reached a final state
+        :type until_idle: bool
+        """
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            if until_idle and not self.watched():
+                return
+            if self.watched():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.warning("Order tracker poll failed: %s", e)
+            self._wakeup.clear()
+            self._wakeup.wait(max(self.interval, self._circuit_pause()))
+
+    def start(self) -> None:
+        """Starts polling on a background daemon thread that keeps running until :meth:`stop`"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run, kwargs={'until_idle': False},
+                                        name='robinhood-order-tracker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the polling loop and waits for the background thread, if any"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    async def events(self, until_idle: bool = True):
+        """Async iterator over order events.
+
+        Polls run in the default executor so the event loop is never blocked::
+
+            async for event in tracker.events():
+                ...
+
+        :param until_idle: If True, finish once every watched order has reached a final state
+        :type until_idle: bool
+        """
+        loop = asyncio.get_running_loop()
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            if until_idle and not self.watched():
+                return
+            if self.watched():
+                for event in await loop.run_in_executor(None, self.poll_once):
+                    yield event
+            await asyncio.sleep(max(self.interval, self._circuit_pause()))
+
+
+def track_orders(access_token: str, orders: Iterable[Dict[str, Any]], asset_class: str = 'stock',
+                 callback: Optional[Callable[[Dict[str, Any]], None]] = None, **kwargs) -> OrderTracker:
+    """Builds an :class:`OrderTracker` already watching the given submitted orders.
+
+    :param access_token: The access token for authentication
+    :type access_token: str
+    :param orders: Order payloads as returned by the order functions
+    :type orders: iterable of dict
+    :param asset_class: Either 'stock', 'option' or 'crypto'
+    :type asset_class: str
+    :param callback: Optional callback receiving every event
+    :returns: The tracker, ready for :meth:`OrderTracker.run` or :meth:`OrderTracker.start`
+    """
+    tracker = OrderTracker(access_token, **kwargs)
+    if callback:
+        tracker.on(None, callback)
+    for order in orders:
+        if order and order.get('id'):
+            tracker.watch(order['id'], asset_class, order)
+    return tracker
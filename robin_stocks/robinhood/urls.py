@@ -4,6 +4,11 @@ Contains all the URL endpoints for interacting with Robinhood API.
 These are pure functions that build URLs without any stateful dependencies.
 """
 
+import functools
+import inspect
+import re
+from urllib.parse import urlsplit
+
 # Login
 def login_url():
     return 'https://api.robinhood.com/oauth2/token/'
@@ -11,6 +16,15 @@ def login_url():
 def challenge_url(challenge_id):
     return f'https://api.robinhood.com/challenge/{challenge_id}/respond/'
 
+def pathfinder_user_machine_url():
+    return 'https://api.robinhood.com/pathfinder/user_machine/'
+
+def pathfinder_inquiry_url(machine_id):
+    return f'https://api.robinhood.com/pathfinder/inquiries/{machine_id}/user_view/'
+
+def prompt_status_url(challenge_id):
+    return f'https://api.robinhood.com/push/{challenge_id}/get_prompts_status/'
+
 # Profiles
 def account_profile_url(account_number=None):
     if account_number:
@@ -333,4 +347,64 @@ def notifications_base_url():
     return 'https://api.robinhood.com/notifications/'
 
 def margin_interest_url():
-    return 'https://api.robinhood.com/margin/interest/'
\ No newline at end of file
+    return 'https://api.robinhood.com/margin/interest/'
+
+# Endpoint groups - used by the request layer to share rate limits and circuit breakers
+ENDPOINT_GROUPS = (
+    ('orders', ('/orders/', '/options/orders/')),
+    ('quotes', ('/quotes/', '/marketdata/')),
+    ('instruments', ('/instruments/', '/options/instruments/', '/options/chains/')),
+    ('auth', ('/oauth2/', '/pathfinder/', '/challenge/', '/push/')),
+)
+
+def endpoint_group(url):
+    """Returns the endpoint group ('orders', 'quotes', 'instruments', 'auth' or 'default') of a URL"""
+    path = urlsplit(url).path
+    for group, prefixes in ENDPOINT_GROUPS:
+        if path.startswith(prefixes):
+            return group
+    return 'default'
+
+def endpoint_host(url):
+    """Returns the host name of a URL"""
+    return urlsplit(url).hostname or ''
+
+# Endpoint templates - bounded metric labels such as 'api.robinhood.com/orders/{orderID}/'
+class EndpointURL(str):
+    """A URL string that remembers the template of the builder that produced it"""
+    template = None
+
+_ID_SEGMENT = re.compile(r'^(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+                         r'|\d+|[0-9]{4}-[0-9]{2}-[0-9]{2}|(?=[A-Z0-9]*\d)[A-Z0-9]{6,})$')
+
+def endpoint_template(url):
+    """Returns the endpoint template of a URL: the builder's template when known, otherwise
+    the host and path with id-like segments (UUIDs, numbers, dates, account numbers) replaced by '{id}'"""
+    template = getattr(url, 'template', None)
+    if template:
+        return template
+    parts = urlsplit(url)
+    segments = ['{id}' if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split('/')]
+    return (parts.hostname or '') + '/'.join(segments)
+
+def _templated(builder):
+    signature = inspect.signature(builder)
+
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        url = builder(*args, **kwargs)
+        parts = urlsplit(url)
+        values = {}
+        for name, value in signature.bind(*args, **kwargs).arguments.items():
+            if value is not None and value != '':
+                values.setdefault(str(value), name)
+        segments = [f'{{{values[segment]}}}' if segment in values else segment for segment in parts.path.split('/')]
+        tagged = EndpointURL(url)
+        tagged.template = (parts.hostname or '') + '/'.join(segments)
+        return tagged
+    return wrapper
+
+for _name, _builder in list(globals().items()):
+    if _name.endswith('_url') and inspect.isfunction(_builder):
+        globals()[_name] = _templated(_builder)
+del _name, _builder
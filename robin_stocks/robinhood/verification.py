@@ -0,0 +1,297 @@
+"""Non-blocking device verification and login on asyncio
+
+:func:`authentication.login_and_get_token` waits for device approval by
+sleeping five seconds at a time on the calling thread, for up to two minutes.
+The coroutines here run the same pathfinder workflow, but wait with
+``asyncio.sleep`` and send each HTTP request on the default executor, so one
+event loop can carry many logins at once::
+
+    results = asyncio.run(login_many({
+        'acct-1': {'username': 'a@example.com', 'password': '...'},
+        'acct-2': {'username': 'b@example.com', 'password': '...'},
+    }, challenge_callback=ask_operator, on_progress=report))
+
+Polling intervals follow a :class:`PollBackoff`, every step is reported to
+``on_progress`` and a login is cancelled like any other task, with
+``task.cancel()`` or ``asyncio.wait_for``. Callbacks may be plain functions or
+coroutines; plain ones run on the executor so a blocking prompt does not
+stall other logins.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, Hashable, Iterator, Mapping, Optional, Union
+from .authentication import (_generate_device_token, _get_sheriff_id, _login_payload, _post_login,
+                             _with_expiry)
+from .helper import _make_request
+from .urls import challenge_url, login_url, pathfinder_inquiry_url, pathfinder_user_machine_url, prompt_status_url
+
+logger = logging.getLogger(__name__)
+
+# Progress stages passed to on_progress
+STARTED = 'started'
+VERIFICATION_REQUIRED = 'verification_required'
+CHALLENGE_ISSUED = 'challenge_issued'
+PROMPT_PENDING = 'prompt_pending'
+CHALLENGE_VALIDATED = 'challenge_validated'
+WORKFLOW_PENDING = 'workflow_pending'
+APPROVED = 'approved'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class PollBackoff:
+    """Intervals between status polls: start short, grow by ``factor`` up to ``maximum``.
+
+    :param initial: Seconds before the first poll
+    :type initial: float
+    :param factor: Growth of the interval after every poll
+    :type factor: float
+    :param maximum: Largest interval in seconds
+    :type maximum: float
+    :param jitter: Fraction of every interval randomised, so many logins do not poll in lockstep
+    :type jitter: float
+    """
+
+    def __init__(self, initial: float = 1.0, factor: float = 1.5, maximum: float = 10.0, jitter: float = 0.1):
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial
+        while True:
+            yield delay * (1 + random.uniform(-self.jitter, self.jitter)) if self.jitter else delay
+            delay = min(self.maximum, delay * self.factor)
+
+
+# Polls every five seconds like the blocking flow
+FIXED_BACKOFF = PollBackoff(initial=5.0, factor=1.0, maximum=5.0, jitter=0.0)
+
+DEFAULT_BACKOFF = PollBackoff()
+
+
+async def _run(func: Callable, *args, **kwargs) -> Any:
+    """Runs a blocking call on the default executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+async def _callback(callback: Optional[Callable], *args) -> Any:
+    """Calls a plain or async callback without blocking the loop"""
+    if callback is None:
+        return None
+    if inspect.iscoroutinefunction(callback):
+        return await callback(*args)
+    result = await _run(callback, *args)
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def _progress(on_progress: Optional[Callable], stage: str, **details) -> None:
+    try:
+        await _callback(on_progress, stage, details)
+    except Exception as e:
+        logger.warning("Progress callback failed: %s", e)
+
+
+async def validate_device(device_token: str, workflow_id: str,
+                          challenge_callback: Optional[Callable[[str, str], Any]] = None,
+                          backoff: Optional[PollBackoff] = None, timeout: float = 120.0,
+                          on_progress: Optional[Callable[[str, Dict], Any]] = None) -> None:
+    """Completes a device verification workflow without blocking the event loop.
+
+    :param device_token: The device token of the login that asked for verification
+    :type device_token: str
+    :param workflow_id: The id of the ``verification_workflow`` in the login response
+    :type workflow_id: str
+    :param challenge_callback: Called as ``callback(challenge_type, message)``; returns the code for
+        'sms' and 'email' challenges. Without one, codes are read from standard input.
+    :type challenge_callback: Optional[Callable]
+    :param backoff: Intervals between status polls, :data:`DEFAULT_BACKOFF` when None
+    :type backoff: Optional[PollBackoff]
+    :param timeout: Seconds until the workflow is given up
+    :type timeout: float
+    :param on_progress: Called as ``on_progress(stage, details)`` at every step
+    :type on_progress: Optional[Callable]
+    :raises TimeoutError: If the workflow was not approved in time
+    """
+    backoff = backoff or DEFAULT_BACKOFF
+    deadline = time.monotonic() + timeout
+
+    async def wait(delays: Iterator[float]) -> None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Timed out waiting for device verification")
+        await asyncio.sleep(min(next(delays), remaining))
+
+    machine_payload = {'device_id': device_token, 'flow': 'suv', 'input': {'workflow_id': workflow_id}}
+    machine_data = await _run(_make_request, 'POST', pathfinder_user_machine_url(), json=machine_payload)
+    inquiries_url = pathfinder_inquiry_url(_get_sheriff_id(machine_data))
+
+    delays = backoff.delays()
+    while time.monotonic() < deadline:
+        await wait(delays)
+        inquiries_response = await _run(_make_request, 'GET', inquiries_url, raise_on_error=False)
+        challenge = ((inquiries_response or {}).get('context') or {}).get('sheriff_challenge')
+        if not challenge:
+            continue
+
+        challenge_type, challenge_status, challenge_id = challenge['type'], challenge['status'], challenge['id']
+        if challenge_type == 'prompt':
+            await _progress(on_progress, PROMPT_PENDING, challenge_id=challenge_id)
+            try:
+                await _callback(challenge_callback, 'prompt',
+                                "Check your Robinhood mobile app and approve this login request")
+            except Exception as e:
+                logger.warning("Challenge callback failed: %s", e)
+            prompt_delays = backoff.delays()
+            while True:
+                await wait(prompt_delays)
+                prompt_status = await _run(_make_request, 'GET', prompt_status_url(challenge_id), raise_on_error=False)
+                if prompt_status and prompt_status.get('challenge_status') == 'validated':
+                    break
+            await _progress(on_progress, CHALLENGE_VALIDATED, challenge_id=challenge_id)
+            break
+
+        if challenge_status == 'validated':
+            await _progress(on_progress, CHALLENGE_VALIDATED, challenge_id=challenge_id)
+            break
+
+        if challenge_type in ('sms', 'email') and challenge_status == 'issued':
+            await _progress(on_progress, CHALLENGE_ISSUED, challenge_id=challenge_id, challenge_type=challenge_type)
+            if challenge_callback is not None:
+                code = await _callback(challenge_callback, challenge_type,
+                                       f"Enter the {challenge_type} verification code")
+            else:
+                code = await _run(input, f"Enter the {challenge_type} verification code sent to your device: ")
+            response = await _run(_make_request, 'POST', challenge_url(challenge_id), data={'response': code},
+                                  raise_on_error=False)
+            if response and response.get('status') == 'validated':
+                await _progress(on_progress, CHALLENGE_VALIDATED, challenge_id=challenge_id)
+                break
+
+    # Confirm the workflow itself was approved
+    delays = backoff.delays()
+    failures = 0
+    while time.monotonic() < deadline:
+        inquiries_payload = {'sequence': 0, 'user_input': {'status': 'continue'}}
+        response = await _run(_make_request, 'POST', inquiries_url, json=inquiries_payload, raise_on_error=False)
+        if response:
+            if (response.get('type_context') or {}).get('result') == 'workflow_status_approved' or \
+                    (response.get('verification_workflow') or {}).get('workflow_status') == 'workflow_status_approved':
+                await _progress(on_progress, APPROVED)
+                return
+            await _progress(on_progress, WORKFLOW_PENDING)
+        else:
+            failures += 1
+            if failures >= 5:
+                raise TimeoutError("Workflow status kept failing, giving up on device verification")
+        await wait(delays)
+
+    raise TimeoutError("Timed out waiting for device verification")
+
+
+async def login_async(username: str, password: str, mfa_code: Optional[str] = None,
+                      challenge_callback: Optional[Callable[[str, str], Any]] = None,
+                      device_token: Optional[str] = None, backoff: Optional[PollBackoff] = None,
+                      timeout: float = 120.0,
+                      on_progress: Optional[Callable[[str, Dict], Any]] = None) -> Optional[Dict[str, Any]]:
+    """Logs in like :func:`authentication.login_and_get_token_data` without blocking the event loop.
+
+    :param username: The Robinhood username
+    :type username: str
+    :param password: The Robinhood password
+    :type password: str
+    :param mfa_code: The MFA code if the account uses an authenticator app
+    :type mfa_code: Optional[str]
+    :param challenge_callback: See :func:`validate_device`
+    :type challenge_callback: Optional[Callable]
+    :param device_token: A device token from an earlier login. Reusing it avoids new device verification
+    :type device_token: Optional[str]
+    :param backoff: Intervals between status polls during verification
+    :type backoff: Optional[PollBackoff]
+    :param timeout: Seconds the device verification may take
+    :type timeout: float
+    :param on_progress: Called as ``on_progress(stage, details)`` at every step
+    :type on_progress: Optional[Callable]
+    :returns: The token data, or None if the login failed
+    """
+    device_token = device_token or _generate_device_token()
+    login_payload = _login_payload(username, password, mfa_code, device_token)
+    url = login_url()
+    await _progress(on_progress, STARTED)
+
+    data = await _run(_post_login, url, login_payload)
+    if data and 'verification_workflow' in data:
+        await _progress(on_progress, VERIFICATION_REQUIRED, workflow_id=data['verification_workflow']['id'])
+        await validate_device(device_token, data['verification_workflow']['id'], challenge_callback,
+                              backoff, timeout, on_progress)
+        data = await _run(_post_login, url, login_payload, reattempt=True)
+
+    if data and 'access_token' in data:
+        await _progress(on_progress, SUCCEEDED)
+        return _with_expiry(dict(data, device_token=device_token))
+    await _progress(on_progress, FAILED)
+    return None
+
+
+async def login_many(accounts: Mapping[Hashable, Mapping[str, Any]], concurrency: int = 20,
+                     challenge_callback: Optional[Callable[[Hashable, str, str], Any]] = None,
+                     on_progress: Optional[Callable[[Hashable, str, Dict], Any]] = None,
+                     backoff: Optional[PollBackoff] = None,
+                     timeout: float = 120.0) -> Dict[Hashable, Union[Dict[str, Any], None, BaseException]]:
+    """Logs many accounts in concurrently on the running event loop.
+
+    :param accounts: Account keys mapped to keyword arguments of :func:`login_async`, at least
+        ``username`` and ``password``
+    :type accounts: Mapping
+    :param concurrency: Logins in progress at once
+    :type concurrency: int
+    :param challenge_callback: Called as ``callback(key, challenge_type, message)``
+    :type challenge_callback: Optional[Callable]
+    :param on_progress: Called as ``on_progress(key, stage, details)``
+    :type on_progress: Optional[Callable]
+    :param backoff: Intervals between status polls during verification
+    :type backoff: Optional[PollBackoff]
+    :param timeout: Seconds the device verification of each account may take
+    :type timeout: float
+    :returns: Account keys mapped to token data, None for a failed login, or the exception it raised
+    :raises ValueError: If the keyword arguments of an account include ``challenge_callback`` or
+        ``on_progress``, which are bound per account from the arguments of this function
+    """
+    for key, credentials in accounts.items():
+        reserved = sorted({'challenge_callback', 'on_progress'}.intersection(credentials))
+        if reserved:
+            raise ValueError(f"Account {key} sets {', '.join(reserved)}; pass callbacks to login_many instead")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def bind(callback: Optional[Callable], key: Hashable) -> Optional[Callable]:
+        if callback is None:
+            return None
+        if inspect.iscoroutinefunction(callback):
+            async def bound(*args):
+                return await callback(key, *args)
+            return bound
+        return functools.partial(callback, key)
+
+    async def one(key: Hashable, credentials: Mapping[str, Any]):
+        async with semaphore:
+            options = {'backoff': backoff, 'timeout': timeout, **credentials}
+            return await login_async(challenge_callback=bind(challenge_callback, key),
+                                     on_progress=bind(on_progress, key), **options)
+
+    keys = list(accounts)
+    results = await asyncio.gather(*(one(key, accounts[key]) for key in keys), return_exceptions=True)
+    for key, result in zip(keys, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, BaseException):
+            logger.warning("Login failed for account %s: %s", key, result)
+    return dict(zip(keys, results))
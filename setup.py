@@ -17,7 +17,7 @@ setup(name='robin_stocks',
       keywords=['robinhood','robin stocks','finance app','stocks','options','trading','investing'],
       license='MIT',
       python_requires='>=3.9',
-      packages=find_packages(),
+      packages=find_packages(exclude=['benchmarks']),
       requires=['requests', 'pyotp', 'cryptography'],
       install_requires=[
           'requests',
@@ -25,4 +25,8 @@ setup(name='robin_stocks',
           'python-dotenv',
           'cryptography'
       ],
+      extras_require={
+          'fast': ['orjson'],
+          'portfolio': ['numpy']
+      },
       zip_safe=False)
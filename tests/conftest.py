@@ -0,0 +1,38 @@
+import json
+
+import pytest
+from robin_stocks.robinhood import cassette, helper
+
+
+@pytest.fixture
+def request_layer():
+    """Runs a test without retries, rate limits or breakers and restores the settings afterwards"""
+    saved = (helper._default_retry_policy, helper._rate_limiter, helper._circuit_breakers, helper._transport)
+    helper.set_default_retry_policy(None)
+    helper.set_rate_limiter(None)
+    helper.set_circuit_breakers(None)
+    yield helper
+    helper.set_default_retry_policy(saved[0])
+    helper.set_rate_limiter(saved[1])
+    helper.set_circuit_breakers(saved[2])
+    helper.set_transport(saved[3])
+
+
+@pytest.fixture
+def write_cassette(tmp_path):
+    """Writes exchanges to a cassette file and returns its path
+
+    Exchanges are ``(method, url, status, json_body)`` tuples, or dicts in the cassette format.
+    """
+    def write(exchanges, name='cassette.jsonl'):
+        path = str(tmp_path / name)
+        with open(path, 'w') as f:
+            f.write(json.dumps({'version': cassette.CASSETTE_VERSION}) + '\n')
+            for exchange in exchanges:
+                if not isinstance(exchange, dict):
+                    method, url, status, body = exchange
+                    exchange = {'method': method, 'url': url, 'params': None, 'status': status,
+                                'headers': {'Content-Type': 'application/json'}, 'json': body}
+                f.write(json.dumps(exchange) + '\n')
+        return path
+    return write
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+import requests
+from robin_stocks.robinhood.account import build_holdings
+
+
+def _response(url, body):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(body).encode()
+    return response
+
+
+class StubBroker:
+    """Serves positions, dividends, instruments and quotes for ``count`` holdings and counts requests"""
+
+    def __init__(self, count, missing_quotes=()):
+        self.ids = [f'id{index}' for index in range(count)]
+        self.missing_quotes = set(missing_quotes)
+        self.requests = []
+
+    def __call__(self, method, url, headers=None, data=None, json=None, params=None, timeout=16):
+        self.requests.append(url)
+        ids = (params or {}).get('ids', '').split(',')
+        if url.endswith('/positions/'):
+            results = [{'instrument': f'https://api.robinhood.com/instruments/{instrument_id}/',
+                        'quantity': '2.0000', 'average_buy_price': '10.0000',
+                        'intraday_average_buy_price': '12.5000'} for instrument_id in self.ids]
+        elif url.endswith('/dividends/'):
+            results = [{'instrument': 'https://api.robinhood.com/instruments/id0/', 'state': 'paid', 'amount': '1.50'},
+                       {'instrument': 'https://api.robinhood.com/instruments/id0/', 'state': 'reinvested',
+                        'amount': '0.50'},
+                       {'instrument': 'https://api.robinhood.com/instruments/id0/', 'state': 'pending',
+                        'amount': '9.00'}]
+        elif url.endswith('/instruments/'):
+            results = [{'id': instrument_id, 'symbol': instrument_id.upper(), 'type': 'stock',
+                        'simple_name': f'Company {instrument_id}'} for instrument_id in ids]
+        elif url.endswith('/quotes/'):
+            results = [{'instrument_id': instrument_id, 'symbol': instrument_id.upper(), 'last_trade_price': '15.00'}
+                       for instrument_id in ids if instrument_id not in self.missing_quotes]
+        else:
+            raise AssertionError(f'Unexpected request {method} {url}')
+        return _response(url, {'results': results, 'next': None})
+
+
+class TestBuildHoldings:
+
+    @pytest.mark.parametrize('count, expected', [(1, 4), (45, 4), (120, 8)])
+    def test_requests_grow_with_batches_not_holdings(self, request_layer, count, expected):
+        broker = StubBroker(count)
+        request_layer.set_transport(broker)
+        holdings = build_holdings('token', with_dividends=True)
+        assert len(holdings) == count
+        # Positions, dividends, then one instruments and one quotes request per 50 holdings
+        assert len(broker.requests) == expected
+
+    def test_values_weights_and_dividends(self, request_layer):
+        request_layer.set_transport(StubBroker(2))
+        holdings = build_holdings('token', with_dividends=True)
+        assert holdings['ID0'] == {
+            'price': '15.00',
+            'quantity': '2.0000',
+            'average_buy_price': '10.00',
+            'equity': '30.00',
+            'percent_change': '50.00',
+            'intraday_percent_change': '20.00',
+            'equity_change': '10.00',
+            'type': 'stock',
+            'name': 'Company id0',
+            'id': 'id0',
+            'percentage': '50.00',
+            'instrument': 'https://api.robinhood.com/instruments/id0/',
+            'dividend': '2.00',
+        }
+        assert holdings['ID1']['dividend'] == '0.00'
+
+    def test_missing_quote_is_priced_at_zero(self, request_layer):
+        request_layer.set_transport(StubBroker(2, missing_quotes={'id1'}))
+        holdings = build_holdings('token')
+        assert holdings['ID1']['price'] == '0.00'
+        assert holdings['ID1']['equity'] == '0.00'
+        assert holdings['ID0']['percentage'] == '100.00'
+        assert 'dividend' not in holdings['ID0']
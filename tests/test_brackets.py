@@ -0,0 +1,184 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from robin_stocks.robinhood import brackets
+from robin_stocks.robinhood.brackets import ACTIVE, CANCELLED, CLOSED, FAILED, PENDING_ENTRY, BracketEngine
+from robin_stocks.robinhood.orders import OrderStateUnknownError
+
+
+class FakeTracker:
+
+    def __init__(self):
+        self.watched = {}
+
+    def on(self, event_type, callback):
+        self.callback = callback
+
+    def watch(self, order_id, asset_class, order_data=None):
+        self.watched[order_id] = asset_class
+
+
+class FakeBroker:
+    """Stands in for order placement and records every call with whether the engine lock was held"""
+
+    def __init__(self, monkeypatch):
+        self.engine = None
+        self.placed = []
+        self.cancelled = []
+        self.existing = {}
+        self.unknown = lambda kwargs: False
+        self.before_send = None
+        monkeypatch.setattr(brackets, 'order', self.order)
+        monkeypatch.setattr(brackets, 'cancel_stock_order', self.cancel)
+        monkeypatch.setattr(brackets, '_find_order_by_ref_id', self.find)
+
+    def _locked(self):
+        return self.engine is not None and self.engine._lock._is_owned()
+
+    def order(self, access_token, symbol, quantity, side, ref_id=None, **kwargs):
+        assert not self._locked()
+        if self.before_send:
+            self.before_send()
+        if self.unknown(kwargs):
+            raise OrderStateUnknownError(ref_id, 'connection reset')
+        placed = {'id': f'order-{len(self.placed) + 1}', 'ref_id': ref_id}
+        self.placed.append((symbol, quantity, side, kwargs))
+        return placed
+
+    def cancel(self, access_token, order_id):
+        assert not self._locked()
+        self.cancelled.append(order_id)
+        return True
+
+    def find(self, access_token, lookup_url, ref_id, not_before=None):
+        return self.existing.get(ref_id)
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    return FakeBroker(monkeypatch)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / 'brackets.json')
+
+
+def _engine(broker, journal):
+    broker.engine = None
+    engine = BracketEngine('token', journal, tracker=FakeTracker())
+    broker.engine = engine
+    return engine
+
+
+def _event(engine, order_id, event_type, filled_quantity):
+    engine.tracker.callback({'order_id': order_id, 'type': event_type, 'filled_quantity': filled_quantity})
+
+
+class TestPlacing:
+
+    def test_bracket_is_journaled_before_the_parent_is_sent(self, broker, journal):
+        engine = _engine(broker, journal)
+        seen = []
+
+        def read_journal():
+            with open(journal) as f:
+                seen.extend(json.load(f)['brackets'].values())
+
+        broker.before_send = read_journal
+        bracket_id = engine.place_bracket('abc', 10, take_profit=12.0, stop_loss=9.0, price=10.0)
+        assert seen[0]['status'] == PENDING_ENTRY
+        assert seen[0]['parent_ref_id'] == brackets._ref_id(bracket_id, 'parent')
+        assert seen[0]['parent_order_id'] is None
+        assert engine.get_bracket(bracket_id)['parent_order_id'] == 'order-1'
+
+    def test_rejected_parent_fails_the_bracket(self, broker, journal, monkeypatch):
+        engine = _engine(broker, journal)
+        monkeypatch.setattr(brackets, 'order', lambda *args, **kwargs: None)
+        assert engine.place_bracket('ABC', 10, take_profit=12.0, stop_loss=9.0) is None
+        assert [bracket['status'] for bracket in engine._brackets.values()] == [FAILED]
+
+    def test_fill_places_legs_and_first_leg_fill_cancels_sibling(self, broker, journal):
+        engine = _engine(broker, journal)
+        bracket_id = engine.place_bracket('ABC', 10, take_profit=12.0, stop_loss=9.0)
+        _event(engine, 'order-1', 'fill', 10.0)
+
+        bracket = engine.get_bracket(bracket_id)
+        assert bracket['status'] == ACTIVE
+        assert broker.placed[1:] == [('ABC', 10.0, 'sell', {'time_in_force': 'gtc', 'price': 12.0}),
+                                     ('ABC', 10.0, 'sell', {'time_in_force': 'gtc', 'stop_price': 9.0})]
+
+        _event(engine, bracket['legs']['stop_loss']['order_id'], 'fill', 10.0)
+        assert broker.cancelled == [bracket['legs']['take_profit']['order_id']]
+        _event(engine, bracket['legs']['take_profit']['order_id'], 'cancel', 0.0)
+        assert engine.get_bracket(bracket_id)['status'] == CLOSED
+
+    def test_cancel_runs_outside_the_lock(self, broker, journal):
+        engine = _engine(broker, journal)
+        bracket_id = engine.place_oco('ABC', 5, take_profit=12.0, stop_loss=9.0)
+        assert engine.cancel(bracket_id)
+        assert broker.cancelled == ['order-1', 'order-2']
+        assert engine.get_bracket(bracket_id)['status'] == CANCELLED
+
+
+class TestRecovery:
+
+    def test_unknown_parent_is_found_by_ref_id_on_restart(self, broker, journal):
+        engine = _engine(broker, journal)
+        broker.unknown = lambda kwargs: True
+        bracket_id = engine.place_bracket('ABC', 10, take_profit=12.0, stop_loss=9.0)
+        bracket = engine.get_bracket(bracket_id)
+        assert bracket['status'] == PENDING_ENTRY
+
+        broker.unknown = lambda kwargs: False
+        broker.existing[bracket['parent_ref_id']] = {'id': 'parent-1', 'ref_id': bracket['parent_ref_id']}
+        restarted = _engine(broker, journal)
+        assert restarted.get_bracket(bracket_id)['parent_order_id'] == 'parent-1'
+        assert restarted.tracker.watched == {'parent-1': 'stock'}
+        assert broker.placed == []
+
+    def test_parent_that_never_arrived_fails_the_bracket(self, broker, journal):
+        engine = _engine(broker, journal)
+        broker.unknown = lambda kwargs: True
+        bracket_id = engine.place_bracket('ABC', 10, take_profit=12.0, stop_loss=9.0)
+
+        broker.unknown = lambda kwargs: False
+        restarted = _engine(broker, journal)
+        assert restarted.get_bracket(bracket_id)['status'] == FAILED
+        assert broker.placed == []
+
+    def test_journaled_leg_is_resubmitted_when_missing(self, broker, journal):
+        engine = _engine(broker, journal)
+        broker.unknown = lambda kwargs: 'stop_price' in kwargs
+        bracket_id = engine.place_oco('ABC', 5, take_profit=12.0, stop_loss=9.0)
+        assert engine.get_bracket(bracket_id)['legs']['stop_loss']['order_id'] is None
+
+        broker.unknown = lambda kwargs: False
+        restarted = _engine(broker, journal)
+        assert restarted.get_bracket(bracket_id)['legs']['stop_loss']['order_id'] == 'order-2'
+        assert broker.placed[-1] == ('ABC', 5, 'sell', {'time_in_force': 'gtc', 'stop_price': 9.0})
+
+    def test_leg_placed_after_cancel_is_cancelled(self, broker, journal):
+        engine = _engine(broker, journal)
+        bracket_id = []
+        broker.before_send = lambda: bracket_id and engine.cancel(bracket_id[0])
+        bracket_id.append(engine.place_bracket('ABC', 10, take_profit=12.0, stop_loss=9.0))
+        _event(engine, 'order-1', 'fill', 10.0)
+        assert engine.get_bracket(bracket_id[0])['status'] == CANCELLED
+        assert broker.cancelled == ['order-2', 'order-3']
+
+
+class TestJournal:
+
+    def test_concurrent_saves_leave_the_newest_snapshot(self, broker, journal):
+        engine = _engine(broker, journal)
+        bracket_ids = []
+        with ThreadPoolExecutor(8) as pool:
+            for future in [pool.submit(engine.place_oco, 'ABC', 1, 12.0, 9.0) for _ in range(40)]:
+                bracket_ids.append(future.result())
+            list(pool.map(lambda _: engine._save(), range(40)))
+        with open(journal) as f:
+            saved = json.load(f)['brackets']
+        assert sorted(saved) == sorted(bracket_ids)
+        assert saved == json.loads(json.dumps(engine._brackets))
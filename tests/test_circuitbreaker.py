@@ -0,0 +1,91 @@
+import pytest
+from robin_stocks.robinhood import cassette, faults
+from robin_stocks.robinhood.circuitbreaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry,
+                                                   CircuitOpenError)
+from robin_stocks.robinhood.helper import _make_request
+from robin_stocks.robinhood.ratelimit import RateLimiter
+
+ORDERS_URL = 'https://api.robinhood.com/orders/'
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        assert breaker.record_failure() == OPEN
+        assert not breaker.allow()
+        assert breaker.retry_in() > 0
+
+    def test_half_open_lets_limited_probes_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0, half_open_max_calls=1)
+        breaker.record_failure()
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+        assert breaker.record_success() == CLOSED
+        assert breaker.allow()
+
+    def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=0)
+        for _ in range(5):
+            breaker.record_failure()
+        assert breaker.allow()
+        assert breaker.record_failure() == OPEN
+
+    def test_released_probe_can_be_reused(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    def test_registry_ignores_client_errors(self):
+        changes = []
+        registry = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=60,
+                                          on_state_change=lambda *change: changes.append(change))
+        registry.after_request(ORDERS_URL, 404)
+        assert registry.state(ORDERS_URL) == CLOSED
+        registry.after_request(ORDERS_URL, 503)
+        assert registry.is_open(ORDERS_URL)
+        assert changes == [(CircuitBreakerRegistry.key_for(ORDERS_URL), CLOSED, OPEN)]
+        with pytest.raises(CircuitOpenError):
+            registry.before_request(ORDERS_URL)
+
+
+class TestRequestLayer:
+
+    def test_open_circuit_fails_fast(self, request_layer, write_cassette):
+        request_layer.set_circuit_breakers(CircuitBreakerRegistry(failure_threshold=2, recovery_timeout=60))
+        path = write_cassette([('GET', ORDERS_URL, 200, {'results': []})])
+        with cassette.replay(path), faults.inject([faults.FaultRule(error_rate=1.0, error_statuses=(503,))],
+                                                  seed=1) as injector:
+            for _ in range(2):
+                with pytest.raises(Exception):
+                    _make_request('GET', ORDERS_URL)
+            with pytest.raises(Exception) as raised:
+                _make_request('GET', ORDERS_URL)
+            assert isinstance(raised.value.__cause__, CircuitOpenError)
+        assert injector.counts['requests'] == 2
+
+    def test_probe_is_released_when_rate_limiter_gives_up(self, request_layer, write_cassette):
+        request_layer.set_circuit_breakers(CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=0))
+        request_layer.set_rate_limiter(RateLimiter(host_rate=None, group_rates={'orders': (0.001, 1.0)}, max_wait=0))
+        path = write_cassette([
+            ('GET', ORDERS_URL, 503, {'detail': 'down'}),
+            ('GET', ORDERS_URL, 200, {'results': []}),
+        ])
+        with cassette.replay(path):
+            with pytest.raises(Exception):
+                _make_request('GET', ORDERS_URL)
+            # Half-open: the probe is reserved, then the rate limiter refuses to wait
+            with pytest.raises(Exception, match='max_wait'):
+                _make_request('GET', ORDERS_URL)
+            request_layer.set_rate_limiter(None)
+            assert _make_request('GET', ORDERS_URL) == {'results': []}
+        assert request_layer._circuit_breakers.state(ORDERS_URL) == CLOSED
@@ -0,0 +1,108 @@
+import json
+import os
+from urllib.parse import quote
+
+import pytest
+
+from robin_stocks.robinhood import cassette, export
+from robin_stocks.robinhood.export import export_completed_crypto_orders, export_orders_incremental
+from robin_stocks.robinhood.urls import crypto_orders_url, orders_url
+
+T0 = '2024-01-02T10:00:00Z'
+T1 = '2024-01-02T11:00:00Z'
+
+
+def _order(order_id, updated_at, state='filled', created_at=None):
+    return {'id': order_id, 'state': state, 'updated_at': updated_at, 'created_at': created_at or updated_at}
+
+
+def _stock_url(since=None):
+    return orders_url(start_date=quote(since, safe='') if since else None)
+
+
+def _exported(tmp_path):
+    with open(os.path.join(str(tmp_path), 'default_stock_orders.jsonl')) as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def _run(tmp_path):
+    return export_orders_incremental('token', str(tmp_path), asset_classes=['stock'])
+
+
+class TestIncrementalExport:
+
+    def test_second_run_only_appends_new_orders(self, request_layer, write_cassette, tmp_path):
+        path = write_cassette([
+            ('GET', _stock_url(), 200, {'results': [_order('a', T0), _order('b', T0)], 'next': None}),
+            ('GET', _stock_url(T0), 200,
+             {'results': [_order('c', T1), _order('b', T0), _order('a', T0), _order('x', T0, 'cancelled')],
+              'next': None}),
+        ])
+        with cassette.replay(path):
+            assert _run(tmp_path) == {'stock': 2}
+            assert _run(tmp_path) == {'stock': 1}
+        assert _exported(tmp_path) == ['a', 'b', 'c']
+
+    def test_new_order_tied_with_the_watermark_is_kept(self, request_layer, write_cassette, tmp_path):
+        path = write_cassette([
+            ('GET', _stock_url(), 200, {'results': [_order('a', T0)], 'next': None}),
+            ('GET', _stock_url(T0), 200, {'results': [_order('b', T0), _order('a', T0)], 'next': None}),
+        ])
+        with cassette.replay(path):
+            _run(tmp_path)
+            assert _run(tmp_path) == {'stock': 1}
+        with open(os.path.join(str(tmp_path), 'export_state.json')) as f:
+            assert json.load(f)['watermarks']['default/stock']['ids'] == ['a', 'b']
+
+    def test_orders_without_updated_at_are_skipped(self, request_layer, write_cassette, tmp_path):
+        path = write_cassette([
+            ('GET', _stock_url(), 200, {'results': [_order('a', T0), _order('u', None)], 'next': None}),
+            ('GET', _stock_url(T0), 200, {'results': [_order('a', T0), _order('u', None)], 'next': None}),
+        ])
+        with cassette.replay(path):
+            assert _run(tmp_path) == {'stock': 1}
+            assert _run(tmp_path) == {'stock': 0}
+        assert _exported(tmp_path) == ['a']
+
+    def test_rerun_after_a_crash_does_not_duplicate(self, request_layer, write_cassette, tmp_path, monkeypatch):
+        path = write_cassette([
+            ('GET', _stock_url(), 200, {'results': [_order('a', T0)], 'next': None}),
+            ('GET', _stock_url(T0), 200, {'results': [_order('b', T1), _order('a', T0)], 'next': None}),
+        ])
+        save = export._save_watermarks
+        with cassette.replay(path):
+            _run(tmp_path)
+            calls = []
+
+            def crash_after_append(state_path, watermarks):
+                calls.append(state_path)
+                raise OSError('disk full')
+
+            monkeypatch.setattr(export, '_save_watermarks', crash_after_append)
+            with pytest.raises(OSError):
+                _run(tmp_path)
+            assert calls and _exported(tmp_path) == ['a', 'b']
+
+            monkeypatch.setattr(export, '_save_watermarks', save)
+            assert _run(tmp_path) == {'stock': 1}
+        assert _exported(tmp_path) == ['a', 'b']
+
+
+class TestCryptoExport:
+
+    def test_paging_stops_before_the_lookback(self, request_layer, write_cassette):
+        page_2 = crypto_orders_url() + '?cursor=2'
+        page_3 = crypto_orders_url() + '?cursor=3'
+        path = write_cassette([
+            ('GET', crypto_orders_url(), 200,
+             {'results': [_order('new', '2024-06-01T00:00:00Z'), _order('old', '2024-05-01T00:00:00Z')],
+              'next': page_2}),
+            ('GET', page_2, 200,
+             {'results': [_order('gtc', '2024-06-01T00:00:00Z', created_at='2024-01-15T00:00:00Z')],
+              'next': page_3}),
+            ('GET', page_3, 200, {'results': [_order('ancient', '2023-01-01T00:00:00Z')], 'next': None}),
+        ])
+        with cassette.replay(path) as player:
+            orders = export_completed_crypto_orders('token', since='2024-05-15T00:00:00Z')
+            assert player.remaining() == 1
+        assert [order['id'] for order in orders] == ['new', 'gtc']
@@ -0,0 +1,50 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from robin_stocks.robinhood import faults
+
+QUOTES_URL = 'https://api.robinhood.com/marketdata/quotes/'
+
+
+def _ok(method, url, headers=None, data=None, json=None, params=None, timeout=16):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = b'{}'
+    return response
+
+
+class TestErrorBursts:
+
+    def test_burst_repeats_for_the_same_request_only(self):
+        rule = faults.FaultRule(error_rate=1.0, error_statuses=(503,), burst_length=3)
+        injector = faults.FaultInjector([rule], _ok, seed=1)
+        assert injector('GET', QUOTES_URL, params={'symbols': 'AAPL'}).status_code == 503
+        rule.error_rate = 0.0
+        # The burst continues on retries of AAPL but does not spill over to MSFT
+        assert injector('GET', QUOTES_URL, params={'symbols': 'MSFT'}).status_code == 200
+        assert [injector('GET', QUOTES_URL, params={'symbols': 'AAPL'}).status_code for _ in range(3)] == \
+            [503, 503, 200]
+        assert injector.counts['error'] == 3
+
+    def test_seeded_outcomes_do_not_depend_on_thread_interleaving(self):
+        rule = faults.FaultRule(error_rate=0.3, burst_length=2)
+        symbols = [f'SYM{i}' for i in range(40)]
+
+        def run(workers, order):
+            injector = faults.FaultInjector([rule], _ok, seed=7)
+
+            def attempts(symbol):
+                return symbol, [injector('GET', QUOTES_URL, params={'symbols': symbol}).status_code
+                                for _ in range(4)]
+
+            with ThreadPoolExecutor(workers) as pool:
+                return dict(pool.map(attempts, order))
+
+        shuffled = list(symbols)
+        random.Random(3).shuffle(shuffled)
+        expected = run(1, symbols)
+        assert any(status != 200 for statuses in expected.values() for status in statuses)
+        for _ in range(3):
+            assert run(8, shuffled) == expected
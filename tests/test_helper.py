@@ -0,0 +1,35 @@
+import threading
+import time
+
+import pytest
+from robin_stocks.robinhood.helper import run_concurrently
+
+
+class TestRunConcurrently:
+
+    def test_results_keep_their_keys(self):
+        assert run_concurrently({'a': lambda: 1, 'b': lambda: 2, 'c': lambda: 3}) == {'a': 1, 'b': 2, 'c': 3}
+
+    def test_calls_overlap(self):
+        barrier = threading.Barrier(3, timeout=5)
+        assert run_concurrently({key: barrier.wait for key in 'abc'}).keys() == {'a', 'b', 'c'}
+
+    def test_raises_first_failure_in_key_order_after_all_calls_finish(self):
+        finished = []
+
+        def fail_late():
+            time.sleep(0.05)
+            finished.append('late')
+            raise KeyError('late')
+
+        def fail_early():
+            finished.append('early')
+            raise ValueError('early')
+
+        def succeed():
+            time.sleep(0.1)
+            finished.append('ok')
+
+        with pytest.raises(KeyError):
+            run_concurrently({'late': fail_late, 'early': fail_early, 'ok': succeed})
+        assert sorted(finished) == ['early', 'late', 'ok']
@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+import pytest
+from robin_stocks.robinhood import cassette, faults
+from robin_stocks.robinhood.orders import OrderStateUnknownError, _find_order_by_ref_id, _submit_order
+
+SUBMIT_URL = 'https://api.robinhood.com/orders/'
+LOOKUP_URL = 'https://api.robinhood.com/orders/?updated_at[gte]=2024-01-01T00:00:00Z'
+PAGE_2_URL = LOOKUP_URL + '&cursor=2'
+
+
+def _order(order_id, ref_id, created_at=None):
+    created_at = created_at or datetime.now(timezone.utc).isoformat()
+    return {'id': order_id, 'ref_id': ref_id, 'created_at': created_at}
+
+
+class TestIdempotentSubmission:
+
+    def test_lookup_follows_pages_after_transport_error(self, request_layer, write_cassette):
+        path = write_cassette([
+            ('GET', LOOKUP_URL, 200, {'results': [_order('1', 'other')], 'next': PAGE_2_URL}),
+            ('GET', PAGE_2_URL, 200, {'results': [_order('2', 'ref-1')], 'next': None}),
+        ])
+        with cassette.replay(path), \
+                faults.inject([faults.FaultRule(methods=['POST'], reset_rate=1.0)], seed=1) as injector:
+            order = _submit_order('token', SUBMIT_URL, {'ref_id': 'ref-1'}, LOOKUP_URL)
+        assert order['id'] == '2'
+        assert injector.counts['reset'] == 1
+
+    def test_failed_lookup_raises_instead_of_resubmitting(self, request_layer, write_cassette):
+        path = write_cassette([])
+        with cassette.replay(path), faults.inject([faults.FaultRule(reset_rate=1.0)], seed=1) as injector:
+            with pytest.raises(OrderStateUnknownError) as raised:
+                _submit_order('token', SUBMIT_URL, {'ref_id': 'ref-1'}, LOOKUP_URL)
+        assert raised.value.ref_id == 'ref-1'
+        # One POST and one lookup, never a second POST
+        assert injector.counts['reset'] == 2
+
+    def test_last_transport_error_leaves_state_unknown(self, request_layer, write_cassette):
+        path = write_cassette([('GET', LOOKUP_URL, 200, {'results': [], 'next': None})])
+        with cassette.replay(path), faults.inject([faults.FaultRule(methods=['POST'], reset_rate=1.0)], seed=1):
+            with pytest.raises(OrderStateUnknownError):
+                _submit_order('token', SUBMIT_URL, {'ref_id': 'ref-1'}, LOOKUP_URL, submit_attempts=2)
+
+    def test_lookup_stops_at_pages_older_than_submission(self, request_layer, write_cassette):
+        path = write_cassette([
+            ('GET', LOOKUP_URL, 200, {'results': [_order('1', 'other', '2023-06-01T00:00:00Z')],
+                                      'next': PAGE_2_URL}),
+        ])
+        with cassette.replay(path):
+            found = _find_order_by_ref_id('token', LOOKUP_URL, 'ref-1',
+                                          not_before=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        assert found is None
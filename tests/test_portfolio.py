@@ -0,0 +1,126 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from robin_stocks.robinhood.portfolio import PortfolioEngine  # noqa: E402
+
+STOCKS = [{'instrument_id': 'i-aapl', 'symbol': 'AAPL', 'quantity': '10', 'average_buy_price': '100'}]
+SHORT_OPTIONS = [{'option_id': 'o1', 'chain_symbol': 'AAPL', 'type': 'short', 'quantity': '2',
+                  'trade_value_multiplier': '100', 'average_price': '-150'}]
+CRYPTO = [{'currency': {'code': 'BTC'}, 'quantity': '0.5',
+           'cost_bases': [{'direct_cost_basis': '6000'}, {'direct_cost_basis': '4000'}]}]
+
+QUOTES = {
+    'stock_quotes': [{'instrument_id': 'i-aapl', 'symbol': 'AAPL', 'last_trade_price': '110'}],
+    'option_market_data': [{'instrument_id': 'o1', 'adjusted_mark_price': '2.00', 'delta': '0.5',
+                            'gamma': '0.02', 'theta': '-0.05', 'vega': '0.1'}],
+    'crypto_quotes': [{'symbol': 'BTCUSD', 'mark_price': '30000'}],
+}
+
+
+def _stock(instrument_id, quantity, average_buy_price):
+    return {'instrument_id': instrument_id, 'quantity': str(quantity), 'average_buy_price': str(average_buy_price)}
+
+
+@pytest.fixture
+def engine():
+    engine = PortfolioEngine(sectors={'AAPL': 'Technology'})
+    engine.add_account('acct-1', stocks=STOCKS, options=SHORT_OPTIONS, crypto=CRYPTO)
+    return engine
+
+
+class TestValuation:
+
+    def test_unpriced_positions_are_counted(self, engine):
+        totals = engine.totals()
+        assert totals['market_value'] == 0.0
+        assert totals['cost_basis'] == pytest.approx(10700.0)
+        assert totals['unpriced_positions'] == 3
+
+    def test_totals_per_asset_class(self, engine):
+        assert engine.update_quotes(**QUOTES) == 3
+        assert engine.totals()['market_value'] == pytest.approx(15700.0)
+        assert engine.totals()['unrealized_pnl'] == pytest.approx(5000.0)
+
+        # Sold two contracts at 1.50, now marked at 2.00
+        short = engine.totals('option')
+        assert short['market_value'] == pytest.approx(-400.0)
+        assert short['cost_basis'] == pytest.approx(-300.0)
+        assert short['unrealized_pnl'] == pytest.approx(-100.0)
+        assert short['unrealized_pnl_percent'] == pytest.approx(-100 / 3)
+
+        crypto = engine.totals('crypto')
+        assert crypto['cost_basis'] == pytest.approx(10000.0)
+        assert crypto['market_value'] == pytest.approx(15000.0)
+
+    def test_quote_updates_are_incremental(self, engine):
+        engine.update_quotes(**QUOTES)
+        assert engine.update_quotes(stock_quotes=[{'instrument_id': 'i-aapl', 'symbol': 'AAPL',
+                                                   'last_trade_price': '120'}]) == 1
+        assert engine.totals('stock')['market_value'] == pytest.approx(1200.0)
+        assert engine.totals()['market_value'] == pytest.approx(15800.0)
+        # The new underlying price also moves the option's dollar delta
+        assert engine.exposure_by_sector()['Technology'] == pytest.approx(1200.0 - 12000.0)
+
+    def test_marks_survive_position_changes(self, engine):
+        engine.update_quotes(**QUOTES)
+        engine.add_account('acct-2', stocks=[_stock('i-aapl', 1, 100)])
+        assert engine.by_account()['acct-2']['market_value'] == pytest.approx(110.0)
+
+
+class TestExposure:
+
+    def test_sector_exposure_uses_dollar_delta(self, engine):
+        engine.update_quotes(**QUOTES)
+        # Short two 0.5 delta calls: -100 shares at 110
+        assert engine.exposure_by_sector() == pytest.approx({'Technology': 1100.0 - 11000.0, 'Unknown': 15000.0})
+        assert engine.exposure_by_sector(delta_adjusted=False) == \
+            pytest.approx({'Technology': 1100.0 - 400.0, 'Unknown': 15000.0})
+
+    def test_greek_exposure(self, engine):
+        engine.update_quotes(**QUOTES)
+        assert engine.greek_exposure() == pytest.approx({
+            'delta': 10.0 - 100.0 + 0.5,
+            'delta_dollars': 1100.0 - 11000.0 + 15000.0,
+            'gamma': -4.0,
+            'theta': 10.0,
+            'vega': -20.0,
+        })
+        by_underlying = engine.greek_exposure(by_underlying=True)
+        assert by_underlying['AAPL']['delta'] == pytest.approx(-90.0)
+        assert by_underlying['BTC']['delta_dollars'] == pytest.approx(15000.0)
+
+
+class TestAccounts:
+
+    def test_replacing_an_account_keeps_one_entry(self):
+        engine = PortfolioEngine()
+        for quantity in range(1, 50):
+            engine.add_account('acct-1', stocks=[_stock('abc', quantity, 10)])
+        engine.update_marks({'abc': 11.0})
+        assert list(engine.by_account()) == ['acct-1']
+        assert engine.by_account()['acct-1']['market_value'] == pytest.approx(49 * 11.0)
+        assert len(engine.positions()) == 1
+
+    def test_removed_accounts_leave_no_trace(self):
+        engine = PortfolioEngine()
+        for number in range(20):
+            engine.add_account(f'acct-{number}', stocks=[_stock('abc', number + 1, 10)])
+        for number in range(19):
+            engine.remove_account(f'acct-{number}')
+        engine.update_marks({'abc': 12.0})
+        assert engine.by_account() == {'acct-19': {'market_value': 240.0, 'cost_basis': 200.0, 'unrealized_pnl': 40.0,
+                                                   'unrealized_pnl_percent': 20.0, 'unpriced_positions': 0}}
+        assert [position['account'] for position in engine.positions()] == ['acct-19']
+
+    def test_remaining_accounts_keep_their_positions(self):
+        engine = PortfolioEngine()
+        engine.add_account('a', stocks=[_stock('abc', 1, 10)])
+        engine.add_account('b', stocks=[_stock('abc', 2, 10)])
+        engine.add_account('c', stocks=[_stock('abc', 3, 10)])
+        engine.remove_account('a')
+        engine.update_marks({'abc': 10.0})
+        values = {account: summary['market_value'] for account, summary in engine.by_account().items()}
+        assert values == {'b': 20.0, 'c': 30.0}
+        assert [(position['account'], position['quantity']) for position in engine.positions()] == \
+            [('b', 2.0), ('c', 3.0)]
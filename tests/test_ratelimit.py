@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from robin_stocks.robinhood import cassette, faults
+from robin_stocks.robinhood.helper import _make_request
+from robin_stocks.robinhood.ratelimit import FileLockBackend, RateLimiter, _penalize, _refund, _reserve
+from robin_stocks.robinhood.retry import RetryPolicy
+
+ORDERS_URL = 'https://api.robinhood.com/orders/'
+
+
+class TestBucketMath:
+
+    def test_burst_then_rate(self):
+        state, wait = None, 0.0
+        waits = []
+        for _ in range(4):
+            state, wait = _reserve(state, 2.0, 2.0, 1.0, 100.0)
+            waits.append(wait)
+        assert waits == [0.0, 0.0, 0.5, 1.0]
+
+    def test_refill_is_capped_at_capacity(self):
+        state, _ = _reserve(None, 1.0, 3.0, 3.0, 0.0)
+        state, wait = _reserve(state, 1.0, 3.0, 4.0, 1000.0)
+        assert wait == 1.0
+
+    def test_refund_returns_tokens(self):
+        state, _ = _reserve(None, 1.0, 1.0, 2.0, 0.0)
+        state, _ = _refund(state, 1.0, 1.0, 1.0, 0.0)
+        assert _reserve(state, 1.0, 1.0, 1.0, 0.0)[1] == 1.0
+
+    def test_penalties_do_not_add_up(self):
+        state = None
+        for _ in range(16):
+            state, _ = _penalize(state, 2.0, 5.0, 1.0, 0.0)
+        assert _reserve(state, 2.0, 5.0, 1.0, 0.0)[1] == pytest.approx(1.5)
+
+    def test_longer_debt_is_kept(self):
+        state, _ = _penalize(None, 2.0, 5.0, 10.0, 0.0)
+        state, _ = _penalize(state, 2.0, 5.0, 1.0, 0.0)
+        assert _reserve(state, 2.0, 5.0, 1.0, 0.0)[1] == pytest.approx(10.5)
+
+
+class TestRateLimiter:
+
+    def test_rejected_acquire_gives_its_token_back(self):
+        limiter = RateLimiter(host_rate=None, group_rates={'orders': (0.001, 1.0)}, max_wait=0)
+        limiter.acquire(ORDERS_URL)
+        for _ in range(5):
+            with pytest.raises(RuntimeError):
+                limiter.acquire(ORDERS_URL)
+        assert limiter.delay_for(ORDERS_URL) == pytest.approx(1000.0, rel=0.01)
+
+    def test_file_backend_is_shared(self, tmp_path):
+        path = str(tmp_path / 'buckets.json')
+        first = RateLimiter(host_rate=None, group_rates={'orders': (1.0, 1.0)}, backend=FileLockBackend(path))
+        second = RateLimiter(host_rate=None, group_rates={'orders': (1.0, 1.0)}, backend=FileLockBackend(path))
+        assert first.delay_for(ORDERS_URL) == 0.0
+        assert second.delay_for(ORDERS_URL) == pytest.approx(1.0, abs=0.05)
+
+    def test_concurrent_429s_penalize_once(self, request_layer, write_cassette):
+        limiter = RateLimiter(host_rate=None, group_rates={'orders': (100.0, 100.0)})
+        request_layer.set_rate_limiter(limiter)
+        path = write_cassette([])
+        rule = faults.FaultRule(error_rate=1.0, error_statuses=(429,), retry_after=1)
+        with cassette.replay(path), faults.inject([rule], seed=1):
+            def call():
+                with pytest.raises(Exception):
+                    _make_request('GET', ORDERS_URL)
+            with ThreadPoolExecutor(16) as pool:
+                for future in [pool.submit(call) for _ in range(16)]:
+                    future.result()
+        request_layer.set_rate_limiter(None)
+        assert limiter.delay_for(ORDERS_URL) < 2.0
+
+    def test_retry_after_is_waited_once(self, request_layer, write_cassette):
+        request_layer.set_rate_limiter(RateLimiter(host_rate=None, group_rates={'orders': (100.0, 100.0)}))
+        path = write_cassette([
+            {'method': 'GET', 'url': ORDERS_URL, 'params': None, 'status': 429,
+             'headers': {'Content-Type': 'application/json', 'Retry-After': '1'}, 'json': {}},
+            ('GET', ORDERS_URL, 200, {'results': []}),
+        ])
+        policy = RetryPolicy(max_attempts=2, backoff_base=0.01, jitter='none')
+        with cassette.replay(path):
+            started = time.monotonic()
+            assert _make_request('GET', ORDERS_URL, retry=policy) == {'results': []}
+            elapsed = time.monotonic() - started
+        assert 1.0 <= elapsed < 1.5
@@ -0,0 +1,150 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+from robin_stocks.robinhood import cassette, slicing
+from robin_stocks.robinhood.orders import OrderStateUnknownError
+from robin_stocks.robinhood.slicing import QuoteCache, SliceScheduler, twap_schedule, volume_profile, vwap_schedule
+
+HISTORICALS_URL = 'https://api.robinhood.com/quotes/historicals/'
+
+
+def _at(hour, minute, second=0):
+    return datetime(2024, 1, 2, hour, minute, second, tzinfo=timezone.utc)
+
+
+class TestTwapSchedule:
+
+    def test_whole_shares_add_up(self):
+        schedule = twap_schedule(100, _at(14, 30), _at(15, 30), 6)
+        assert [size for _, size in schedule] == [17, 17, 17, 17, 16, 16]
+        assert [due for due, _ in schedule] == [_at(14, 30 + 10 * i) if i < 3 else _at(15, 10 * (i - 3))
+                                                for i in range(6)]
+
+    def test_zero_sized_slices_are_dropped(self):
+        schedule = twap_schedule(2, _at(14, 30), _at(15, 30), 6)
+        assert sum(size for _, size in schedule) == 2
+        assert len(schedule) == 2
+
+    def test_fractional_sizes(self):
+        schedule = twap_schedule(1, _at(14, 30), _at(15, 0), 3, fractional=True)
+        assert [size for _, size in schedule] == [0.333333, 0.333333, 0.333334]
+
+    def test_rejects_no_slices(self):
+        with pytest.raises(ValueError):
+            twap_schedule(10, _at(14, 30), _at(15, 0), 0)
+
+
+class TestVwapSchedule:
+
+    PROFILE = {'14:30': 1.0, '14:35': 98.0, '14:40': 1.0}
+
+    def test_sizes_follow_volume(self):
+        schedule = vwap_schedule(100, _at(14, 30), _at(14, 45), self.PROFILE)
+        assert [size for _, size in schedule] == [1, 98, 1]
+
+    def test_unaligned_start_uses_enclosing_buckets(self):
+        schedule = vwap_schedule(100, _at(14, 32, 17), _at(14, 45), self.PROFILE)
+        assert [size for _, size in schedule] == [1, 98, 1]
+        assert schedule[0][0] == _at(14, 32, 17)
+
+    def test_buckets_without_history_use_average(self):
+        schedule = vwap_schedule(10, _at(20, 0), _at(20, 10), self.PROFILE)
+        assert [size for _, size in schedule] == [5, 5]
+
+
+class TestVolumeProfile:
+
+    def test_averages_volume_per_bucket(self, request_layer, write_cassette):
+        candles = [
+            {'begins_at': '2024-01-01T14:30:00Z', 'volume': 100},
+            {'begins_at': '2024-01-01T14:35:00Z', 'volume': 300},
+            {'begins_at': '2024-01-02T14:30:00Z', 'volume': 200},
+        ]
+        path = write_cassette([{
+            'method': 'GET', 'url': HISTORICALS_URL, 'status': 200,
+            'params': {'symbols': 'ABC', 'interval': '5minute', 'span': 'week', 'bounds': 'regular'},
+            'json': {'results': [{'symbol': 'ABC', 'historicals': candles}]},
+        }])
+        with cassette.replay(path):
+            assert volume_profile('token', 'ABC') == {'14:30': 150.0, '14:35': 300.0}
+
+
+class TestQuoteCache:
+
+    def test_refresh_runs_once_outside_the_lock(self, monkeypatch):
+        cache = QuoteCache('token', ttl=60)
+        calls = []
+        release = threading.Event()
+
+        def get_quotes(access_token, symbols):
+            assert not cache._lock.locked()
+            calls.append(symbols)
+            release.wait(5)
+            return [{'symbol': symbol, 'ask_price': '10'} for symbol in symbols]
+
+        monkeypatch.setattr(slicing, 'get_quotes', get_quotes)
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(cache.get, 'ABC') for _ in range(8)]
+            time.sleep(0.05)
+            release.set()
+            assert all(future.result()['symbol'] == 'ABC' for future in futures)
+        assert calls == [['ABC']]
+
+    def test_fresh_quotes_do_not_wait_for_a_refresh(self, monkeypatch):
+        cache = QuoteCache('token', ttl=60)
+        release = threading.Event()
+
+        def get_quotes(access_token, symbols):
+            if 'XYZ' in symbols:
+                release.wait(5)
+            return [{'symbol': symbol, 'ask_price': '10'} for symbol in symbols]
+
+        monkeypatch.setattr(slicing, 'get_quotes', get_quotes)
+        cache.get('ABC')
+        with ThreadPoolExecutor(1) as pool:
+            pending = pool.submit(cache.get, 'XYZ')
+            time.sleep(0.05)
+            assert cache.get('ABC')['symbol'] == 'ABC'
+            assert not pending.done()
+            release.set()
+            assert pending.result()['symbol'] == 'XYZ'
+
+
+class TestSliceScheduler:
+
+    def _scheduler(self, monkeypatch, lookup):
+        monkeypatch.setattr(slicing, 'get_quotes', lambda token, symbols: [{'symbol': 'ABC', 'ask_price': '10'}])
+
+        def order(*args, ref_id=None, **kwargs):
+            raise OrderStateUnknownError(ref_id, 'connection reset')
+
+        monkeypatch.setattr(slicing, 'order', order)
+        monkeypatch.setattr(slicing, '_find_order_by_ref_id', lookup)
+        scheduler = SliceScheduler('token')
+        parent_id = scheduler.submit('ABC', 'buy', [(_at(14, 30), 10)])
+        scheduler._send_child(parent_id, 0)
+        scheduler.stop()
+        return scheduler, parent_id
+
+    def test_unknown_child_found_by_ref_id_counts_as_submitted(self, monkeypatch):
+        scheduler, parent_id = self._scheduler(
+            monkeypatch, lambda token, url, ref_id, not_before=None: {'id': 'order-1', 'ref_id': ref_id})
+        status = scheduler.status(parent_id)
+        assert status['children'][0]['status'] == 'submitted'
+        assert status['submitted_quantity'] == 10
+
+    def test_unknown_child_stays_unknown_until_reconciled(self, monkeypatch):
+        def lookup(token, url, ref_id, not_before=None):
+            raise Exception('Request failed: timed out')
+
+        scheduler, parent_id = self._scheduler(monkeypatch, lookup)
+        status = scheduler.status(parent_id)
+        assert status['children'][0]['status'] == 'unknown'
+        assert status['unknown_quantity'] == 10
+
+        monkeypatch.setattr(slicing, '_find_order_by_ref_id', lambda token, url, ref_id, not_before=None: None)
+        assert scheduler.reconcile() == 0
+        assert scheduler.status(parent_id)['children'][0]['status'] == 'failed'
@@ -0,0 +1,146 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from robin_stocks.robinhood.taxlots import LIFO, SPECIFIC, LotEngine, summarize
+
+START = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+
+
+def _day(days):
+    return (START + timedelta(days=days)).isoformat()
+
+
+def _stock(order_id, side, quantity, price, days, fees=0.0):
+    return {'id': order_id, 'side': side, 'state': 'filled', 'instrument_id': 'abc', 'symbol': 'ABC',
+            'fees': str(fees), 'executions': [{'id': order_id, 'timestamp': _day(days),
+                                               'quantity': str(quantity), 'price': str(price)}]}
+
+
+def _disposals(records):
+    return [(record['lot_id'], record['quantity'], record['gain']) for record in records
+            if record['type'] == 'disposal']
+
+
+class TestMatching:
+
+    HISTORY = [_stock('b1', 'buy', 10, 10, 0), _stock('b2', 'buy', 10, 20, 1), _stock('s1', 'sell', 15, 25, 2)]
+
+    def test_fifo(self):
+        engine = LotEngine()
+        assert _disposals(engine.process(stock_orders=self.HISTORY)) == [('b1', 10, 150.0), ('b2', 5, 25.0)]
+        assert [(lot['lot_id'], lot['quantity']) for lot in engine.open_lots()] == [('b2', 5.0)]
+
+    def test_lifo(self):
+        engine = LotEngine(method=LIFO)
+        assert _disposals(engine.process(stock_orders=self.HISTORY)) == [('b2', 10, 50.0), ('b1', 5, 75.0)]
+
+    def test_specific_lots_then_fifo(self):
+        engine = LotEngine(method=SPECIFIC, specific_lots={'s1': ['b2']})
+        assert _disposals(engine.process(stock_orders=self.HISTORY)) == [('b2', 10, 50.0), ('b1', 5, 75.0)]
+
+    def test_fees_reduce_proceeds_and_raise_basis(self):
+        engine = LotEngine()
+        records = engine.process(stock_orders=[_stock('b1', 'buy', 10, 10, 0, fees=1.0),
+                                               _stock('s1', 'sell', 10, 12, 1, fees=1.0)])
+        assert records[0]['cost_basis'] == pytest.approx(101.0)
+        assert records[0]['proceeds'] == pytest.approx(119.0)
+
+    def test_short_option_is_closed_by_a_buy(self):
+        def option_order(order_id, side, price, days):
+            return {'id': order_id, 'state': 'filled', 'chain_symbol': 'ABC', 'legs': [{
+                'option_id': 'opt', 'side': side,
+                'executions': [{'id': order_id, 'timestamp': _day(days), 'quantity': '1', 'price': str(price)}]}]}
+
+        engine = LotEngine()
+        records = engine.process(option_orders=[option_order('o1', 'sell', 2.0, 0), option_order('o2', 'buy', 3.0, 1)])
+        assert [(record['position'], record['proceeds'], record['cost_basis']) for record in records] == \
+            [('short', 200.0, 300.0)]
+        # Short positions are not wash sale candidates
+        assert records[0]['wash_sale_disallowed'] == 0.0
+
+
+class TestWashSales:
+
+    def test_purchase_before_the_loss_absorbs_it(self):
+        engine = LotEngine()
+        records = engine.process(stock_orders=[_stock('b1', 'buy', 10, 20, 0), _stock('b2', 'buy', 10, 15, 20),
+                                               _stock('s1', 'sell', 10, 10, 25)])
+        assert records[0]['gain'] == -100.0
+        assert records[0]['wash_sale_disallowed'] == 100.0
+        [lot] = engine.open_lots()
+        assert lot['unit_cost'] == 25.0
+        # The replacement inherits the 25 days the sold lot was held
+        assert lot['acquired_at'] == datetime(2023, 12, 28, 15, 0).isoformat() + 'Z'
+
+    def test_lots_sold_by_the_same_fill_are_not_replacements(self):
+        engine = LotEngine()
+        records = engine.process(stock_orders=[_stock('b1', 'buy', 10, 20, 0), _stock('b2', 'buy', 10, 20, 10),
+                                               _stock('s1', 'sell', 20, 10, 15)])
+        assert [record['wash_sale_disallowed'] for record in records] == [0.0, 0.0]
+
+    def test_purchase_after_the_loss_absorbs_part_of_it(self):
+        engine = LotEngine()
+        engine.process(stock_orders=[_stock('b1', 'buy', 10, 20, 0), _stock('s1', 'sell', 10, 10, 5)])
+        records = engine.process(stock_orders=[_stock('b2', 'buy', 4, 10, 20)])
+        assert [(record['type'], record['disposal_id'], record['quantity'], record['wash_sale_disallowed'])
+                for record in records] == [('wash_sale', 's1:b1', 4, 40.0)]
+        assert engine.open_lots()[0]['unit_cost'] == 20.0
+
+        # Outside the 30 day window nothing more is disallowed
+        assert engine.process(stock_orders=[_stock('b3', 'buy', 10, 10, 40)]) == []
+
+    def test_split_replacement_keeps_absorbing_later_losses(self):
+        engine = LotEngine()
+        records = engine.process(stock_orders=[
+            _stock('b1', 'buy', 5, 20, 0), _stock('b2', 'buy', 5, 20, 1), _stock('b3', 'buy', 20, 10, 10),
+            _stock('s1', 'sell', 10, 10, 12)])
+        assert [record['wash_sale_disallowed'] for record in records] == [50.0, 50.0]
+        assert sorted((lot['quantity'], lot['unit_cost']) for lot in engine.open_lots()) == \
+            [(5.0, 20.0), (5.0, 20.0), (10.0, 10.0)]
+
+    def test_rest_of_the_sold_lot_is_not_a_replacement(self):
+        engine = LotEngine()
+        records = engine.process(stock_orders=[_stock('b1', 'buy', 10, 20, 0), _stock('s1', 'sell', 4, 10, 5)])
+        assert records[0]['wash_sale_disallowed'] == 0.0
+        assert engine.open_lots()[0]['unit_cost'] == 20.0
+
+    def test_summary_adds_disallowed_losses_back(self):
+        engine = LotEngine()
+        records = engine.process(stock_orders=[_stock('b1', 'buy', 10, 20, 0), _stock('b2', 'buy', 10, 15, 20),
+                                               _stock('s1', 'sell', 10, 10, 25)])
+        assert summarize(records)[('stock', 'short')] == {'proceeds': 100.0, 'cost_basis': 200.0, 'gain': 0.0,
+                                                          'wash_sale_disallowed': 100.0}
+
+
+class TestState:
+
+    def test_round_trip_resumes_after_the_watermark(self, tmp_path):
+        history = [_stock('b1', 'buy', 10, 20, 0), _stock('s1', 'sell', 4, 10, 5)]
+        engine = LotEngine()
+        engine.process(stock_orders=history)
+        path = str(tmp_path / 'lots.json.gz')
+        engine.save(path)
+
+        restored = LotEngine.load(path)
+        assert json.dumps(restored.to_state()) == json.dumps(engine.to_state())
+        assert restored.process(stock_orders=history) == []
+
+        records = restored.process(stock_orders=history + [_stock('b2', 'buy', 2, 10, 10)])
+        assert [(record['type'], record['quantity']) for record in records] == [('wash_sale', 2)]
+        assert restored.fills_processed == 3
+
+    def test_rejects_unknown_versions(self):
+        with pytest.raises(ValueError):
+            LotEngine.from_state({'version': 0})
+
+
+class TestExtraction:
+
+    def test_cancelled_order_with_executions_is_counted(self):
+        cancelled = dict(_stock('b2', 'buy', 3, 10, 1), state='cancelled')
+        engine = LotEngine()
+        records = engine.process(stock_orders=[_stock('b1', 'buy', 5, 10, 0), cancelled,
+                                               _stock('s1', 'sell', 8, 12, 2)])
+        assert _disposals(records) == [('b1', 5, 10.0), ('b2', 3, 6.0)]
+        assert engine.open_lots() == []
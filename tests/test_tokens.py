@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from robin_stocks.robinhood import tokens
+from robin_stocks.robinhood.tokens import TokenManager, TokenRefreshError
+
+
+class StubRefresher:
+    """Stands in for refresh_token_data, answering with numbered tokens or a scripted failure"""
+
+    def __init__(self, monkeypatch, fail=None, delay=0.0):
+        self.calls = []
+        self.fail = fail
+        self.delay = delay
+        monkeypatch.setattr(tokens, 'refresh_token_data', self)
+
+    def __call__(self, refresh_token, device_token=None, scope='internal'):
+        self.calls.append(refresh_token)
+        time.sleep(self.delay)
+        if isinstance(self.fail, Exception):
+            raise self.fail
+        if self.fail:
+            return None
+        number = len(self.calls)
+        return {'access_token': f'access-{number}', 'refresh_token': f'refresh-{number}', 'expires_in': 3600,
+                'expires_at': time.time() + 3600}
+
+
+def _manager(expires_in, **kwargs):
+    manager = TokenManager(refresh_margin=300, retry_interval=60, **kwargs)
+    manager.add('acct', {'access_token': 'access-0', 'refresh_token': 'refresh-0', 'expires_in': expires_in})
+    return manager
+
+
+class TestTokenManager:
+
+    def test_token_far_from_expiry_is_returned_as_is(self, monkeypatch):
+        refresher = StubRefresher(monkeypatch)
+        assert _manager(3600).get('acct') == 'access-0'
+        assert refresher.calls == []
+
+    def test_token_inside_the_margin_is_refreshed_first(self, monkeypatch):
+        refresher = StubRefresher(monkeypatch)
+        refreshed = []
+        manager = _manager(100, on_refresh=lambda key, data: refreshed.append((key, data['access_token'])))
+        assert manager.get('acct') == 'access-1'
+        assert refresher.calls == ['refresh-0']
+        assert refreshed == [('acct', 'access-1')]
+        assert manager.token_data('acct')['refresh_token'] == 'refresh-1'
+        assert manager.get('acct') == 'access-1'
+        assert manager.stats() == {'accounts': 1, 'refreshes': 1, 'failures': 0}
+
+    def test_concurrent_callers_share_one_refresh(self, monkeypatch):
+        refresher = StubRefresher(monkeypatch, delay=0.05)
+        manager = _manager(100)
+        with ThreadPoolExecutor(8) as pool:
+            assert set(pool.map(lambda _: manager.get('acct'), range(8))) == {'access-1'}
+        assert refresher.calls == ['refresh-0']
+
+    @pytest.mark.parametrize('fail', [True, ConnectionError('reset')])
+    def test_failed_refresh_backs_off(self, monkeypatch, fail):
+        refresher = StubRefresher(monkeypatch, fail=fail)
+        manager = _manager(100)
+        # Still valid, so the old token is handed out while the refresh backs off
+        assert manager.get('acct') == 'access-0'
+        assert manager.get('acct') == 'access-0'
+        assert refresher.calls == ['refresh-0']
+        assert manager.stats()['failures'] == 1
+
+    def test_rejected_refresh_falls_back_to_login(self, monkeypatch):
+        StubRefresher(monkeypatch, fail=ConnectionError('reset'))
+        manager = _manager(100, relogin=lambda key: {'access_token': 'relogged', 'expires_in': 3600,
+                                                     'expires_at': time.time() + 3600})
+        assert manager.get('acct') == 'relogged'
+        # The relogin returned no refresh token, so the previous one is kept
+        assert manager.token_data('acct')['refresh_token'] == 'refresh-0'
+
+    def test_expired_token_that_cannot_be_refreshed_raises(self, monkeypatch):
+        StubRefresher(monkeypatch, fail=True)
+        with pytest.raises(TokenRefreshError):
+            _manager(-1).get('acct')
+
+    def test_invalidate_replaces_a_rejected_token_once(self, monkeypatch):
+        refresher = StubRefresher(monkeypatch)
+        manager = _manager(3600)
+        assert manager.invalidate('acct') == 'access-1'
+        assert refresher.calls == ['refresh-0']
+
+    def test_background_loop_does_not_spin_on_a_raising_refresh(self, monkeypatch):
+        refresher = StubRefresher(monkeypatch, fail=ConnectionError('reset'))
+        manager = _manager(100)
+        with manager:
+            time.sleep(0.2)
+        assert refresher.calls == ['refresh-0']
+
+    def test_background_loop_refreshes_ahead_of_expiry(self, monkeypatch):
+        refresher = StubRefresher(monkeypatch)
+        refreshed = threading.Event()
+        manager = _manager(100, on_refresh=lambda key, data: refreshed.set())
+        with manager:
+            assert refreshed.wait(2)
+        assert refresher.calls == ['refresh-0']
+        assert manager.token_data('acct')['access_token'] == 'access-1'
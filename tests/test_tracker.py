@@ -0,0 +1,80 @@
+from robin_stocks.robinhood import cassette, faults
+from robin_stocks.robinhood.tracker import OrderTracker
+
+STOCK_ORDERS_URL = 'https://api.robinhood.com/orders/?updated_at[gte]=2024-01-02T09:59:55.000000Z'
+
+
+def _order(order_id, state, updated_at='2024-01-02T10:00:00Z', quantity='0'):
+    return {'id': order_id, 'state': state, 'updated_at': updated_at, 'cumulative_quantity': quantity}
+
+
+class TestOrderTracker:
+
+    def test_fill_is_dispatched_when_another_asset_class_fails(self, request_layer, write_cassette):
+        path = write_cassette([
+            ('GET', STOCK_ORDERS_URL, 200,
+             {'results': [_order('s1', 'filled', '2024-01-02T10:00:05Z', '10')], 'next': None}),
+        ])
+        tracker = OrderTracker('token')
+        tracker.watch('s1', 'stock', _order('s1', 'confirmed'))
+        tracker.watch('c1', 'crypto', _order('c1', 'confirmed'))
+        fills = []
+        tracker.on('fill', fills.append)
+
+        with cassette.replay(path), faults.inject([faults.FaultRule(r'nummus', reset_rate=1.0)], seed=1):
+            events = tracker.poll_once()
+
+        assert [event['order_id'] for event in fills] == ['s1']
+        assert [event['type'] for event in events] == ['fill']
+        # The crypto order is still watched and is polled again next time
+        assert tracker.watched() == ['c1']
+
+    def test_partial_fill_reports_quantity_since_last_poll(self, request_layer, write_cassette):
+        path = write_cassette([
+            ('GET', STOCK_ORDERS_URL, 200,
+             {'results': [_order('s1', 'partially_filled', '2024-01-02T10:00:05Z', '4')], 'next': None}),
+        ])
+        tracker = OrderTracker('token')
+        tracker.watch('s1', 'stock', _order('s1', 'confirmed', quantity='1'))
+
+        with cassette.replay(path):
+            events = tracker.poll_once()
+
+        assert [(event['type'], event['last_fill_quantity']) for event in events] == [('partial_fill', 3.0)]
+        assert tracker.watched() == ['s1']
+
+    def test_cursor_follows_newest_update_not_resting_orders(self, request_layer, write_cassette):
+        first_url = 'https://api.robinhood.com/orders/?updated_at[gte]=2023-12-31T23:59:55.000000Z'
+        path = write_cassette([
+            ('GET', first_url, 200, {'results': [_order('s1', 'confirmed', '2024-01-01T00:00:00Z'),
+                                                 _order('other', 'filled', '2024-01-02T10:00:00Z')],
+                                     'next': None}),
+            ('GET', STOCK_ORDERS_URL, 200,
+             {'results': [_order('s1', 'filled', '2024-01-02T10:00:05Z', '10')], 'next': None}),
+        ])
+        tracker = OrderTracker('token')
+        tracker.watch('s1', 'stock', _order('s1', 'confirmed', '2024-01-01T00:00:00Z'))
+
+        with cassette.replay(path) as player:
+            assert tracker.poll_once() == []
+            events = tracker.poll_once()
+            assert player.misses == []
+
+        assert [event['type'] for event in events] == ['fill']
+
+    def test_crypto_paging_stops_at_the_oldest_watched_order(self, request_layer, write_cassette):
+        crypto_url = 'https://nummus.robinhood.com/orders/'
+        path = write_cassette([
+            ('GET', crypto_url, 200, {'results': [_order('c3', 'filled')], 'next': crypto_url + '?cursor=2'}),
+            ('GET', crypto_url + '?cursor=2', 200,
+             {'results': [_order('c1', 'filled', '2024-01-02T10:00:05Z', '1')], 'next': crypto_url + '?cursor=3'}),
+            ('GET', crypto_url + '?cursor=3', 200, {'results': [_order('c0', 'filled')], 'next': None}),
+        ])
+        tracker = OrderTracker('token')
+        tracker.watch('c1', 'crypto', _order('c1', 'confirmed'))
+
+        with cassette.replay(path) as player:
+            events = tracker.poll_once()
+            assert player.remaining() == 1
+
+        assert [event['type'] for event in events] == ['fill']
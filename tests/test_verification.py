@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from robin_stocks.robinhood import verification
+from robin_stocks.robinhood.urls import (challenge_url, pathfinder_inquiry_url, pathfinder_user_machine_url,
+                                         prompt_status_url)
+from robin_stocks.robinhood.verification import PollBackoff, login_async, login_many, validate_device
+
+FAST = PollBackoff(initial=0.001, factor=2.0, maximum=0.004, jitter=0.0)
+
+
+class StubPathfinder:
+    """Stands in for _make_request and _post_login, answering the verification workflow from a script
+
+    :param challenge: The sheriff challenge the inquiries return, None for none yet
+    :param prompt_polls: Prompt status polls answered 'issued' before one answers 'validated'
+    :param verify: Usernames whose first login asks for device verification, all when None
+    """
+
+    def __init__(self, monkeypatch, challenge=None, prompt_polls=0, verify=None):
+        self.challenge = challenge
+        self.prompt_polls = prompt_polls
+        self.verify = verify
+        self.requests = []
+        self.logins = []
+        self.lock = threading.Lock()
+        monkeypatch.setattr(verification, '_make_request', self.request)
+        monkeypatch.setattr(verification, '_post_login', self.post_login)
+
+    def request(self, method, url, json=None, data=None, raise_on_error=True, **kwargs):
+        with self.lock:
+            self.requests.append((method, url))
+        if url == pathfinder_user_machine_url():
+            return {'id': 'machine-1'}
+        if url.startswith('https://api.robinhood.com/pathfinder/inquiries/'):
+            if method == 'GET':
+                return {'context': {'sheriff_challenge': self.challenge}}
+            return {'type_context': {'result': 'workflow_status_approved'}}
+        if url == prompt_status_url('challenge-1'):
+            with self.lock:
+                self.prompt_polls -= 1
+                return {'challenge_status': 'validated' if self.prompt_polls < 0 else 'issued'}
+        if url == challenge_url('challenge-1'):
+            return {'status': 'validated' if data == {'response': '123456'} else 'failed'}
+        raise AssertionError(f"Unexpected request {method} {url}")
+
+    def post_login(self, url, payload, reattempt=False):
+        with self.lock:
+            self.logins.append((payload['username'], reattempt))
+        if (self.verify is None or payload['username'] in self.verify) and not reattempt:
+            return {'verification_workflow': {'id': 'workflow-1'}}
+        return {'access_token': f"access-{payload['username']}", 'expires_in': 86400}
+
+    def count(self, url):
+        with self.lock:
+            return sum(1 for _, requested in self.requests if requested == url)
+
+
+def _prompt():
+    return {'type': 'prompt', 'status': 'issued', 'id': 'challenge-1'}
+
+
+def _sms():
+    return {'type': 'sms', 'status': 'issued', 'id': 'challenge-1'}
+
+
+class TestPollBackoff:
+
+    def test_delays_grow_by_factor_up_to_maximum(self):
+        delays = PollBackoff(initial=1.0, factor=2.0, maximum=5.0, jitter=0.0).delays()
+        assert [next(delays) for _ in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    def test_jitter_stays_within_its_fraction(self):
+        delays = PollBackoff(initial=2.0, factor=1.0, maximum=2.0, jitter=0.25).delays()
+        assert all(1.5 <= next(delays) <= 2.5 for _ in range(100))
+
+
+class TestValidateDevice:
+
+    def test_prompt_is_polled_until_validated_and_progress_reported(self, monkeypatch):
+        stub = StubPathfinder(monkeypatch, challenge=_prompt(), prompt_polls=3)
+        stages, prompts = [], []
+
+        async def on_progress(stage, details):
+            stages.append(stage)
+
+        asyncio.run(validate_device('device-1', 'workflow-1', lambda kind, message: prompts.append(kind),
+                                    backoff=FAST, timeout=5, on_progress=on_progress))
+        assert stages == [verification.PROMPT_PENDING, verification.CHALLENGE_VALIDATED, verification.APPROVED]
+        assert prompts == ['prompt']
+        assert stub.count(prompt_status_url('challenge-1')) == 4
+
+    def test_sms_code_comes_from_the_challenge_callback(self, monkeypatch):
+        stub = StubPathfinder(monkeypatch, challenge=_sms())
+        stages = []
+        asyncio.run(validate_device('device-1', 'workflow-1', lambda kind, message: '123456', backoff=FAST,
+                                    timeout=5, on_progress=lambda stage, details: stages.append((stage, details))))
+        assert stages[0] == (verification.CHALLENGE_ISSUED, {'challenge_id': 'challenge-1', 'challenge_type': 'sms'})
+        assert [stage for stage, _ in stages[1:]] == [verification.CHALLENGE_VALIDATED, verification.APPROVED]
+        assert stub.count(challenge_url('challenge-1')) == 1
+
+    def test_polling_waits_the_backoff_intervals(self, monkeypatch):
+        StubPathfinder(monkeypatch, challenge=_prompt(), prompt_polls=2)
+        started = time.monotonic()
+        backoff = PollBackoff(initial=0.05, factor=2.0, maximum=0.1, jitter=0.0)
+        asyncio.run(validate_device('device-1', 'workflow-1', backoff=backoff, timeout=5,
+                                    challenge_callback=lambda kind, message: None))
+        # One inquiry poll (0.05), then prompt polls after 0.05, 0.1 and 0.1 seconds
+        assert time.monotonic() - started >= 0.3
+
+    def test_times_out_when_no_challenge_arrives(self, monkeypatch):
+        StubPathfinder(monkeypatch, challenge=None)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            asyncio.run(validate_device('device-1', 'workflow-1', backoff=FAST, timeout=0.1))
+        assert time.monotonic() - started < 2
+
+    def test_failing_progress_callback_does_not_stop_verification(self, monkeypatch):
+        StubPathfinder(monkeypatch, challenge=_prompt())
+
+        def on_progress(stage, details):
+            raise RuntimeError("dashboard down")
+
+        asyncio.run(validate_device('device-1', 'workflow-1', lambda kind, message: None, backoff=FAST,
+                                    timeout=5, on_progress=on_progress))
+
+
+class TestLoginAsync:
+
+    def test_login_after_verification_returns_token_data(self, monkeypatch):
+        stub = StubPathfinder(monkeypatch, challenge=_prompt())
+        stages = []
+        data = asyncio.run(login_async('a@example.com', 'pw', challenge_callback=lambda kind, message: None,
+                                       device_token='device-1', backoff=FAST, timeout=5,
+                                       on_progress=lambda stage, details: stages.append(stage)))
+        assert data['access_token'] == 'access-a@example.com'
+        assert data['device_token'] == 'device-1'
+        assert 'expires_at' in data
+        assert stub.logins == [('a@example.com', False), ('a@example.com', True)]
+        assert stages[:2] == [verification.STARTED, verification.VERIFICATION_REQUIRED]
+        assert stages[-1] == verification.SUCCEEDED
+
+    def test_cancellation_stops_polling(self, monkeypatch):
+        stub = StubPathfinder(monkeypatch, challenge=None)
+        inquiries = pathfinder_inquiry_url('machine-1')
+
+        async def cancelled_login():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(login_async('a@example.com', 'pw', backoff=FAST, timeout=60), 0.1)
+            polls = stub.count(inquiries)
+            await asyncio.sleep(0.05)
+            return polls
+
+        polls = asyncio.run(cancelled_login())
+        assert polls > 0
+        assert stub.count(inquiries) == polls
+
+
+class TestLoginMany:
+
+    def test_callbacks_are_bound_to_account_keys(self, monkeypatch):
+        StubPathfinder(monkeypatch, challenge=_sms())
+        prompts, stages = [], []
+        accounts = {key: {'username': f'{key}@example.com', 'password': 'pw'} for key in ('a', 'b', 'c')}
+
+        async def challenge_callback(key, kind, message):
+            prompts.append((key, kind))
+            return '123456'
+
+        results = asyncio.run(login_many(accounts, concurrency=2, challenge_callback=challenge_callback,
+                                         on_progress=lambda key, stage, details: stages.append((key, stage)),
+                                         backoff=FAST, timeout=5))
+        assert {key: data['access_token'] for key, data in results.items()} == \
+            {key: f'access-{key}@example.com' for key in accounts}
+        assert sorted(prompts) == [('a', 'sms'), ('b', 'sms'), ('c', 'sms')]
+        assert {(key, verification.SUCCEEDED) for key in accounts} <= set(stages)
+
+    def test_failed_login_is_returned_per_account(self, monkeypatch):
+        StubPathfinder(monkeypatch, challenge=None, verify={'a@example.com'})
+        accounts = {'a': {'username': 'a@example.com', 'password': 'pw', 'timeout': 0.05},
+                    'b': {'username': 'b@example.com', 'password': 'pw', 'mfa_code': '000000'}}
+        results = asyncio.run(login_many(accounts, backoff=FAST, timeout=5))
+        assert isinstance(results['a'], TimeoutError)
+        assert results['b']['access_token'] == 'access-b@example.com'
+
+    @pytest.mark.parametrize('reserved', ['challenge_callback', 'on_progress'])
+    def test_per_account_callbacks_are_rejected(self, monkeypatch, reserved):
+        stub = StubPathfinder(monkeypatch)
+        accounts = {'a': {'username': 'a@example.com', 'password': 'pw', reserved: print}}
+        with pytest.raises(ValueError, match=reserved):
+            asyncio.run(login_many(accounts))
+        assert stub.logins == []
+